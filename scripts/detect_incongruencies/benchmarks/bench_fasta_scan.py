@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import re
+import gzip
+import time
+import logging
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from incongruency_detector.pipeline import StreamPipeline
+from incongruency_detector.Detector import FastaHeaderCheck
+
+parser = argparse.ArgumentParser(description='''
+    Compare the per line check_fasta loop with the header-only scanner
+    on a synthetic gzip assembly.
+''')
+
+parser.add_argument('--size', metavar = '<MB>', type=int, default=1024,
+help='''Uncompressed assembly size in MB (default:1024)''')
+
+parser.add_argument('--scaffolds', metavar = '<INT>', type=int, default=5000,
+help='''Number of records to split the assembly into (default:5000)''')
+
+parser.add_argument('--fasta', metavar = '</path/to/genome.fna.gz>',
+help='''Use this file instead of generating one''')
+
+
+def make_assembly(path, size, scaffolds):
+    '''write a gzip assembly of ~size bytes with 60 base lines'''
+    random.seed(0)
+    line = 60
+    block = ''.join(random.choice('ACGT') for _ in range(line * 1000))
+    block = '\n'.join(block[i:i + line]
+                      for i in range(0, len(block), line)) + '\n'
+    block = block.encode()
+    per_record = max(size // scaffolds, len(block))
+    per_record -= per_record % (line + 1)  # records end on a full line
+    written = 0
+    with gzip.open(path, 'wb', compresslevel=1) as fopen:
+        n = 0
+        while written < size:
+            n += 1
+            fopen.write('>scaffold_{} made up\n'.format(n).encode())
+            left = per_record
+            while left > 0:
+                fopen.write(block[:left] if left < len(block) else block)
+                left -= len(block)
+            written += per_record
+
+
+def per_line(path):
+    '''the check_fasta loop this scanner replaced'''
+    re_header = re.compile(r'^>(\S+)\s*(.*)')
+    ids = {}
+    with gzip.open(path, 'rt') as gopen:
+        for line in gopen:
+            line = line.rstrip()
+            if not line:
+                continue
+            if re_header.match(line):
+                hid = re_header.search(line).groups(0)[0]
+                ids[hid] = 1
+    return len(ids)
+
+
+def scanner(path):
+    '''StreamPipeline with the header-only FastaHeaderCheck'''
+    logger = logging.getLogger('bench_fasta_scan')
+    pipeline = StreamPipeline(path)
+    header_check = pipeline.add_consumer(FastaHeaderCheck('scaffold', logger))
+    pipeline.run()
+    return len(header_check.index())
+
+
+def inflate_only(path):
+    '''lower bound, gzip decompression with no parsing'''
+    with gzip.open(path, 'rb') as gopen:
+        while gopen.read(4 * 1024 * 1024):
+            pass
+    return 0
+
+
+def timed(name, func, path, size):
+    start = time.time()
+    records = func(path)
+    elapsed = time.time() - start
+    print('{:<14}{:>10.2f}s{:>10.1f} MB/s  records={}'.format(
+                                            name, elapsed,
+                                            size / 1048576.0 / elapsed,
+                                            records))
+    return elapsed
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    path = args.fasta
+    tmp_dir = None
+    if not path:
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'bench.genome_main.fna.gz')
+        print('Writing {} MB assembly to {}'.format(args.size, path))
+        make_assembly(path, args.size * 1048576, args.scaffolds)
+    size = 0
+    with gzip.open(path, 'rb') as gopen:
+        for chunk in iter(lambda: gopen.read(4 * 1048576), b''):
+            size += len(chunk)
+    try:
+        base = timed('inflate only', inflate_only, path, size)
+        old = timed('per line', per_line, path, size)
+        new = timed('scanner', scanner, path, size)
+        print('scanner parse overhead {:.2f}s vs per line {:.2f}s, '
+              '{:.1f}x faster overall'.format(new - base, old - base,
+                                              old / new))
+    finally:
+        if tmp_dir:
+            os.remove(path)
+            os.rmdir(tmp_dir)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import re
+import gzip
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from incongruency_detector.pipeline import StreamPipeline, iter_byte_lines
+from incongruency_detector.gff3_validator import GFF3Validator
+from incongruency_detector.Detector import Detector
+from incongruency_detector.companions import TranscriptIDs
+
+parser = argparse.ArgumentParser(description='''
+    Compare the gene only ID/Name check of check_seqid_attributes with
+    the check of every feature on a synthetic gzip gff3.
+''')
+
+parser.add_argument('--genes', metavar = '<INT>', type=int, default=100000,
+help='''Number of genes, each with an mRNA, 4 exons and 4 CDS
+        (default:100000)''')
+
+parser.add_argument('--companions', action='store_true',
+help='''Collect mRNA IDs for the companion FASTA check too, as when an
+        annotation has protein, CDS or mRNA files''')
+
+parser.add_argument('--repeat', metavar = '<INT>', type=int, default=3,
+help='''Runs of each, the fastest is reported (default:3)''')
+
+parser.add_argument('--gff3', metavar = '</path/to/gene_models_main.gff3.gz>',
+help='''Use this file instead of generating one, its name must follow
+        the data store conventions''')
+
+
+def make_gff3(path, genes):
+    '''write a gzip gff3 of genes, gene -> mRNA -> exon and CDS'''
+    prefix = 'glyma.Wm82.gnm2.ann1.'
+    with gzip.open(path, 'wt', compresslevel=1) as fopen:
+        fopen.write('##gff-version 3\n')
+        for n in range(1, genes + 1):
+            seqid = 'glyma.Wm82.gnm2.Gm{:02d}'.format(n % 20 + 1)
+            start = n * 5000
+            gene = '{}Glyma.{:06d}'.format(prefix, n)
+            mrna = gene + '.1'
+            fopen.write('{}\tbench\tgene\t{}\t{}\t.\t+\t.\t'
+                        'ID={};Name=glyma.Glyma.{:06d};\n'.format(
+                                 seqid, start, start + 3999, gene, n))
+            fopen.write('{}\tbench\tmRNA\t{}\t{}\t.\t+\t.\t'
+                        'ID={};Name=glyma.Glyma.{:06d}.1;Parent={}\n'.format(
+                                 seqid, start, start + 3999, mrna, n, gene))
+            for e in range(1, 5):
+                beg = start + (e - 1) * 1000
+                for kind, phase in (('exon', '.'), ('CDS', '0')):
+                    fopen.write('{}\tbench\t{}\t{}\t{}\t.\t+\t{}\t'
+                                'ID={}.{}{};Parent={}\n'.format(
+                                         seqid, kind, beg, beg + 499, phase,
+                                         mrna, kind, e, mrna))
+
+
+def make_detector(companions):
+    logger = logging.getLogger('bench_gff3_scan')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    detector = Detector(logger=logger)
+    if companions:
+        detector.transcripts = TranscriptIDs()
+    return detector
+
+
+def gene_only(path, companions=False):
+    '''the check_seqid_attributes loop before, ID and Name of genes only
+
+       with the type read from column 3 (it read column 4) so the regex
+       runs on every gene as intended
+    '''
+    detector = make_detector(companions)
+    logger = detector.logger
+    findings = detector.findings
+    validator = GFF3Validator(logger, findings)
+    transcripts = detector.transcripts
+    debug = logger.isEnabledFor(logging.DEBUG)
+    file_name = os.path.basename(path)
+    true_id = '.'.join(file_name.split('.')[:4])
+    true_name = file_name.split('.')[0]
+    get_id_name = re.compile("^ID=(.+?);.*Name=(.+?);")
+    lines = 0
+    raw_seqid = None
+    seqid = None
+    for line in iter_byte_lines(StreamPipeline(path).chunks()):
+        line = line.rstrip()
+        lines += 1
+        if line.startswith(b'###'):
+            validator.flush()
+            continue
+        if not line or line.startswith(b'#'):
+            continue
+        columns = line.split(b'\t')
+        validator.feature(columns, lines)
+        if len(columns) != 9:
+            continue
+        if transcripts:
+            transcripts.feature(columns)
+        if columns[0] != raw_seqid:
+            raw_seqid = columns[0]
+            seqid = raw_seqid.decode().rstrip()
+        if debug:
+            logger.debug(line.decode())
+        if detector.fasta_ids:
+            detector.check_gff3_seqid(seqid)
+        if columns[2] != b'gene':
+            continue
+        attributes = columns[8].decode()
+        if not get_id_name.match(attributes):
+            findings.add(logging.ERROR, 'id_name', 'No ID and Name. {}',
+                         lines)
+        else:
+            (feature_id, feature_name) = get_id_name.search(
+                                                      attributes).groups()
+            if not feature_id.startswith(true_id):
+                findings.add(logging.ERROR, 'id_name', 'id {}', lines)
+            if not feature_name.startswith(true_name):
+                findings.add(logging.ERROR, 'id_name', 'name {}', lines)
+    validator.close()
+    return sum(findings.counts.values())
+
+
+def all_features(path, companions=False):
+    '''Detector.check_seqid_attributes, ID and Name of every feature'''
+    detector = make_detector(companions)
+    detector.check_seqid_attributes(path)
+    return sum(detector.findings.counts.values())
+
+
+def timed(funcs, path, companions, repeat):
+    '''fastest of repeat runs of each func, run in turn so a busy
+       moment slows them alike
+    '''
+    best = [None] * len(funcs)
+    found = [None] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            start = time.time()
+            found[i] = func(path, companions)
+            took = time.time() - start
+            if best[i] is None or took < best[i]:
+                best[i] = took
+    return best, found
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    path = args.gff3
+    tmp_dir = None
+    if not path:
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'glyma.Wm82.gnm2.ann1.RVB6.' +
+                                     'gene_models_main.gff3.gz')
+        print('Writing {} genes to {}'.format(args.genes, path))
+        make_gff3(path, args.genes)
+    size = 0
+    with gzip.open(path, 'rb') as gopen:
+        for chunk in iter(lambda: gopen.read(4 * 1048576), b''):
+            size += len(chunk)
+    try:
+        (old, new), found = timed((gene_only, all_features), path,
+                                  args.companions, args.repeat)
+        for name, elapsed, count in zip(('gene only', 'all features'),
+                                        (old, new), found):
+            print('{:<14}{:>10.2f}s{:>10.1f} MB/s  findings={}'.format(
+                                                name, elapsed,
+                                                size / 1048576.0 / elapsed,
+                                                count))
+        print('all features {:.2f}s vs gene only {:.2f}s, {:.2f}x'.format(
+                                                       new, old, old / new))
+    finally:
+        if tmp_dir:
+            os.remove(path)
+            os.rmdir(tmp_dir)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import gzip
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from incongruency_detector.pipeline import StreamPipeline
+from incongruency_detector.bgzf import BGZFWriter
+from incongruency_detector.Normalizer import Normalizer
+
+parser = argparse.ArgumentParser(description='''
+    Compare normalizing the headers of a BGZF genome_main by full
+    recompression with splicing only the blocks that hold headers.
+''')
+
+parser.add_argument('--size', metavar = '<MB>', type=int, default=512,
+help='''Uncompressed assembly size in MB (default:512)''')
+
+parser.add_argument('--scaffolds', metavar = '<INT>', type=int, default=20,
+help='''Number of records to split the assembly into (default:20)''')
+
+parser.add_argument('--threads', metavar = '<INT>', type=int, default=4,
+help='''Compression threads for both (default:4)''')
+
+parser.add_argument('--fasta', metavar = '</path/to/genome_main.fna.gz>',
+help='''Use this BGZF file instead of generating one''')
+
+
+def make_assembly(path, size, scaffolds, threads):
+    '''write a BGZF assembly of ~size bytes with 60 base lines and
+       headers without the genome prefix
+    '''
+    random.seed(0)
+    line = 60
+    block = ''.join(random.choice('ACGT') for _ in range(line * 1000))
+    block = '\n'.join(block[i:i + line]
+                      for i in range(0, len(block), line)) + '\n'
+    block = block.encode()
+    per_record = max(size // scaffolds, len(block))
+    per_record -= per_record % (line + 1)  # records end on a full line
+    written = 0
+    writer = BGZFWriter(path, 1, threads, index=False)
+    n = 0
+    while written < size:
+        n += 1
+        writer.write('>Chr{:02d} made up\n'.format(n).encode())
+        left = per_record
+        while left > 0:
+            writer.write(block[:left] if left < len(block) else block)
+            left -= len(block)
+        written += per_record
+    writer.close()
+
+
+def full(normalizer, path):
+    '''GenomeMainWriter, every block inflated and compressed again'''
+    pipeline = StreamPipeline(path)
+    pipeline.add_consumer(normalizer.genome_main_consumer(path))
+    pipeline.run()
+
+
+def splice(normalizer, path):
+    '''HeaderEdits read then bgzf.splice'''
+    normalizer.splice_genome_main(path)
+
+
+def timed(name, func, normalizer, path):
+    start = time.time()
+    func(normalizer, path)
+    elapsed = time.time() - start
+    out = './{}.normalized'.format(os.path.basename(path))
+    print('{:<8}{:>10.2f}s'.format(name, elapsed))
+    return elapsed, out
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    path = args.fasta
+    tmp_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    if not path:
+        path = os.path.join(tmp_dir, 'glyma.Wm82.gnm2.genome_main.fna.gz')
+        print('Writing {} MB assembly to {}'.format(args.size, path))
+        make_assembly(path, args.size * 1048576, args.scaffolds, args.threads)
+    path = os.path.abspath(path)
+    logger = logging.getLogger('bench_normalize_bgzf')
+    normalizer = Normalizer(logger=logger, compress_threads=args.threads)
+    os.chdir(tmp_dir)  # outputs are written to ./
+    try:
+        old, out = timed('full', full, normalizer, path)
+        with gzip.open(out) as fopen:
+            expected = fopen.read()
+        new, out = timed('splice', splice, normalizer, path)
+        with gzip.open(out) as fopen:
+            same = fopen.read() == expected
+        print('splice {:.1f}x faster, same output: {}'.format(old / new,
+                                                               same))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
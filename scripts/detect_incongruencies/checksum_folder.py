@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import argparse
+from incongruency_detector.checksums import (DEFAULT_CACHE, HashCache,
+                                             verify_manifest, write_manifest)
+
+parser = argparse.ArgumentParser(description='''
+    Write or verify CHECKSUM.<collection>.md5 for data store collections.
+
+    Replaces mdsum-folder.bash.  Output uses the same "<md5>  ./<file>"
+    lines.  Files that have not changed since they were last hashed are
+    answered from a cache, so adding one file to a collection only reads
+    that file.
+''', formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('directories', metavar = '</path/to/datastore/folder>',
+nargs='+', help='''Collection directories to checksum''')
+
+parser.add_argument('--verify', action='store_true',
+help='''Verify the existing CHECKSUM.<collection>.md5 instead of writing it''')
+
+parser.add_argument('--sha256', action='store_true',
+help='''Also write CHECKSUM.<collection>.sha256 from the same read''')
+
+parser.add_argument('--threads', metavar = '<INT>', type=int, default=4,
+help='''Files hashed at once (default:4)''')
+
+parser.add_argument('--cache', metavar = '<FILE>', default=DEFAULT_CACHE,
+help='''SQLite hash cache, empty string to disable (default:{})'''.format(
+                                                              DEFAULT_CACHE))
+
+parser._optionals.title = "Program Options"
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+    cache = HashCache(args.cache) if args.cache else None
+    failed = False
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print('USAGE: {} /path/to/datastore/folder'.format(sys.argv[0]))
+            sys.exit(1)
+        collection = os.path.basename(os.path.abspath(directory))
+        if not args.verify:
+            for written in write_manifest(directory, args.sha256,
+                                          args.threads, cache):
+                print(written)
+            continue
+        md5_file = os.path.join(directory, 'CHECKSUM.{}.md5'.format(
+                                                                  collection))
+        result = verify_manifest(md5_file, args.threads, cache)
+        for status in ('mismatched', 'missing', 'extra'):
+            for name in result[status]:
+                print('{}\t{}\t{}'.format(collection, status, name))
+        if result['mismatched'] or result['missing']:
+            failed = True
+    if cache:
+        cache.close()
+    sys.exit(1 if failed else 0)
@@ -5,7 +5,17 @@ import sys
 import argparse
 import gzip
 import logging
+import subprocess
 from incongruency_detector.Detector import Detector
+from incongruency_detector.checksums import DEFAULT_CACHE
+from incongruency_detector.snapshot import DEFAULT_SNAPSHOT
+from incongruency_detector.catalog import DEFAULT_CATALOG
+from incongruency_detector.metadata import (DEFAULT_METADATA_CACHE,
+                                            DEFAULT_TEMPLATE)
+from incongruency_detector.triage import (QUICK_HEAD, QUICK_SAMPLES,
+                                          background_command)
+from incongruency_detector.doi_resolver import (DEFAULT_DOI_CACHE,
+                                                DEFAULT_RESOLVER)
 
 parser = argparse.ArgumentParser(description='''
     Detect and optionally Normalize Incongruencies with LIS Data Store Standard
@@ -25,11 +35,122 @@ help='''Directory to check.  Will auto detect type.
 
 If directory is an organism directory all gnm and ann under will be checked.
 
+If directory is the data store root every organism directory under it will be
+checked.  The tree is walked once and reused for every lookup.
+
 If directory is a gnm or ann directory, the cooresponding files will be found and all will be checked.
 ''')
 
 parser.add_argument('--gt_path', metavar = '</path/to/my/genome_tools/>',
-help='''Path to genome tools''', required=True)
+help='''Path to genome tools.  Optional, gff3 structure is checked natively.
+If provided gt gff3validator is run as a cross-check.  Needed by --gt_tidy.''')
+
+parser.add_argument('--checksum_all', action='store_true',
+help='''Verify every file listed in each collection's CHECKSUM.*.md5, not just
+the main file, and report missing, extra and mismatched files.''')
+
+parser.add_argument('--checksum_threads', metavar = '<INT>', type=int,
+default=4,
+help='''Files hashed at once with --checksum_all.  (default:4)''')
+
+parser.add_argument('--hash_cache', metavar = '<FILE>',
+help='''SQLite cache of file checksums keyed on device, inode, size and mtime.
+Files unchanged since they were last hashed are not read again.  Not kept
+unless given.  (e.g.:{})'''.format(DEFAULT_CACHE))
+
+parser.add_argument('--doi_resolver', metavar = '<URL>',
+default=DEFAULT_RESOLVER,
+help='''Handle API used to check README DOIs.  (default:{})'''.format(
+                                                            DEFAULT_RESOLVER))
+
+parser.add_argument('--doi_cache', metavar = '<FILE>',
+help='''JSON cache of DOI lookups, valid results are kept 30 days and invalid
+ones a day.  Not kept unless given.  (e.g.:{})'''.format(DEFAULT_DOI_CACHE))
+
+parser.add_argument('--jobs', metavar = '<INT>', type=int, default=1,
+help='''Number of collections to check at once when --directory is an
+organism directory.  Each collection runs in its own process.  (default:1)''')
+
+parser.add_argument('--index_dir', metavar = '</path/to/index_dir>',
+default='./detect_incongruencies_index',
+help='''Directory for genome_main sequence indexes (.fai).  Indexes are keyed
+on the genome file so later annotation checks reuse them instead of
+rescanning the genome.  (default:./detect_incongruencies_index)''')
+
+parser.add_argument('--snapshot', metavar = '<FILE>',
+help='''File fingerprints and results of earlier --directory runs.  Collections
+whose files, CHECKSUM and README have not changed since they last passed are
+not checked again, their results and warnings are replayed.  Without it every
+collection is checked.  (e.g.:{})'''.format(DEFAULT_SNAPSHOT))
+
+parser.add_argument('--catalog', metavar = '<FILE>',
+help='''SQLite catalog of every collection --directory walks: files, sizes,
+fingerprints, md5s from CHECKSUM, README.*.yml fields and the last result of
+each check.  Updated by file fingerprint, only collections that changed are
+read again.  Not kept unless given.  (e.g.:{})'''.format(DEFAULT_CATALOG))
+
+parser.add_argument('--catalog_only', action='store_true',
+help='''Update --catalog for --directory and exit without checking anything.''')
+
+parser.add_argument('--metadata_template', metavar = '<FILE>',
+default=DEFAULT_TEMPLATE,
+help='''README template every README.<KEY>.yml is checked against: all of its
+keys are required, scientific_name_abbrev must be five letters and identifier
+the collection KEY.  Files named in MANIFEST.<KEY>.*.yml must exist.  Pass an
+empty string to skip these checks.  (default:{})'''.format(DEFAULT_TEMPLATE))
+
+parser.add_argument('--metadata_cache', metavar = '<FILE>',
+help='''Outcome of each README and MANIFEST yml by file fingerprint, only
+changed files are parsed again.  Not kept unless given.
+(e.g.:{})'''.format(DEFAULT_METADATA_CACHE))
+
+parser.add_argument('--quick', action='store_true',
+help='''Triage: check filenames, then headers and gff3 seqids, IDs and Names in
+the first --quick_mb of each file and in --quick_samples BGZF blocks (or plain
+text windows) spread over the rest.  No checksums, README, DOIs, gt or
+companion files.  Verdicts are provisional and marked so in the report.''')
+
+parser.add_argument('--quick_mb', metavar = '<MB>', type=int,
+default=QUICK_HEAD // 1048576,
+help='''Inflated MB read from the start of each file with --quick.
+(default:{})'''.format(QUICK_HEAD // 1048576))
+
+parser.add_argument('--quick_samples', metavar = '<INT>', type=int,
+default=QUICK_SAMPLES,
+help='''Blocks sampled past the first --quick_mb with --quick, gzip, bz2, xz
+and zstd files that are not BGZF cannot be sampled.  (default:{})'''.format(
+                                                               QUICK_SAMPLES))
+
+parser.add_argument('--background', action='store_true',
+help='''With --quick, start the full check of the same files in the
+background once the provisional verdict is written.  It replaces --report when
+it finishes and logs to --log_file with .full before its extension.
+(e.g.:./detect_incongruencies.full.log)''')
+
+parser.add_argument('--watch', action='store_true',
+help='''After checking --directory keep watching it (inotify, or polling where
+that is not available) and check collections as they land or change.''')
+
+parser.add_argument('--watch_delay', metavar = '<SECONDS>', type=int,
+default=60,
+help='''Seconds without changes before a changed collection is checked with
+--watch, also the polling interval.  (default:60)''')
+
+parser.add_argument('--report', metavar = '<FILE>',
+help='''Write a JSON report of every checked file: its findings, bytes, wall
+and cpu seconds per stage, and peak RSS.  A .jsonl name writes JSON Lines,
+one file per line with a run summary last.''')
+
+parser.add_argument('--max_findings', metavar = '<INT>', type=int, default=20,
+help='''Log at most this many findings of each kind (bad header, missing seqid,
+bad ID/Name ...) per file, then a count of the rest.  0 logs every one.
+(default:20)''')
+
+parser.add_argument('--companion_threads', metavar = '<INT>', type=int,
+default=3,
+help='''Threads reading an annotation's protein, cds and mrna FASTAs, which
+are checked 1:1 against the mRNAs in gene_models_main.  0 skips the check.
+(default:3)''')
 
 parser.add_argument('--log_file', metavar = '<FILE>', 
 default='./detect_incongruencies.log',
@@ -38,18 +159,64 @@ help='''File to write log to.  (default:./detect_incongruencies.log)''')
 parser.add_argument('--log_level', metavar = '<LOGLEVEL>', default='INFO',
 help='''Log level: DEBUG, INFO, WARNING, ERROR, CRITICAL (default:INFO)''')
 
+parser.add_argument('--compress_level', metavar = '<0-9>', type=int, default=6,
+help='''gzip level for normalized genomes.  (default:6)''')
+
+parser.add_argument('--compress_threads', metavar = '<INT>', type=int,
+default=4,
+help='''Threads compressing normalized genomes.  (default:4)''')
+
+parser.add_argument('--inflate_threads', metavar = '<INT>', type=int,
+default=4,
+help='''Threads inflating BGZF files, 1 inflates serially.  (default:4)''')
+
+parser.add_argument('--read_buffer', metavar = '<MB>', type=int, default=4,
+help='''Megabytes read from disk at a time when scanning files.
+(default:4)''')
+
+parser.add_argument('--gunzip', metavar = '<auto|none|PROGRAM>',
+default='auto',
+help='''Program inflating plain gzip files of 64MB or more, when their raw
+bytes are not also needed for a checksum.  auto uses igzip or pigz if
+either is on PATH, none always inflates in python.  (default:auto)''')
+
 parser.add_argument('--normalize', action='store_true',
 help='''Normalizes provided files.
 
 Incongruencies in FASTA will be corrected if the provided genome name
-passes checks.
+passes checks.  Genomes are written block gzipped (BGZF) with .fai and .gzi
+indexes, ready for samtools faidx and JBrowse.
     
-The gff file will be tidied if it fails gff3 validation in gt:
+The gff file will be sorted by seqid and start, see --gff3_order, if it
+fails gff3 validation.  The sort spills to disk past
+--sort_memory so annotations of any size fit.  With --gt_tidy gt is used:
 
     gt gff3 -sort -tidy -retainids input.gff3 > out.gff3
 
 ''')
 
+parser.add_argument('--sort_memory', metavar = '<MB>', type=int, default=512,
+help='''Megabytes of gff3 lines sorted in memory before spilling a sorted run
+to disk.  (default:512)''')
+
+parser.add_argument('--sort_tmp', metavar = '<DIR>',
+help='''Directory for gff3 sort runs.  (default:system temp directory)''')
+
+parser.add_argument('--gff3_compress', choices=['bgzf', 'gzip'],
+default='bgzf',
+help='''Compression of sorted gff3 files.  (default:bgzf)''')
+
+parser.add_argument('--gff3_order', choices=['position', 'tree'],
+default='position',
+help='''Order of sorted gff3 files.  position sorts on seqid and start with
+parents before children at the same start, the order tabix needs, and
+bgzf output gets a .tbi (.csi past 512Mb) index.  tree keeps each gene
+with its children but cannot be indexed.  (default:position)''')
+
+parser.add_argument('--gt_tidy', action='store_true',
+help='''Tidy gff3 files with gt gff3 -sort -tidy instead of sorting them
+natively.  gt holds the whole annotation in memory.''')
+
 parser._optionals.title = "Program Options"
 args = parser.parse_args()
 
@@ -73,10 +240,84 @@ if __name__ == '__main__':
     directory = args.directory
     gt_path = args.gt_path
     normalize = args.normalize
+    jobs = args.jobs
+    index_dir = args.index_dir
+    checksum_all = args.checksum_all
+    checksum_threads = args.checksum_threads
+    hash_cache = args.hash_cache
+    doi_resolver = args.doi_resolver
+    doi_cache = args.doi_cache
+    snapshot = args.snapshot
+    catalog = args.catalog
+    catalog_only = args.catalog_only
+    metadata_template = args.metadata_template
+    metadata_cache = args.metadata_cache
+    quick = args.quick
+    quick_head = args.quick_mb * 1024 * 1024
+    quick_samples = args.quick_samples
+    background = args.background
+    watch = args.watch
+    watch_delay = args.watch_delay
+    report = args.report
+    max_findings = args.max_findings
+    compress_level = args.compress_level
+    compress_threads = args.compress_threads
+    inflate_threads = args.inflate_threads
+    gunzip = args.gunzip
+    read_buffer = args.read_buffer * 1024 * 1024
+    sort_memory = args.sort_memory * 1024 * 1024
+    sort_tmp = args.sort_tmp
+    gff3_compress = args.gff3_compress
+    gff3_order = args.gff3_order
+    gt_tidy = args.gt_tidy
+    companion_threads = args.companion_threads
+    if watch and not directory:
+        logger.error('--watch needs --directory')
+        sys.exit(1)
+    if quick and normalize:
+        logger.error('--normalize needs the full check, not --quick')
+        sys.exit(1)
+    if background and not (quick and report):
+        logger.error('--background needs --quick and --report')
+        sys.exit(1)
+    if catalog_only and not (directory and catalog):
+        logger.error('--catalog_only needs --directory and --catalog')
+        sys.exit(1)
     initializers = {'genome': genome, 'annotation': annotation,
                     'directory': directory,
                     'logger': logger, 'gt_path': gt_path,
-                    'normalize': normalize}
+                    'normalize': normalize, 'jobs': jobs,
+                    'index_dir': index_dir, 'checksum_all': checksum_all,
+                    'checksum_threads': checksum_threads,
+                    'hash_cache': hash_cache, 'doi_resolver': doi_resolver,
+                    'doi_cache': doi_cache, 'snapshot': snapshot,
+                    'catalog': catalog, 'catalog_only': catalog_only,
+                    'metadata_template': metadata_template,
+                    'metadata_cache': metadata_cache, 'quick': quick,
+                    'quick_head': quick_head, 'quick_samples': quick_samples,
+                    'watch': watch, 'watch_delay': watch_delay,
+                    'report': report, 'max_findings': max_findings,
+                    'compress_level': compress_level,
+                    'compress_threads': compress_threads,
+                    'inflate_threads': inflate_threads, 'gunzip': gunzip,
+                    'read_buffer': read_buffer, 'sort_memory': sort_memory,
+                    'sort_tmp': sort_tmp, 'gff3_compress': gff3_compress,
+                    'gff3_order': gff3_order, 'gt_tidy': gt_tidy,
+                    'companion_threads': companion_threads}
     detector = Detector(**initializers)
-    detector.detect_incongruencies()
-
+    try:
+        detector.detect_incongruencies()
+    finally:  # report what was checked even if a check exited
+        detector.write_report()
+    if background:  # the provisional report is written, start the rest
+        root, ext = os.path.splitext(log_file)
+        full_log = '{}.full{}'.format(root, ext)
+        full = subprocess.Popen(background_command(sys.argv, full_log),
+                                stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL,
+                                start_new_session=True)
+        logger.info('Full check running in the background, pid {}, '.format(
+                                                                  full.pid) +
+                    'it will replace {} and log to {}'.format(report,
+                                                              full_log))
@@ -3,14 +3,32 @@
 import os
 import sys
 import logging
-import re
 import subprocess
+import time
 import hashlib
-import requests
-import json
-from glob import glob
-from Normalizer import Normalizer
-from file_helpers import check_file, return_filehandle
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from .Normalizer import Normalizer
+from .file_helpers import check_file, fingerprint, return_filehandle
+from .pipeline import StreamPipeline, ProcessTee, iter_line_blocks
+from .bgzf import is_bgzf
+from . import pipeline as stream_pipeline
+from .datastore_index import (DataStoreIndex, parse_collection,
+                              scan_collection)
+from .checksums import (HashCache, file_digests, read_manifest,
+                        verify_manifest)
+from .doi_resolver import DOIResolver, DEFAULT_RESOLVER
+from .gff3_validator import GFF3Validator, parse_attributes
+from .sequence_index import FastaIndexer, load_index, save_index
+from .report import Findings, Report, child_cpu
+from .snapshot import Snapshot, collection_state
+from .watcher import make_watcher
+from .companions import EXPECTED, CompanionScan, TranscriptIDs, compare
+from .catalog import Catalog
+from .metadata import MetadataValidator, DEFAULT_TEMPLATE
+from .triage import (QUICK_HEAD, QUICK_SAMPLES, SampleValidator,
+                     head_lines, sample_lines)
+from . import inflate
 
 
 class Detector:
@@ -41,21 +59,64 @@ class Detector:
         self.directory = kwargs.get('directory')
         self.gt_path = kwargs.get('gt_path')
         self.normalize = kwargs.get('normalize')
-        if self.annotation and not self.gt_path:
-            logger.error('gt_path, /path/to/genome_tools must be provided')
-            sys.exit(1)
+        self.index_dir = os.path.abspath(kwargs.get('index_dir') or
+                                         './detect_incongruencies_index')
+        self.checksum_all = kwargs.get('checksum_all')
+        self.checksum_threads = kwargs.get('checksum_threads') or 4
+        self.hash_cache_path = kwargs.get('hash_cache')
+        self.hash_cache = None  # opened on first use, not shared by workers
+        self.doi_resolver_url = kwargs.get('doi_resolver') or DEFAULT_RESOLVER
+        self.doi_cache = kwargs.get('doi_cache')
+        self.doi_resolver = None  # made on first use
+        self.jobs = kwargs.get('jobs') or 1  # collections checked at once
+        self.snapshot_path = kwargs.get('snapshot')
+        self.snapshot = None  # loaded on first use
+        self.catalog_path = kwargs.get('catalog')
+        self.catalog = None  # opened on first use
+        self.catalog_only = kwargs.get('catalog_only')
+        self.metadata_template = kwargs.get('metadata_template')
+        if self.metadata_template is None:
+            self.metadata_template = DEFAULT_TEMPLATE
+        self.metadata_cache = kwargs.get('metadata_cache')
+        self.metadata = None  # made on first use, False if unavailable
+        self.quick = kwargs.get('quick')  # provisional checks, see quick_lines
+        self.quick_head = kwargs.get('quick_head') or QUICK_HEAD
+        self.quick_samples = kwargs.get('quick_samples')
+        if self.quick_samples is None:
+            self.quick_samples = QUICK_SAMPLES
+        self.watch = kwargs.get('watch')
+        self.watch_delay = kwargs.get('watch_delay') or 60
+        self.companion_threads = kwargs.get('companion_threads')
+        if self.companion_threads is None:
+            self.companion_threads = 3
+        self.transcripts = None  # TranscriptIDs while a gff3 is read
+        inflate.configure(kwargs.get('inflate_threads'), kwargs.get('gunzip'))
+        stream_pipeline.configure(kwargs.get('read_buffer'))
+        self.options = dict((k, v) for k, v in kwargs.items()
+                            if k != 'logger')  # to rebuild in workers
         if self.gt_path:
             self.gt_path = os.path.abspath(self.gt_path)
         if self.normalize:
             self.normalizer = Normalizer(**kwargs)
         else:
             self.normalizer = None
+        self.datastore = None  # DataStoreIndex, walked once per run
+        self.collections = {}  # collection path: scan_collection record
         self.fasta_ids = {}
+        self.pending_checksums = {}  # genome_main: md5 to check on read
+        self.failed_metadata = set()  # main files with README/MANIFEST errors
         self.genome_attributes = {'filename': '', 'version': '',
                                   'prefix': '', 'type': '', 'build': '',
                                   'compression': ''}
         self.incongruencies = {'Genome Name': [], 'Genome Headers': [],
-                               'Annotation Name': [], 'GFF File': []}
+                               'Annotation Name': [], 'GFF File': [],
+                               'Companion Files': [], 'Checksums': [],
+                               'DOIs': []}
+        self.report_path = kwargs.get('report')
+        self.report = Report()  # findings and stage costs per file
+        self.logger.addHandler(self.report)
+        self.max_findings = kwargs.get('max_findings')  # 0/None log all
+        self.findings = Findings(self.logger, self.max_findings or None)
         self.logger.info('Initialized Detector')
 
     def check_genome_main(self, attr):
@@ -145,116 +206,256 @@ class Detector:
         '''Confirms that headers in fasta genome_main conform with standard
 
            https://github.com/LegumeFederation/datastore/issues/23
+
+           The file is read once.  The md5 check (if a checksum is pending
+           for it) rides along on the same pass as the header check, which
+           also writes the sequence index.  Only a genome that fails is
+           normalized: a BGZF genome has its header edits found in the
+           pass and the normalized copy spliced from its blocks after,
+           any other is read again to write it.  If an index for this
+           exact file exists the headers are checked from it and the
+           FASTA is not inflated.
         '''
         logger = self.logger
-        self.fasta_ids = {}
-        f_ids = self.fasta_ids
+        normalizer = self.normalizer
         true_header = '.'.join(attr[:3])
-        fh = return_filehandle(fasta)  # get file handle, text/gz
-        re_header = re.compile("^>(\S+)\s*(.*)")  # grab header and description
-        passed = True
-        with fh as gopen:
-            for line in gopen:
-                line = line.rstrip()
-                if not line:
-                    continue
-                if re_header.match(line):  # check for fasta header
-                    hid = re_header.search(line)
-                    if hid:
-                        logger.debug(hid.groups(0))
-                        if isinstance(hid, basestring):  # check for tuple
-                            hid = hid.groups(0)
-                        else:
-                            hid = hid.groups(0)[0]  # get id portion of header
-                    else:
-                        logger.error('Header {} looks odd...'.format(line))
-                        sys.exit(1)
-                    logger.debug(hid)
-                    f_ids[hid] = 1
-                    standard_header = true_header + '.' + hid
-                    if not hid.startswith(true_header):
-                        logger.warning(('Inconsistency {} '.format(hid) +
-                                        'Should be {}'.format(standard_header))
-                                      )
-                        passed = False
+        check_sum_target = self.pending_checksums.pop(fasta, None)
+        header_check = FastaHeaderCheck(true_header, logger, self.findings)
+        index = load_index(self.index_dir, fasta)
+        report = self.report
+        if index is not None:
+            logger.info('Checking headers from sequence index')
+            if check_sum_target:  # raw bytes only, nothing to inflate
+                with report.stage('checksum') as stats:
+                    digests = file_digests([fasta],
+                                           cache=self.get_hash_cache())
+                    self.compare_checksum(fasta, digests[fasta]['md5'],
+                                          check_sum_target)
+                    stats['bytes'] = os.path.getsize(fasta)
+            with report.stage('header_scan') as stats:
+                for hid in index.names:
+                    header_check.check_id(hid)
+                stats['from_index'] = True
+            self.fasta_ids = index
+            passed = header_check.passed
+            if normalizer and not passed:
+                with report.stage('normalize') as stats:
+                    normalizer.normalize_genome_main(fasta)
+                    stats['bytes'] = os.path.getsize(fasta)
+            return passed
+        pipeline = StreamPipeline(fasta)
+        hash_md5 = None
+        if check_sum_target:
+            target_sum = self.cached_md5(fasta)
+            if target_sum:  # unchanged since hashed, skip the md5
+                self.compare_checksum(fasta, target_sum, check_sum_target)
+            else:
+                fprint = fingerprint(fasta)
+                hash_md5 = pipeline.add_raw_consumer(hashlib.md5())
+        pipeline.add_consumer(header_check)
+        edits = None
+        if normalizer and is_bgzf(fasta):  # spliced after, if it needs it
+            edits = pipeline.add_consumer(
+                                    normalizer.header_edits_consumer(fasta))
+        with report.stage('header_scan') as stats:
+            pipeline.run()
+            stats['bytes'] = pipeline.bytes_read
+            stats['bytes_inflated'] = pipeline.bytes_inflated
+            stats['with'] = [n for n, c in (('checksum', hash_md5),
+                                            ('normalize', edits)) if c]
+        if hash_md5:
+            target_sum = hash_md5.hexdigest()
+            if self.get_hash_cache():
+                self.hash_cache.put([(fprint, {'md5': target_sum})])
+            self.compare_checksum(fasta, target_sum, check_sum_target)
+        self.fasta_ids = header_check.index()
+        fai = save_index(self.index_dir, fasta, self.fasta_ids)
+        logger.info('Wrote sequence index {}'.format(fai))
+        passed = header_check.passed
+        if normalizer and not passed:  # clean genomes are not written
+            with report.stage('normalize') as stats:
+                if edits:
+                    normalizer.splice_genome_main(fasta, edits)
+                else:
+                    normalizer.normalize_genome_main(fasta)
+                stats['bytes'] = os.path.getsize(fasta)
         return passed
 
+    def genome_index(self, annotation):
+        '''Find the genome_main for annotation and return its index
+
+           loads the sidecar index if the genome has not changed since it
+           was written, otherwise scans the genome once and writes one.
+           returns None if no single genome_main can be found, or in
+           quick mode if there is no sidecar index.
+        '''
+        logger = self.logger
+        ann_dir = os.path.dirname(annotation)
+        datastore = self.get_datastore(ann_dir)
+        genomes = []
+        for g in datastore.genomes_for(ann_dir):
+            genomes.extend(self.collections[g]['main'])
+        if len(genomes) != 1:
+            logger.info('No single genome_main for {}, '.format(annotation) +
+                        'seqids will not be checked')
+            return None
+        genome = genomes[0]
+        index = load_index(self.index_dir, genome)
+        if index is not None:
+            logger.info('Loaded sequence index for {}'.format(genome))
+            return index
+        if self.quick:
+            logger.info('No sequence index for {}, '.format(genome) +
+                        'seqids will not be checked')
+            return None
+        logger.info('Indexing {}'.format(genome))
+        pipeline = StreamPipeline(genome)
+        indexer = pipeline.add_consumer(FastaIndexer())
+        with self.report.stage('genome_index') as stats:
+            pipeline.run()
+            stats['bytes'] = pipeline.bytes_read
+        index = indexer.index()
+        save_index(self.index_dir, genome, index)
+        return index
+
     def check_gff3_seqid(self, seqid):
         '''Confirms that column 1 "seqid" exists in genome_main if provided'''
         f_ids = self.fasta_ids  # fasta_ids generated from check_Reference
-        logger = self.logger
-        if seqid not in f_ids:
-            return False
-        logger.debug('seqid {} found in fasta'.format(seqid))
-        return True
+        return seqid in f_ids
+
+    def check_gff3_end(self, seqid, columns):
+        '''Confirms that column 5 "end" is within the seqid length'''
+        try:
+            end = int(columns[4])
+        except (IndexError, ValueError):  # left for gt to report
+            return True
+        return end <= self.fasta_ids.length(seqid)
 
-    def check_seqid_attributes(self, gff):
+    def check_seqid_attributes(self, gff, tee=None):
         '''Confirms that gff3 seqid exists in genome_main if provided
 
-           checks ID and Name from gff3 attributes field
+           runs the GFF3Validator structural checks, with the ID and Name
+           of every feature, in the same pass.  column 9 is split once
+           per line and shared with the companion file check
 
            https://github.com/LegumeFederation/datastore/issues/23
+
+           tee is an optional stream consumer given the same inflated
+           chunks, used to feed gt.  returns True if the structural
+           checks passed
+
+           lines stay bytes, only seqids (once per run of lines on the
+           same seqid) and values in logged findings are decoded
         '''
         logger = self.logger
-        fh = return_filehandle(gff)
-        file_name = os.path.basename(gff)
-        true_id = file_name.split('.')[:4]  # ID should start with this string
-        true_name = file_name.split('.')[0]  # maybe this should include infra
-        get_id_name = re.compile("^ID=(.+?);.*Name=(.+?);")
+        findings = self.findings
+        fields = os.path.basename(gff).split('.')
+        validator = GFF3Validator(logger, findings,
+                                  id_prefix='.'.join(fields[:4]) + '.',
+                                  name_prefix=fields[0])  # maybe with infra
+        transcripts = self.transcripts  # mRNA IDs for check_companions
+        debug = logger.isEnabledFor(logging.DEBUG)  # once, not per line
+        pipeline = StreamPipeline(gff)
+        if tee:
+            pipeline.add_consumer(tee)
+        fasta_ids = self.fasta_ids  # seqids of genome_main, if read
         lines = 0
-        with fh as gopen:
-            for line in gopen:
-                line = line.rstrip()
-                lines += 1
-                if not line or line.startswith('#'):
-                    continue
-                columns = line.split('\t')  # get gff3 fields
-                seqid = columns[0]  # seqid according to the spec
-                seqid = seqid.rstrip()
-                logger.debug(line)
-                logger.debug(seqid)
-                if self.fasta_ids:  # if genome_main make sure seqids exist
-                    if not self.check_gff3_seqid(seqid):  # fasta header check
-                        logger.debug(seqid)
-                        logger.error('{} not found in genome_main'.format(
-                                                                        seqid))
-                feature_type = columns[3]  # get type
-                attributes = columns[8]  # attributes ';' delimited
-                if feature_type != 'gene':  # only check genes (for now)
-                    continue
-                if not get_id_name.match(attributes):  # check for ID and Name
-                    logger.error('No ID and Name attributes. line {}'.format(
-                                                                        lines))
-                else:
-                    groups = get_id_name.search(attributes).groups()
-                    if len(groups) != 2:  # should just be ID and Name
-                        logger.error('too many groups detected: {}'.format(
-                                                                      groups))
-                    (feature_id, feature_name) = groups
-                    if not feature_id.startswith(true_id):  # check id
-                        logger.error('feature id, should start with ' +
-                                     '{} line {}'.format(true_id, lines))
-                    if not feature_name.startswith(true_name):
-                        logger.error('feature name, should start with ' +
-                                     '{} line {}'.format(true_name, lines))
+        raw_seqid = None
+        seqid = None
+        known = True
+        chunks = pipeline.chunks()
+        for line in chain.from_iterable(iter_line_blocks(chunks)):
+            line = line.rstrip()  # and any \r
+            lines += 1
+            if not line or line.startswith(b'#'):  # one test per feature
+                if line.startswith(b'###'):  # earlier features are complete
+                    validator.flush()
+                elif line.startswith(b'##FASTA'):  # sequences, no features
+                    break
+                continue
+            columns = line.split(b'\t')  # get gff3 fields
+            if len(columns) != 9:  # reported by validator
+                validator.feature(columns, lines)
+                continue
+            attributes = parse_attributes(columns[8])  # split once
+            validator.feature(columns, lines, attributes)
+            if transcripts:
+                transcripts.feature(columns, attributes)
+            if columns[0] != raw_seqid:  # seqid according to the spec
+                raw_seqid = columns[0]
+                seqid = raw_seqid.decode().rstrip()
+                if fasta_ids:  # looked up once per run of the seqid
+                    known = self.check_gff3_seqid(seqid)
+            if debug:
+                logger.debug(line.decode())
+            if fasta_ids:  # if genome_main make sure seqids exist
+                if not known:  # fasta header check
+                    findings.add(logging.ERROR, 'missing_seqid',
+                                 '{} not found in genome_main, line {}',
+                                 seqid, lines)
+                elif not self.check_gff3_end(seqid, columns):
+                    findings.add(logging.ERROR, 'seqid_end',
+                                 'feature end past {} length, line {}',
+                                 seqid, lines)
+        if tee:  # gt gets the FASTA too
+            for chunk in chunks:
+                pass
+        else:
+            chunks.close()
+        validator.close()
+        return validator.passed
 
     def check_gff3(self, gff):
-        '''Confirms that gff3 files pass gt validation
+        '''Confirms that gff3 files pass validation
 
            https://github.com/LegumeFederation/datastore/issues/23
+
+           structure is checked in python alongside the seqid and
+           attribute checks.  If gt_path was given gt gff3validator runs
+           as a cross-check on the same inflated stream, fed through its
+           stdin while python parses, so the file is read once and the
+           two run side by side.  returns non zero if either failed.
         '''
         logger = self.logger
         gt_path = self.gt_path
-        logger.info('checking gff3 seqids and attributes...')
-        self.check_seqid_attributes(gff)
+        logger.info('checking gff3 seqids, attributes and structure...')
+        report = self.report
+        if not gt_path:
+            with report.stage('gff3_scan') as stats:
+                exit_val = 0 if self.check_seqid_attributes(gff) else 1
+                stats['bytes'] = os.path.getsize(gff)
+            if exit_val:
+                logger.warning('{} failed gff3 structure checks'.format(gff))
+            return exit_val
         gff_name = os.path.basename(gff)
         gt_report = './{}_gt_gff3validator_report.txt'.format(gff_name)
-        gt_cmd = '({}/gt gff3validator {} 2>&1) > {}'.format(gt_path, gff,
-                                                             gt_report)
+        gt_cmd = [os.path.join(gt_path, 'gt'), 'gff3validator']  # stdin
         logger.debug(gt_cmd)
-        exit_val = subprocess.call(gt_cmd, shell=True)  # get gt exit_val
-        logger.debug(exit_val)
-        return exit_val
+        gt_cpu = child_cpu()
+        with open(gt_report, 'w') as gt_out:
+            gt_started = time.perf_counter()
+            gt = subprocess.Popen(gt_cmd, stdin=subprocess.PIPE,
+                                  stdout=gt_out, stderr=subprocess.STDOUT)
+            tee = ProcessTee(gt.stdin)
+            try:
+                with report.stage('gff3_scan') as stats:
+                    exit_val = 0 if self.check_seqid_attributes(gff,
+                                                                tee) else 1
+                    stats['bytes'] = os.path.getsize(gff)
+            finally:
+                if tee.writer.is_alive():  # python checks stopped early
+                    tee.close()
+                gt_val = gt.wait()  # get gt exit_val
+            report.add_stage('gt', time.perf_counter() - gt_started,
+                             child_cpu() - gt_cpu, exit=gt_val)
+        logger.debug(gt_val)
+        if exit_val:
+            logger.warning('{} failed gff3 structure checks'.format(gff))
+        if gt_val:
+            logger.warning('gt gff3validator failed, see {}'.format(
+                                                                 gt_report),
+                           extra={'finding': 'gt'})
+        return exit_val or gt_val
 
     def parse_filenames(self, f):
         '''parse attributes of filenames according to
@@ -273,72 +474,206 @@ class Detector:
         if file_attr[-3] == 'genome_main':  # position of type
             logger.info('{} looks like a genome_main, processing...'.format(
                                                                    file_name))
-            self.check_genome_main(file_attr)  # file naming is correct
+            with self.report.stage('filename'):
+                self.check_genome_main(file_attr)  # file naming is correct
             logger.info('Filename checks out.  Checking reference headers...')
+            if self.quick:
+                return self.quick_fasta(f, file_attr)
             passed = self.check_fasta(f, file_attr)  # headers follow standard
             return passed
         if file_attr[-3] == 'gene_models_main':  # position of type
             logger.info('{} looks like gene_models_main, processing...'.format(
                                                                    file_name))
-            self.check_gene_models_main(file_attr)  # check file naming
+            with self.report.stage('filename'):
+                self.check_gene_models_main(file_attr)  # check file naming
             logger.info('Filename checks out.  Checking GFF3 file...')
+            if self.quick:
+                return self.quick_gff3(f)
             exit_val = self.check_gff3(f)  # gff follows standard
             return exit_val
 
-    def validate_checksum(self, md5_file, check_me):
-        '''Get md5 checksum for file and compare to expected'''
+    def quick_lines(self, path, stats):
+        '''yield (offset, lines) read for a quick check of path
+
+           the complete lines of its first quick_head inflated bytes with
+           offset None, then those of quick_samples BGZF blocks (or plain
+           text windows) spread over the rest with their offset on disk.
+           gzip, bz2, xz and zstd files only give the first part
+        '''
+        lines, whole, raw = head_lines(path, self.quick_head)
+        stats['bytes'] = raw
+        stats['samples'] = 0
+        yield None, lines
+        if whole:
+            return
+        for offset, lines in sample_lines(path, self.quick_samples, raw):
+            stats['samples'] += 1
+            yield offset, lines
+
+    def quick_fasta(self, fasta, attr):
+        '''check_fasta on the headers of quick_lines, or on all of them
+           if the genome has a sequence index.  returns a provisional
+           passed
+        '''
+        true_header = '.'.join(attr[:3])
+        header_check = FastaHeaderCheck(true_header, self.logger,
+                                        self.findings)
+        index = load_index(self.index_dir, fasta)
+        with self.report.stage('quick') as stats:
+            if index is not None:
+                for hid in index.names:
+                    header_check.check_id(hid)
+                stats['from_index'] = True
+                return header_check.passed
+            for offset, lines in self.quick_lines(fasta, stats):
+                for line in lines:
+                    if line.startswith(b'>'):
+                        fields = line[1:].split(None, 1)
+                        header_check.check_id(fields[0].decode()
+                                              if fields else '')
+        return header_check.passed
+
+    def quick_gff3(self, gff):
+        '''check_seqid_attributes on the lines of quick_lines, each
+           sample checked on its own.  returns a provisional exit value
+        '''
+        findings = self.findings
+        fields = os.path.basename(gff).split('.')
+        validator = SampleValidator(self.logger, findings,
+                                    id_prefix='.'.join(fields[:4]) + '.',
+                                    name_prefix=fields[0])
+        with self.report.stage('quick') as stats:
+            for offset, lines in self.quick_lines(gff, stats):
+                validator.flush()
+                for number, line in enumerate(lines, 1):
+                    line = line.rstrip()
+                    if line.startswith(b'##FASTA'):
+                        break
+                    if not line or line.startswith(b'#'):
+                        continue
+                    if offset is not None:  # mid file, FASTA has no tabs
+                        if b'\t' not in line:
+                            continue
+                        number = '{} of the sample at byte {}'.format(
+                                                               number, offset)
+                    columns = line.split(b'\t')
+                    validator.feature(columns, number)
+                    if len(columns) != 9 or not self.fasta_ids:
+                        continue
+                    seqid = columns[0].decode().rstrip()
+                    if not self.check_gff3_seqid(seqid):
+                        findings.add(logging.ERROR, 'missing_seqid',
+                                     '{} not found in genome_main, line {}',
+                                     seqid, number)
+                    elif not self.check_gff3_end(seqid, columns):
+                        findings.add(logging.ERROR, 'seqid_end',
+                                     'feature end past {} length, line {}',
+                                     seqid, number)
+            validator.close()
+        return 0 if validator.passed else 1
+
+    def get_checksum(self, md5_file, check_me):
+        '''Get expected md5 checksum for check_me from md5_file'''
         logger = self.logger
-        fh = return_filehandle(md5_file)
-        hash_md5 = hashlib.md5()
-        check_sum_target = ''
-        switch = 0
-        with fh as copen:
-            for line in copen:
-                line = line.rstrip()
-                if not line or line.startswith('#'):
-                    continue
-                fields = line.split()
-                check_sum = fields[0]
-                filename = fields[1]
-                logger.debug('check_sum: {}, filename: {}'.format(
-                                                                  check_sum,
-                                                                  filename))
-                if not check_sum and filename:
-                    logger.error('Could not find sum and name for {}'.format(
-                                                                        line))
-                if filename == os.path.basename(check_me):
-                    logger.info('Checksum found for {}'.format(filename))
-                    check_sum_target = check_sum
-                    switch = 1
-        if not switch:
+        try:
+            manifest = read_manifest(md5_file)
+        except ValueError as e:
+            logger.error(e)
+            sys.exit(1)
+        filename = os.path.basename(check_me)
+        if filename not in manifest:
             logger.error('Could not find checksum for {}'.format(check_me))
             sys.exit(1)
-        with open(check_me, "rb") as copen:
-            for chunk in iter(lambda: copen.read(4096), b""):  # 4096 buffer
-                hash_md5.update(chunk)
-        target_sum = hash_md5.hexdigest()  # get sum
+        logger.info('Checksum found for {}'.format(filename))
+        return manifest[filename]
+
+    def get_hash_cache(self):
+        '''HashCache for this Detector or None if hash_cache was not set'''
+        if self.hash_cache is None and self.hash_cache_path:
+            self.hash_cache = HashCache(self.hash_cache_path)
+        return self.hash_cache
+
+    def cached_md5(self, check_me):
+        '''md5 of check_me from the hash cache if the file is unchanged'''
+        cache = self.get_hash_cache()
+        if not cache:
+            return None
+        cached = cache.get(fingerprint(check_me))
+        return cached['md5'] if cached else None
+
+    def compare_checksum(self, check_me, target_sum, check_sum_target):
+        '''Compare computed md5 for check_me to expected'''
+        logger = self.logger
         logger.debug(target_sum)
         logger.debug(check_sum_target)
         if target_sum != check_sum_target:  # compare sums
             logger.error(('Checksum for file {} {} '.format(check_me, 
                                                            target_sum) + 
-                          'did not match {}'.format(check_sum_target)))
+                          'did not match {}'.format(check_sum_target)),
+                         extra={'finding': 'checksum'})
             sys.exit(1)
         logger.info('Checksums checked out, moving on...')
 
-    def validate_doi(self, readme):
+    def validate_checksum(self, md5_file, check_me):
+        '''Get md5 checksum for file and compare to expected'''
+        check_sum_target = self.get_checksum(md5_file, check_me)
+        with self.report.stage('checksum') as stats:
+            digests = file_digests([check_me], cache=self.get_hash_cache())
+            target_sum = digests[check_me]['md5']  # get sum
+            self.compare_checksum(check_me, target_sum, check_sum_target)
+            stats['bytes'] = os.path.getsize(check_me)
+
+    def validate_manifest(self, md5_file):
+        '''Verify every file listed in md5_file, hashed on threads
+
+           reports missing, extra and mismatched files
+        '''
+        logger = self.logger
+        logger.info('Verifying all files in {}'.format(md5_file))
+        directory = os.path.dirname(md5_file)
+        with self.report.stage('checksum') as stats:
+            try:
+                result = verify_manifest(md5_file, self.checksum_threads,
+                                         self.get_hash_cache())
+            except ValueError as e:
+                logger.error(e)
+                sys.exit(1)
+            stats['bytes'] = sum(os.path.getsize(os.path.join(directory, n))
+                                 for n in result['ok'] + result['mismatched'])
+            stats['files'] = len(result['ok']) + len(result['mismatched'])
+        checksum = {'finding': 'checksum'}
+        for name in result['extra']:
+            logger.warning('{} is not listed in {}'.format(name, md5_file),
+                           extra=checksum)
+        for name in result['missing']:
+            logger.error('{} is listed in {} but missing'.format(name,
+                                                                  md5_file),
+                         extra=checksum)
+        for name in result['mismatched']:
+            logger.error('Checksum for {} did not match {}'.format(name,
+                                                                   md5_file),
+                         extra=checksum)
+        if result['missing'] or result['mismatched']:
+            sys.exit(1)
+        logger.info('{} files checked out, moving on...'.format(
+                                                          len(result['ok'])))
+
+    def get_dois(self, readme):
         '''Parse README.<key>.md and get publication or dataset DOIs
-        
-           Uses http://www.doi.org/factsheets/DOIProxy.html#rest-api
+
+           for a README.<key>.yml they come from its parsed fields
         '''
         logger = self.logger
-        publication_doi = ''
-        dataset_doi = ''
+        if readme.endswith('.yml'):
+            validator = self.get_metadata()
+            if not validator:
+                return {}
+            collection = self.collection_info(os.path.dirname(readme))
+            return validator.readme(readme, collection)['dois']
         object_dois = {}
         pub_doi_check = 0
         dataset_doi_check = 0
         fh = return_filehandle(readme)
-        logger.info('Checking README for DOIs: {}'.format(readme))
         with fh as ropen:
             for line in ropen:
                 line = line.rstrip()
@@ -357,23 +692,116 @@ class Detector:
                     dataset_doi_check = 0 # off
                     object_dois['dataset_doi'] = line
         logger.debug(object_dois)
+        return dict((d, doi) for d, doi in object_dois.items()
+                    if doi.lower() != 'none')
+
+    def get_doi_resolver(self):
+        '''DOIResolver for this Detector, made on first use'''
+        if self.doi_resolver is None:
+            self.doi_resolver = DOIResolver(self.doi_resolver_url,
+                                            self.doi_cache)
+        return self.doi_resolver
+
+    def prefetch_dois(self, directories):
+        '''Resolve the DOIs of every collection in one concurrent batch
+
+           validate_doi then answers from the resolver without waiting on
+           doi.org once per collection
+        '''
+        logger = self.logger
+        dois = []
+        for d in directories:
+            for c in [d.get('genome')] + (d.get('annotation') or []):
+                if not c:
+                    continue
+                readme = self.doi_readme(self.collection_info(c))
+                if len(readme) == 1:
+                    dois.extend(self.get_dois(readme[0]).values())
+        if dois:
+            logger.info('Resolving {} DOIs...'.format(len(set(dois))))
+            self.get_doi_resolver().resolve(dois)
+
+    def doi_readme(self, collection):
+        '''README.<key>.yml files of collection, README.<key>.md if none'''
+        if collection['readme_yml'] and self.get_metadata():
+            return collection['readme_yml']
+        return collection['readmes']
+
+    def get_metadata(self):
+        '''MetadataValidator for this Detector, False if disabled or PyYAML
+           or the template is not available
+        '''
+        if self.metadata is None:
+            self.metadata = False
+            if self.metadata_template:
+                try:
+                    self.metadata = MetadataValidator(self.metadata_template,
+                                                      self.metadata_cache,
+                                                      self.logger)
+                except (IOError, ValueError, AttributeError) as e:
+                    self.logger.warning('README and MANIFEST yml will not ' +
+                                        'be checked: {}'.format(e))
+        return self.metadata
+
+    def prefetch_metadata(self, directories):
+        '''Parse the README and MANIFEST yml of every collection at once
+
+           check_metadata then answers from the parsed files, the cache is
+           saved here so worker processes read it instead of parsing
+        '''
+        validator = self.get_metadata()
+        if not validator:
+            return
+        records = []
+        for d in directories:
+            for c in [d.get('genome')] + (d.get('annotation') or []):
+                if c:
+                    records.append(self.collection_info(c))
+        with self.report.stage('metadata'):
+            validator.scan(records)
+        validator.save()
+
+    def check_metadata(self, collection):
+        '''Check README.<key>.yml against the template and that every file
+           a MANIFEST.<key>.*.yml names is in the collection
+
+           returns False if any finding was an ERROR
+        '''
+        validator = self.get_metadata()
+        if not validator:
+            return True
+        findings = self.findings
+        passed = True
+        with self.report.stage('metadata'):
+            for level, msg, args in validator.check(collection):
+                findings.add(level, 'metadata', msg, *args)
+                if level >= logging.ERROR:
+                    passed = False
+        return passed
+
+    def validate_doi(self, readme):
+        '''Parse README.<key>.md and get publication or dataset DOIs
+        
+           Uses http://www.doi.org/factsheets/DOIProxy.html#rest-api
+        '''
+        logger = self.logger
+        logger.info('Checking README for DOIs: {}'.format(readme))
+        object_dois = self.get_dois(readme)
+        with self.report.stage('doi'):
+            results = self.get_doi_resolver().resolve(object_dois.values())
         for d in object_dois:  # search publication and dataset DOIs
-            if object_dois[d].lower() == 'none':
-                continue
             logger.info('checking {}: {}'.format(d, object_dois[d]))
-            url = 'https://doi.org/api/handles/{}'.format(object_dois[d])
-            try:  # check DOI against API
-                response = requests.get(url)
-            except ConnectionError as e:  # if connection error try to CURL
-                logger.error('Exception for url {}: {}'.format(url, e))
-                raise
-            logger.debug(response)
-            doi_json = json.loads(response.text)
-            logger.debug(doi_json)
-            if doi_json.get('responseCode') == 1:
+            valid = results[object_dois[d]]
+            if valid:
                 logger.info('DOI {}: {} Validated'.format(d, object_dois[d]))
+            elif valid is None:
+                logger.error('DOI {}: {} could not be resolved'.format(
+                                                               d,
+                                                               object_dois[d]),
+                             extra={'finding': 'doi'})
             else:
-                logger.error('DOI {}: {} INVALID'.format(d, object_dois[d]))
+                logger.error('DOI {}: {} INVALID'.format(d, object_dois[d]),
+                             extra={'finding': 'doi'})
 
     def check_dir_type(self, directory, check_sum, doi):
         '''Check the type of directory and perform workflow based on type
@@ -383,52 +811,54 @@ class Detector:
            check_sum and doi are bools.
         '''
         main_file = ''
-        file_type = ''
         logger = self.logger
-        dir_name = os.path.basename(directory)  # get dirname only
-        dir_test = len(dir_name.split('.'))
-        if dir_test < 3:
+        collection = self.collection_info(directory)  # listed once
+        if collection is None:
             return False
-        dir_type = dir_name.split('.')[-2]  # get gnm, ann, etc
-        glob_str = '{}/*'.format(directory)
-        if dir_type.startswith('gnm'):
+        file_type = collection['type']
+        if file_type == 'genome':
             logger.info('This is a genome directory.  Looking for genome_main')
-            glob_str += 'genome_main.fna.gz'  # glob main fasta
-            fasta = glob(glob_str)
+            fasta = collection['main']
             if len(fasta) != 1:
                 logger.warning('Multiple/0 genome_main found {}'.format(fasta))
                 return False
             main_file = fasta[0]
             logger.info('Found {}'.format(main_file))
-            file_type = 'genome'  # set type for return
-        elif dir_type.startswith('ann'):
+        elif file_type == 'annotation':
             logger.info(('This is an annotation directory. ' +  
                          'Looking for gene_models_main'))
-            glob_str += 'gene_models_main.gff3.gz'  # glob main gff
-            gff = glob(glob_str)
+            gff = collection['main']
             if len(gff) != 1:
                 logger.warning('Multiple/0 gene_models_main for {}'.format(gff))
                 return False
             main_file = gff[0]
             logger.info('Found {}'.format(main_file))
-            file_type = 'annotation'  # set type for return
         else:
-            logger.warning(('Format {} not recognized, '.format(dir_type) +
+            logger.warning(('Format {} not recognized, '.format(file_type) +
                           'should be ann or gnm.'))
             return False
+        if check_sum or doi:  # checking it, findings below are its
+            self.report.set_file(main_file, file_type)
         if check_sum:  # check checksums if True
             logger.info('Searching for checksum...')
-            check_glob = '{}/CHECKSUM.*.md5'.format(directory)
-            check_sum = glob(check_glob)  # get checksum file
+            check_sum = collection['checksums']  # get checksum file
             if len(check_sum) != 1:  # There should be one checksum file
                 logger.warning('Multiple/0 checksums for {}'.format(main_file))
                 return False
             check_sum_file = check_sum[0]
-            self.validate_checksum(check_sum_file, main_file)  # check checksum
-        if doi:  # check DOI if True and DOI found in README
+            if self.checksum_all:  # every listed file, main included
+                self.validate_manifest(check_sum_file)
+            elif file_type == 'genome':  # hashed in the check_fasta read
+                self.pending_checksums[main_file] = self.get_checksum(
+                                                                check_sum_file,
+                                                                main_file)
+            else:
+                self.validate_checksum(check_sum_file, main_file)  # check
+        if doi:  # check README and MANIFEST, then DOIs found in README
+            if not self.check_metadata(collection):  # fails the main file
+                self.failed_metadata.add(main_file)
             logger.info('Searching for DOIs in this directory...')
-            check_readme = '{}/README.*.md'.format(directory)
-            readme = glob(check_readme)
+            readme = self.doi_readme(collection)
             if len(readme) != 1:  # There should be one readme
                 logger.warning('Multiple/0 readmes for {}'.format(main_file))
                 return False
@@ -444,10 +874,20 @@ class Detector:
         if not check_file(genome):
             logger.error('Could not find {}'.format(genome))
             sys.exit(1)
+        self.report.set_file(genome, 'genome')
         passed = self.parse_filenames(genome)
-        if not passed and normalizer:
-            logger.info('Normalizing {}'.format(genome))
-            normalizer.normalize_genome_main(genome)
+        metadata_passed = genome not in self.failed_metadata
+        if not metadata_passed:  # found by check_dir_type
+            self.failed_metadata.discard(genome)
+            logger.warning('{} failed README/MANIFEST checks'.format(genome))
+        if self.quick:
+            self.log_verdict(genome, passed)
+        self.report.finish_file(passed and metadata_passed,
+                                self.findings.summarize(),
+                                provisional=bool(self.quick))
+        if not passed and normalizer:  # written during check_fasta
+            logger.info('Normalized {}'.format(genome))
+        return passed and metadata_passed
 
     def run_annotation(self, annotation):
         '''Run annotation workflow'''
@@ -458,56 +898,429 @@ class Detector:
         if not check_file(annotation):
             logger.error('Could not find {}'.format(annotation))
             sys.exit(1)
-        exit_val = self.parse_filenames(annotation)  # gt exit value
+        self.report.set_file(annotation, 'annotation')
+        if not self.fasta_ids:  # genome not checked in this run
+            self.fasta_ids = self.genome_index(annotation) or {}
+        companions = self.start_companions(annotation)
+        try:
+            exit_val = self.parse_filenames(annotation)  # validation value
+        except BaseException:
+            if companions:
+                companions.cancel()
+            raise
+        companions_passed = self.check_companions(annotation, companions)
         if exit_val:
-            logger.warning('{} Failed gff3validator'.format(annotation))
-        if normalizer and exit_val:  # gt said it wasn't clean, tidy
+            logger.warning('{} Failed gff3 validation'.format(annotation))
+        metadata_passed = annotation not in self.failed_metadata
+        if not metadata_passed:  # found by check_dir_type
+            self.failed_metadata.discard(annotation)
+            logger.warning('{} failed README/MANIFEST checks'.format(
+                                                                annotation))
+        if normalizer and exit_val:  # validation said it wasn't clean, tidy
             logger.info('tiding gff3 file {}'.format(annotation))
-            normalizer.tidy_gff3(annotation)
+            with self.report.stage('normalize') as stats:
+                normalizer.tidy_gff3(annotation)
+                stats['bytes'] = os.path.getsize(annotation)
+        if self.quick:
+            self.log_verdict(annotation, not exit_val)
+        passed = companions_passed and metadata_passed
+        self.report.finish_file(not exit_val and passed,
+                                self.findings.summarize(),
+                                provisional=bool(self.quick))
+        return exit_val or not passed
+
+    def log_verdict(self, path, passed):
+        '''log the provisional outcome of a quick check'''
+        verdict = 'passed' if passed else 'failed'
+        self.logger.info('Quick check of {}: provisionally {}, '.format(
+                                                             path, verdict) +
+                         'checksums, gt and the rest of the file not checked')
+
+    def start_companions(self, annotation):
+        '''start reading annotation's protein, CDS and mRNA FASTAs
+
+           they are read on threads while the gff3 is checked, which
+           collects its mRNA IDs in self.transcripts.  None if there are
+           none or companion_threads is 0
+        '''
+        self.transcripts = None
+        if not self.companion_threads or self.quick:
+            return None
+        record = self.collection_info(os.path.dirname(annotation))
+        companions = record and record['companions']
+        if not companions:
+            return None
+        self.transcripts = TranscriptIDs()
+        return CompanionScan(companions, self.companion_threads).start()
+
+    def check_companions(self, annotation, companions):
+        '''Confirms the companion FASTAs match gene_models_main 1:1
+
+           protein and CDS records should be the mRNAs with CDS, mrna
+           records every mRNA, and all IDs should start with the
+           annotation prefix.  Orphans on either side are reported.
+           returns True if everything matched
+        '''
+        transcripts = self.transcripts
+        self.transcripts = None
+        if not companions:
+            return True
+        logger = self.logger
+        findings = self.findings
+        prefix = '.'.join(os.path.basename(annotation).split('.')[:4]) + '.'
+        raw_prefix = prefix.encode()
+        passed = True
+        with self.report.stage('companions') as stats:
+            results = companions.results()
+            stats['bytes'] = sum(r[1] for r in results.values())
+        for kind in sorted(results):
+            fasta_ids = results[kind][0]
+            fasta = os.path.basename(companions.companions[kind])
+            ids = fasta_ids.ids
+            missing, orphans = compare(getattr(transcripts, EXPECTED[kind]),
+                                       ids)
+            for seqid in missing:
+                findings.add(logging.ERROR, 'companion',
+                             'mRNA {} has no record in {}', seqid.decode(),
+                             fasta)
+            for seqid in orphans:
+                findings.add(logging.ERROR, 'companion',
+                             '{} in {} is not an mRNA in gene_models_main',
+                             seqid.decode(), fasta)
+            for seqid in fasta_ids.duplicates:
+                findings.add(logging.ERROR, 'companion',
+                             '{} is in {} more than once', seqid.decode(),
+                             fasta)
+            unprefixed = [i for i in ids if not i.startswith(raw_prefix)]
+            for seqid in sorted(unprefixed):
+                findings.add(logging.ERROR, 'companion',
+                             '{} in {} should start with {}', seqid.decode(),
+                             fasta, prefix)
+            if missing or orphans or fasta_ids.duplicates or unprefixed:
+                passed = False
+            else:
+                logger.info('{} matches gene_models_main, {} records'.format(
+                                                            fasta, len(ids)))
+        return passed
+
+    def collection_info(self, directory):
+        '''scan_collection record for directory, listed once per run'''
+        directory = os.path.abspath(directory)
+        if directory not in self.collections:
+            self.collections[directory] = scan_collection(directory)
+        return self.collections[directory]
+
+    def get_datastore(self, directory):
+        '''DataStoreIndex covering directory, walked once per run'''
+        directory = os.path.abspath(directory)
+        datastore = self.datastore
+        if (datastore is None or (directory != datastore.root and
+                                  directory not in datastore.collections)):
+            self.logger.info('Indexing collections under {}'.format(
+                                                                 directory))
+            datastore = DataStoreIndex(directory)
+            self.collections.update(datastore.collections)
+            self.datastore = datastore
+            catalog = self.get_catalog()
+            if catalog is not None:  # what the walk found, by fingerprint
+                catalog.update(datastore.collections.values(),
+                               [datastore.root])
+        return datastore
 
     def get_files(self, directory):
         '''Get all related files, start with gnm return list of dicts
 
-           currently checks for annotations after finding genome
+           currently checks for annotations after finding genome.
+           directory can be an organism directory or the data store root,
+           it is walked once by DataStoreIndex
         
            for processing
         '''
         logger = self.logger
-        gnm_glob = '{}/*/*.gnm[0-9]*'.format(directory)
-        gnm_list = glob(gnm_glob)
-        related_files = []
-        logger.info('Globbing files to find main elements...')
-        for g in gnm_list:
-            if g.endswith('genome_main.fna.gz'):  # add more checks, transcriptome etc
-#            elif g.endswith('transcriptome_main.fna.gz')  # others
-                logger.info('Found genome {}'.format(g))
-                filename = os.path.basename(g)
-                prefix = '.'.join(filename.split('.')[:3])
-                ann_glob = '{}/*/{}.ann[0-9]*gene_models_main.gff3.gz'.format(
-                                                                    directory,
-                                                                    prefix)
-                anns = glob(ann_glob)
+        related_files = self.get_datastore(directory).related_files()
+        for files_obj in related_files:  # add more checks, transcriptome etc
+            logger.info('Found genome {}'.format(files_obj['genome']))
+            for a in files_obj['annotation'] or []:
+                logger.info('Found gene_models {}'.format(a))
+        return related_files
+
+    def check_collection(self, collection):
+        '''Run genome and annotation workflows for one object from get_files
+
+           returns a dict of per collection results
+        '''
+        logger = self.logger
+        genome = collection.get('genome')  # get and check
+        annotation = collection.get('annotation')  # get and check
+        result = collection_result(collection)
+        self.fasta_ids = {}  # not carried over from the last collection
+        full = not self.quick  # checksums, README and DOIs
+        logger.info('Checking Genome:{} and Annotation:{}'.format(genome,
+                                                                 annotation))
+        if genome:
+            checked = self.check_dir_type(genome, full, full)
+            if checked and checked[1] == 'genome':
+                result['genome_passed'] = self.run_genome(checked[0])
+            else:  # False if its files are missing or doubled
+                logger.warning('Assembly does not look like a genome')
+                result['failed'] = 'could not check {}'.format(genome)
+                result['files'] = self.report.take(failed=True)
+                return result
+        if annotation:
+            for a in annotation:
+                checked = self.check_dir_type(a, full, full)
+                if checked and checked[1] == 'annotation':
+                    exit_val = self.run_annotation(checked[0])
+                    result['annotation_exit'][a] = exit_val
+                else:
+                    logger.warning('Annotation looks odd...')
+                    result['failed'] = 'could not check {}'.format(a)
+                    continue
+        if not (genome or annotation):
+            logger.warning('No Files found for {}'.format(collection))
+        logger.info('Done Checking, Proceeding to next target...')
+        result['files'] = self.report.take(  # entries travel with it
+                                      failed=bool(result['failed']))
+        return result
+
+    def check_collections(self, directories):
+        '''Check every collection object from get_files
+
+           with jobs > 1 collections are fanned out to a process pool.  Log
+           records from each worker are replayed here in collection order.
+           Either way a failed collection does not stop the others, its
+           result holds the reason in failed.
+
+           with a snapshot, collections whose files have not changed since
+           they last passed through here are not checked again, their
+           result and warnings are replayed from the snapshot.
+        '''
+        logger = self.logger
+        snapshot = self.get_snapshot()
+        results = [None] * len(directories)
+        states = {}
+        todo = []
+        for i, d in enumerate(directories):
+            if snapshot is None:
+                todo.append(i)
+                continue
+            states[i] = self.collection_state(d)
+            entry = snapshot.get(snapshot_key(d), states[i])
+            if entry is None:
+                todo.append(i)
+                continue
+            logger.info('{} unchanged since last check, replaying'.format(
+                                                              snapshot_key(d)))
+            for level, msg in entry['messages']:  # already in the entries
+                logger.log(level, msg, extra={'replayed': True})
+            self.report.add(entry['result'].get('files'), cached=True)
+            results[i] = entry['result']
+        if snapshot is not None:
+            logger.info('{} of {} collections changed'.format(len(todo),
+                                                              len(directories)))
+        try:
+            checked = self.run_collections([directories[i] for i in todo])
+            for i, (result, messages) in zip(todo, checked):
+                results[i] = result
+                self.report.add(result.get('files'))
+                if snapshot is None:
+                    continue
+                key = snapshot_key(directories[i])
+                if result['failed']:  # always check again
+                    snapshot.forget(key)
+                else:
+                    snapshot.put(key, states[i], result, messages)
+        finally:  # keep what was checked before an exit
+            if snapshot is not None:
+                snapshot.save()
+            self.catalog_results(directories, results)
+        self.collection_results = results
+        return results
+
+    def catalog_results(self, directories, results):
+        '''record each collection's part of results in the catalog'''
+        catalog = self.get_catalog()
+        if catalog is None or self.quick:  # provisional, not recorded
+            return
+        for d, result in zip(directories, results):
+            if result is None:  # not reached before an exit
+                continue
+            if d.get('genome'):
+                passed = result['genome_passed']
+                if result['failed'] or passed is None:
+                    passed = False
+                catalog.put_result(d['genome'], bool(passed), result)
+            for a in d.get('annotation') or []:
+                exit_val = result['annotation_exit'].get(a)
+                passed = not result['failed'] and exit_val is not None
+                catalog.put_result(a, passed and not exit_val, result)
+
+    def run_collections(self, directories):
+        '''Check collection objects, yield (result, warnings) in order
+
+           warnings are the [level, message] pairs logged at WARNING or
+           above, for the snapshot
+        '''
+        logger = self.logger
+        jobs = self.jobs
+        if not self.quick:
+            self.prefetch_metadata(directories)
+            self.prefetch_dois(directories)
+        if jobs < 2 or len(directories) < 2:
+            for d in directories:
+                log_buffer = _RecordBuffer()
+                log_buffer.setLevel(logging.WARNING)
+                logger.addHandler(log_buffer)
+                try:
+                    result = self.check_collection(d)
+                except SystemExit as e:  # as a worker would, move on
+                    result = collection_result(d,
+                                               'exit status {}'.format(e.code))
+                    self.findings.summarize()  # not carried to the next
+                    logger.error('Collection {} failed: {}'.format(
+                                                             d, result['failed']))
+                    result['files'] = self.report.take(failed=True)
+                finally:
+                    logger.removeHandler(log_buffer)
+                yield (result, warning_messages(log_buffer.records))
+            return
+        logger.info('Checking {} collections with {} jobs'.format(
+                                                              len(directories),
+                                                              jobs))
+        level = logger.getEffectiveLevel()
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(check_collection_worker, self.options,
+                                   level, d, self.collection_records(d))
+                       for d in directories]
+            for d, future in zip(directories, futures):  # keep input order
+                try:
+                    result, records = future.result()
+                except Exception as e:  # worker died, report and move on
+                    logger.error('Worker failed for {}: {}'.format(d, e))
+                    result = collection_result(d, str(e))
+                    records = []
+                for record in records:
+                    record.replayed = True  # the worker's report has it
+                    logger.handle(record)
+                if result['failed']:
+                    logger.error('Collection {} failed: {}'.format(
+                                                             d, result['failed']))
+                yield (result, warning_messages(records))
+
+    def get_catalog(self):
+        '''Catalog of the data store, None if disabled'''
+        if self.catalog is None and self.catalog_path:
+            self.catalog = Catalog(self.catalog_path, self.logger)
+        return self.catalog
+
+    def get_snapshot(self):
+        '''Snapshot of earlier runs, None if disabled'''
+        if self.snapshot is None and self.snapshot_path and not self.quick:
+            self.snapshot = Snapshot(self.snapshot_path)
+        return self.snapshot
+
+    def collection_state(self, collection):
+        '''file fingerprints for one get_files object and the options that
+           change its outcome
+        '''
+        records = [self.collection_info(p) for p in
+                   collection_paths(collection)]
+        settings = {'checksum_all': bool(self.checksum_all),
+                    'normalize': bool(self.normalize),
+                    'gt_path': self.gt_path,
+                    'companions': bool(self.companion_threads)}
+        return collection_state([r for r in records if r], settings)
+
+    def collection_records(self, collection):
+        '''scan_collection records for one get_files object, for workers'''
+        return dict((p, self.collections[p])
+                    for p in collection_paths(collection)
+                    if p in self.collections)
+
+    def directory_collections(self, directory):
+        '''get_files objects for directory
+
+           directory can be a genome or annotation collection, an organism
+           directory or the data store root
+        '''
+        logger = self.logger
+        directories = []  # list to send to check methods
+        datastore = self.get_datastore(directory)  # one walk
+        dir_check = self.check_dir_type(directory, False, False)
+        if not dir_check:  # maybe dir is organism dir
+            logger.info('Directory is not a type.  Checking if organism.')
+            directories = self.get_files(directory)  # get object for loop
+        else:
+            dir_obj = {'genome': '', 'annotation': []}  # object to append
+            if dir_check[1] == 'genome':
+                dir_obj['genome'] = directory
+                anns = datastore.annotations_for(directory)
                 if not anns:
-                    logger.debug('No genemodels main for {}'.format(filename))
-                    anns = None
-                elif len(anns) > 1:
-        #            logger.warning('Multiple gene models fround for {}'.format(
-        #                                                             filename))
-        #            continue
-                    t_anns = []
-                    for a in anns:
-                        t_anns.append(os.path.dirname(a))
-                    anns = t_anns
+                    logger.debug('No annotation found for {}'.format(
+                                                                directory))
+                dir_obj['annotation'] = anns
+                directories.append(dir_obj)  # append object
+            elif dir_check[1] == 'annotation': 
+                genomes = datastore.genomes_for(directory)
+                if not genomes:  # all annotations require a genome
+                    logger.error('No genomes found for {}'.format(
+                                                                directory))
+                    sys.exit(1)
+                elif len(genomes) > 1:  # should only be one genome
+                    logger.error('Multiple genomes found for {}'.format(
+                                                                directory))
+                    sys.exit(1)
                 else:
-                    logger.info('Found gene_models {}'.format(anns[0]))
-                    anns = [os.path.dirname(anns[0])]
-                files_obj = {'genome': os.path.dirname(g), 
-                             'annotation': anns}
-                related_files.append(files_obj)
+                    dir_obj['genome'] = genomes[0]
+                    dir_obj['annotation'] = [directory]
+                    directories.append(dir_obj)
             else:
-                logger.debug('File {} not cannonical will not check'.format(g))
-                continue
-        return related_files
+                logger.error('Directory {} is not cannonical'.format(
+                                                                directory))
+                sys.exit(1)
+        return directories
+
+    def watch_directory(self, directory):
+        '''Check collections under directory again as files land in them
+
+           changes are gathered until none have been seen for watch_delay
+           seconds, so an upload is checked once it is complete.  Only
+           the collections that changed are checked, until interrupted.
+        '''
+        logger = self.logger
+        watcher = make_watcher(directory, self.watch_delay)
+        logger.info('Watching {} with {}'.format(directory,
+                                                 type(watcher).__name__))
+        changed = set()
+        try:
+            while True:
+                found = watcher.changes(self.watch_delay if changed else None)
+                if found:
+                    changed.update(found)
+                    continue
+                if not changed:
+                    continue
+                targets = set(collection_dir(p, directory) for p in changed)
+                everything = directory in changed  # watcher lost events
+                changed = set()
+                self.datastore = None  # walk again, collections come and go
+                self.collections = {}
+                try:
+                    directories = self.directory_collections(directory)
+                except SystemExit:
+                    continue  # logged, wait for the next change
+                batch = [d for d in directories if everything or
+                         targets.intersection(collection_paths(d))]
+                if not batch:
+                    continue
+                logger.info('Changes in {} collections'.format(len(batch)))
+                self.check_collections(batch)
+                self.write_report()
+                logger.info('Watching {}'.format(directory))
+        except KeyboardInterrupt:
+            logger.info('Stopped watching {}'.format(directory))
+        finally:
+            watcher.close()
 
     def detect_incongruencies(self, **kwargs):
         '''Initiate and control workflow
@@ -521,93 +1334,162 @@ class Detector:
         genome = self.genome
         annotation = self.annotation
         directory = self.directory
-        if directory:  # if the user provided a directory check and find files
-            directory = os.path.abspath(directory)
-            if not os.path.isdir(directory):
-                logger.error('could not find {}'.format(directory))
-                sys.exit(1)
-            directories = []  # list to send to check methods
-            dir_check = self.check_dir_type(directory, False, False)
-            if not dir_check:  # maybe dir is organism dir
-                logger.info('Directory is not a type.  Checking if organism.')
-                directories = self.get_files(directory)  # get object for loop
-            else:
-                dir_obj = {'genome': '', 'annotation': []}  # object to append
-                parent_dir = os.path.dirname(directory)
-                target_dir = os.path.basename(directory)
-                prefix = '.'.join(target_dir.split('.')[:2])
-                if dir_check[1] == 'genome':
-                    dir_obj['genome'] = directory
-                    anno_glob = ('{}/{}.ann[0-9]*/'.format(parent_dir, prefix)+ 
-                                 '*gene_models_main.gff3.gz')
-                    anns = glob(anno_glob)
-                    if not anns:
-                        logger.debug('No annotation found for {}'.format(
-                                                                    directory))
-                        directories.append(dir_obj)  # append object
-                    else:
-                        annotations = []
-                        for a in anns:
-                            annotations.append(os.path.dirname(a))  # list
-                        dir_obj['annotation'] = annotations
-                        directories.append(dir_obj)  # append object
-                elif dir_check[1] == 'annotation': 
-                    geno_glob = ('{}/{}*/'.format(parent_dir, prefix) + 
-                                 '*genome_main.fna.gz')
-                    genomes = glob(geno_glob)
-                    if not genomes:  # all annotations require a genome
-                        logger.error('No genomes found for {}'.format(
-                                                                    directory))
-                        sys.exit(1)
-                    elif len(genomes) > 1:  # should only be one genome
-                        logger.error('Multiple genomes found for {}'.format(
-                                                                    directory))
+        try:
+            if directory:  # the user provided a directory, find its files
+                directory = os.path.abspath(directory)
+                if not os.path.isdir(directory):
+                    logger.error('could not find {}'.format(directory))
+                    sys.exit(1)
+                if self.catalog_only:  # the walk updates it, nothing checked
+                    if not self.catalog_path:
+                        logger.error('--catalog_only needs --catalog')
                         sys.exit(1)
-                    else:
-                        dir_obj['genome'] = os.path.dirname(genomes[0])
-                        dir_obj['annotation'] = [directory]
-                        directories.append(dir_obj)
-                else:
-                    logger.error('Directory {} is not cannonical'.format(
-                                                                    directory))
+                    self.get_datastore(directory)
+                    logger.info('Catalog {} is up to date'.format(
+                                                            self.catalog_path))
+                    return True
+                directories = self.directory_collections(directory)
+                logger.debug(directories)  # see what is going into loop
+                results = self.check_collections(directories)
+                logger.info('Done')
+                if self.watch:
+                    self.watch_directory(directory)
+                    return True
+                failed = [r for r in results if r and r['failed']]
+                if failed:
+                    logger.error('{} of {} collections failed'.format(
+                                                              len(failed),
+                                                              len(results)))
                     sys.exit(1)
-            logger.debug(directories)  # see what is going into loop
-            for d in directories:
-                genome = d.get('genome')  # get and check
-                annotation = d.get('annotation') # get and check
-                logger.info('Checking Genome:{} and Annotation:{}'.format(
-                                                                 genome,
-                                                                 annotation))
-                if genome:
-                    main_file, file_type = self.check_dir_type(genome, True, 
-                                                               True)
-                    if file_type == 'genome':
-                        self.run_genome(main_file)
-                    else:
-                        logger.warning('Assembly does not look like a genome')
-                        continue
-                if annotation:
-                    for a in annotation:
-                        main_file, file_type = self.check_dir_type(a, True,
-                                                                   True)
-                        if file_type == 'annotation':
-                            self.run_annotation(main_file)
-                        else:
-                            logger.warning('Annotation looks odd...')
-                            continue
-                if not (genome or annotation):
-                    logger.warning('No Files found for {}'.format(d))
-#                else:
-#                    logger.warning('Did not recognize type {}'.format(
-#                                                                 file_type))
-#                    continue
-                logger.info('Done Checking, Proceeding to next target...')
-            logger.info('Done')
-            return True
-        if genome:
-            self.run_genome(genome)
-        if annotation:
-            self.run_annotation(annotation)
-            
-#         logger.info('Collecting report...') #  implement reporting at end
-        logger.info('DONE')
+                return True
+            if genome:
+                self.run_genome(genome)
+            if annotation:
+                self.run_annotation(annotation)
+            logger.info('DONE')
+        finally:  # findings of a later Detector are not this one's
+            self.close()
+
+    def close(self):
+        '''stop recording findings logged to the shared logger'''
+        self.logger.removeHandler(self.report)
+
+    def write_report(self):
+        '''Fill incongruencies from the report, write it if report is set'''
+        self.incongruencies = self.report.incongruencies()
+        if self.report_path:
+            self.report.write(self.report_path)
+            self.logger.info('Wrote report {}'.format(self.report_path))
+
+
+class FastaHeaderCheck(FastaIndexer):
+    '''Stream consumer checking genome_main headers start with true_header
+
+       header ids, lengths and offsets are collected for the sequence index
+    '''
+    def __init__(self, true_header, logger, findings=None):
+        FastaIndexer.__init__(self)
+        self.true_header = true_header
+        self.logger = logger
+        self.findings = findings or Findings(logger)
+        self.passed = True
+
+    def header(self, header):
+        if not self.seqid:
+            self.logger.error('Header {} looks odd...'.format(header))
+            sys.exit(1)
+        self.check_id(self.seqid.decode())  # get id portion of header
+
+    def check_id(self, hid):
+        '''warn and fail if hid does not start with true_header'''
+        if not hid.startswith(self.true_header):
+            self.findings.add(logging.WARNING, 'header',
+                              'Inconsistency {} Should be {}.{}', hid,
+                              self.true_header, hid)
+            self.passed = False
+
+
+def collection_paths(collection):
+    '''genome and annotation collection paths of one get_files object'''
+    paths = [collection.get('genome')] + (collection.get('annotation') or [])
+    return [p for p in paths if p]
+
+
+def snapshot_key(collection):
+    '''one get_files object is one snapshot entry, keyed on its genome'''
+    return collection.get('genome') or ','.join(collection['annotation'])
+
+
+def collection_dir(path, root):
+    '''collection directory holding path, None if path is not in one'''
+    root = os.path.abspath(root)
+    path = os.path.abspath(path)
+    while path == root or path.startswith(root + os.sep):
+        if parse_collection(os.path.basename(path)):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return None
+
+
+def warning_messages(records):
+    '''[level, message] for log records at WARNING or above'''
+    return [[r.levelno, r.getMessage()] for r in records
+            if r.levelno >= logging.WARNING]
+
+
+def collection_result(collection, failed=None):
+    '''Empty per collection result, failed holds the reason if any'''
+    return {'genome': collection.get('genome'),
+            'annotation': collection.get('annotation'),
+            'genome_passed': None, 'annotation_exit': {}, 'failed': failed,
+            'files': []}
+
+
+class _RecordBuffer(logging.Handler):
+    '''Hold log records in a worker so the parent can replay them in order'''
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        record.msg = record.getMessage()  # flatten args so record pickles
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+
+def check_collection_worker(options, log_level, collection, records=None):
+    '''Check one collection in a pool worker
+
+       checks that end in sys.exit are caught here so one bad collection
+       does not take the worker and the rest of the run down with it.
+       records are the parent's scan_collection records so the worker
+       does not list the collections again.
+
+       returns (result, log records)
+    '''
+    logger = logging.getLogger('detect_incongruencies.worker')
+    logger.propagate = False  # parent handlers replay these
+    logger.setLevel(log_level)
+    log_buffer = _RecordBuffer()
+    logger.handlers = [log_buffer]
+    options = dict(options, logger=logger, jobs=1)
+    detector = None
+    try:
+        detector = Detector(**options)
+        detector.collections.update(records or {})
+        result = detector.check_collection(collection)
+    except SystemExit as e:
+        result = collection_result(collection,
+                                   'exit status {}'.format(e.code))
+    except Exception as e:
+        logger.exception('Unexpected error in {}'.format(collection))
+        result = collection_result(collection, repr(e))
+    if detector and result['failed']:  # what it found before failing
+        result['files'] = detector.report.take(failed=True)
+    if detector:
+        detector.close()
+    return (result, log_buffer.records)
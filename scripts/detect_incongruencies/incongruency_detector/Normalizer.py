@@ -3,10 +3,14 @@
 import os
 import sys
 import logging
-import re
 import subprocess
-import gzip
-from file_helpers import check_file, return_filehandle
+from .file_helpers import byte_lines
+from .pipeline import StreamPipeline
+from .fasta_scanner import FastaScanner
+from .bgzf import BGZFWriter, is_bgzf, splice
+from .sequence_index import SequenceIndex
+from .gff3_sorter import GFF3Sorter, SORT_MEMORY
+from .gff3_validator import GFF3Validator
 
 
 class Normalizer:
@@ -35,11 +39,17 @@ class Normalizer:
         self.genome = kwargs.get('genome')
         self.annotation = kwargs.get('annotation')
         self.gt_path = kwargs.get('gt_path')
-        if self.annotation and not self.gt_path:
-            logger.error('gt_path, /path/to/genome_tools must be provided')
-            sys.exit(1)
         if self.gt_path:
             self.gt_path = os.path.abspath(self.gt_path)
+        self.compress_level = kwargs.get('compress_level')
+        if self.compress_level is None:
+            self.compress_level = 6
+        self.compress_threads = kwargs.get('compress_threads') or 4
+        self.sort_memory = kwargs.get('sort_memory') or SORT_MEMORY
+        self.sort_tmp = kwargs.get('sort_tmp')  # None is the system default
+        self.gff3_compress = kwargs.get('gff3_compress') or 'bgzf'
+        self.gff3_order = kwargs.get('gff3_order') or 'position'
+        self.gt_tidy = kwargs.get('gt_tidy')  # tidy with gt, not sort_gff3
 #        self.fasta_ids = {}
 #        self.genome_attributes = {'filename': '', 'version': '',
 #                                  'prefix': '', 'type': '', 'build': '',
@@ -48,69 +58,219 @@ class Normalizer:
 #                               'Annotation Name': [], 'GFF File': []}
         self.logger.info('Initialized Normalizer')
 
+    def genome_main_consumer(self, genome):
+        '''return a GenomeMainWriter for genome to add to a StreamPipeline
+
+           used by normalize_genome_main for genomes that are not BGZF.
+           Output is BGZF with .fai and .gzi
+        '''
+        file_name = os.path.basename(genome)  # get filename
+        prefix = '.'.join(file_name.split('.')[:3])  # get correct prefix
+        self.logger.debug(prefix)
+        fasta_out = './{}.normalized'.format(file_name)
+        return GenomeMainWriter(prefix, fasta_out, self.logger,
+                                self.compress_level, self.compress_threads)
+
+    def header_edits_consumer(self, genome):
+        '''return a HeaderEdits for a BGZF genome to add to a
+           StreamPipeline, for splice_genome_main after the read
+        '''
+        prefix = '.'.join(os.path.basename(genome).split('.')[:3])
+        return HeaderEdits(prefix, self.logger)
+
     def normalize_genome_main(self, genome):
         '''accepts the genome prefix and a key from the legfed_registry
 
            https://github.com/LegumeFederation/datastore/issues/23
+
+           BGZF genomes go through splice_genome_main
         '''
-        logger = self.logger
-        file_name = os.path.basename(genome)  # get filename 
-        prefix = '.'.join(file_name.split('.')[:3])  # get correct prefix
-        logger.debug(prefix)
-        fh = return_filehandle(genome)
-        re_header = re.compile("^>(\S+)\s*(.*)")  # match header
-        fasta_out = gzip.open('./{}.normalized'.format(file_name), 'wb')
-        with fh as gopen:
-            for line in gopen:
-                line = line.rstrip()
-                if re_header.match(line):
-                    parsed_header = re_header.search(line).groups()
-                    logger.debug(line)
-                    logger.debug(parsed_header)
-                    hid = ''
-                    desc = ''
-                    new_header = ''
-                    if isinstance(parsed_header, basestring):  # check tuple
-                        hid = parsed_header
-                        new_header = '>{}.{}'.format(prefix, hid)
-                        logger.debug(hid)
-                    else:
-                        if len(parsed_header) == 2:  # header and description
-                            hid = parsed_header[0]  # header
-                            desc = parsed_header[1]  # description
-                            new_header = '>{}.{} {}'.format(prefix, hid, desc)
-#                    normalized_header = '>'
-                            logger.debug(hid)
-                            logger.debug(desc)
-                            logger.debug(new_header)
-                        else:
-                            logger.error('header {} looks odd...'.format(line))
-                            sys.exit(1)
-                    fasta_out.write(new_header + '\n')  # write new header
-                else:  # sequence lines
-                    fasta_out.write(line + '\n')
-        fasta_out.close()
+        if is_bgzf(genome):
+            self.splice_genome_main(genome)
+            return
+        pipeline = StreamPipeline(genome)
+        pipeline.add_consumer(self.genome_main_consumer(genome))
+        pipeline.run()
+
+    def splice_genome_main(self, genome, edits=None):
+        '''write ./<genome>.normalized from a BGZF genome, recompressing
+           only the blocks with headers that change
+
+           edits is the HeaderEdits of a read of genome already done,
+           otherwise genome is read once to find them.  The output is
+           the same as genome_main_consumer writes, BGZF with .fai and
+           .gzi, in about the time it takes to copy the file
+        '''
+        if edits is None:
+            pipeline = StreamPipeline(genome)
+            edits = pipeline.add_consumer(self.header_edits_consumer(genome))
+            pipeline.run()
+        fasta_out = './{}.normalized'.format(os.path.basename(genome))
+        blocks = splice(genome, fasta_out, edits.edits, self.compress_level,
+                        self.compress_threads)
+        SequenceIndex(edits.out_records).write_fai(fasta_out + '.fai')
+        self.logger.info('Rewrote {} headers of {}, '.format(len(edits.edits),
+                                                             genome) +
+                         '{} blocks compressed'.format(blocks))
+        return fasta_out
+
+    def sort_gff3(self, gff, sorted_out=None):
+        '''sort gff by seqid and start, children after their parent
+
+           memory bounded, see GFF3Sorter.  writes ./<gff>.sorted.gz
+           unless sorted_out is given and returns its path.  BGZF output
+           in position order gets a tabix index, query it with
+           tabix.TabixReader or tabix.query
+        '''
+        if not sorted_out:
+            sorted_out = './{}.sorted.gz'.format(os.path.basename(gff))
+        sorter = GFF3Sorter(self.logger, self.sort_memory, self.sort_tmp,
+                            self.gff3_compress, self.compress_level,
+                            self.compress_threads, self.gff3_order)
+        features = sorter.sort(gff, sorted_out)
+        self.logger.info('Sorted {} features from {} into {}'.format(
+                                                   features, gff, sorted_out))
+        if sorter.index_path:
+            self.logger.info('Wrote index {}'.format(sorter.index_path))
+        return sorted_out
+
+    def check_gff3(self, gff):
+        '''structural checks of a tidied gff3, non zero if they failed'''
+        validator = GFF3Validator(self.logger)
+        lines = 0
+        for line in byte_lines(gff):
+            lines += 1
+            if line.startswith(b'##FASTA'):
+                break
+            if line.startswith(b'###'):
+                validator.flush()
+            elif line.strip() and not line.startswith(b'#'):
+                validator.feature(line.rstrip().split(b'\t'), lines)
+        validator.close()
+        return 0 if validator.passed else 1
 
     def tidy_gff3(self, gff):
-        '''Performs gt gff -sort -tidy as parameterized by:
+        '''sort gff with sort_gff3, or with gt_tidy performs
+           gt gff -sort -tidy as parameterized by:
 
            https://github.com/genometools/genometools/wiki/speck-User-manual
         '''
         logger = self.logger
         gt_path = self.gt_path  # path to gt tool
-        gff = os.path.basename(gff)
-        gt_report = './{}_gt_gff3_tidy_report.txt'.format(gff)  # gt outfile
-        tidy_out = './{}.tidy'.format(gff)  # tidied gff
-        gt_cmd = ('{}/gt gff3 -sort -tidy -retainids -force '.format(gt_path) +
-                  '-o {} -gzip {} 2> {}'.format(tidy_out, gff, gt_report))
-        logger.debug(gt_cmd)
-        exit_val = subprocess.call(gt_cmd, shell=True)
-        if exit_val:
-            logger.error('Exit value of gt gff3 tidy !=0: {}'.format(exit_val))
+        gff_name = os.path.basename(gff)
+        tidy_out = './{}.tidy'.format(gff_name)  # tidied gff
+        if not self.gt_tidy:
+            tidy_out = self.sort_gff3(gff, tidy_out + '.gz')
+        elif not gt_path:
+            logger.error('gt_path is needed to tidy with gt')
             sys.exit(1)
-        tidy_out = tidy_out + '.gz'
+        else:
+            gt_report = './{}_gt_gff3_tidy_report.txt'.format(gff_name)
+            gt_cmd = ('{}/gt gff3 -sort -tidy -retainids '.format(gt_path) +
+                      '-force -o {} -gzip {} 2> {}'.format(tidy_out, gff,
+                                                          gt_report))
+            logger.debug(gt_cmd)
+            exit_val = subprocess.call(gt_cmd, shell=True)
+            if exit_val:
+                logger.error('Exit value of gt gff3 tidy !=0: {}'.format(
+                                                                  exit_val))
+                sys.exit(1)
+            tidy_out = tidy_out + '.gz'
         exit_val = self.check_gff3(tidy_out)
         if exit_val:
             logger.error('Tidy failed validation!')
             sys.exit(1)
         logger.debug(exit_val)
+
+
+def normalize_header(prefix, header, logger):
+    '''header with prefix. in front of its id if it is not there yet,
+       fields joined by one space
+    '''
+    fields = header.split(None, 1)
+    if not fields:
+        logger.error('header {} looks odd...'.format(header))
+        sys.exit(1)
+    if not fields[0].startswith(prefix):  # header id
+        fields[0] = prefix + b'.' + fields[0]
+    return fields[0], b' '.join(fields)
+
+
+class GenomeMainWriter(FastaScanner):
+    '''Stream consumer writing genome_main with <prefix>.<hid> headers
+
+       sequence payload is copied through in the chunks it arrives in.
+       Output is BGZF compressed on threads, with <out>.fai built from the
+       records as they are written and <out>.gzi, so it can be served
+       without another recompression.
+    '''
+    def __init__(self, prefix, fasta_out, logger, level=6, threads=4):
+        FastaScanner.__init__(self)
+        self.prefix = prefix.encode()
+        self.fasta_out = fasta_out
+        self.logger = logger
+        self.fh = BGZFWriter(fasta_out, level, threads)
+        self.out_records = []  # .fai records of the output
+        self.out_seq_offset = 0
+
+    def header(self, header):
+        out_id, header = normalize_header(self.prefix, header, self.logger)
+        self.out_id = out_id.decode()
+        self.fh.write(b'>' + header + b'\n')
+        self.out_seq_offset = self.fh.tell()
+
+    def sequence(self, seq):
+        self.fh.write(seq)
+
+    def record(self, seqid, length):
+        self.out_records.append((self.out_id, length, self.out_seq_offset,
+                                 self.line_bases or 0, self.line_width or 0))
+
+    def close(self):
+        FastaScanner.close(self)
+        self.fh.close()
+        SequenceIndex(self.out_records).write_fai(self.fasta_out + '.fai')
+
+
+class HeaderEdits(FastaScanner):
+    '''Stream consumer listing the header lines GenomeMainWriter would
+       rewrite, for bgzf.splice
+
+       edits are (start, end, new line) in inflated offsets of the
+       input.  out_records are the .fai records of the output, sequence
+       offsets moved by what the headers before them grew.
+    '''
+    def __init__(self, prefix, logger):
+        FastaScanner.__init__(self)
+        self.prefix = prefix.encode()
+        self.logger = logger
+        self.edits = []
+        self.out_records = []
+        self.shift = 0  # bytes added by the edits so far
+        self.line = None  # (start, end, raw line) of the current header
+        self.at_end = False
+
+    def start_record(self, header, seq_offset):
+        '''header is as read, with any CR, seq_offset follows its newline'''
+        ending = b'' if self.at_end else b'\n'  # a last line without one
+        line = b'>' + header + ending
+        self.line = (seq_offset - len(line), seq_offset, line)
+        FastaScanner.start_record(self, header, seq_offset)
+
+    def header(self, header):
+        out_id, header = normalize_header(self.prefix, header, self.logger)
+        self.out_id = out_id.decode()
+        start, end, line = self.line
+        new_line = b'>' + header + b'\n'
+        if new_line != line:
+            self.edits.append((start, end, new_line))
+            self.shift += len(new_line) - len(line)
+
+    def record(self, seqid, length):
+        self.out_records.append((self.out_id, length,
+                                 self.seq_offset + self.shift,
+                                 self.line_bases or 0, self.line_width or 0))
+
+    def close(self):
+        self.at_end = True
+        FastaScanner.close(self)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import zlib
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .inflate import bgzf_block_size, inflate_block
+
+BLOCK_DATA = 0xff00  # uncompressed bytes per block, as htslib writes
+MAX_CDATA = 0x10000 - 26  # deflate bytes that fit a 64 KiB block
+BLOCK_HEADER = (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00'
+                b'BC\x02\x00')  # gzip header, BC extra field, then BSIZE
+EOF_BLOCK = BLOCK_HEADER + b'\x1b\x00\x03\x00' + bytes(8)  # empty block
+SIZE = struct.Struct('<H')
+TRAILER = struct.Struct('<II')  # crc32, uncompressed size
+GZI_ENTRY = struct.Struct('<QQ')  # compressed, uncompressed block offset
+ISIZE = struct.Struct('<I')
+RAW_BUFFER = 4 * 1024 * 1024  # compressed bytes read at once by iter_blocks
+
+
+def is_bgzf(path):
+    '''True if path starts with a BGZF block'''
+    with open(path, 'rb') as fopen:
+        return bool(bgzf_block_size(fopen.read(18)))
+
+
+def iter_blocks(path):
+    '''(compressed block, uncompressed size) of every BGZF block in path
+
+       blocks are found from their BSIZE and ISIZE fields, nothing is
+       inflated
+    '''
+    with open(path, 'rb') as fopen:
+        buf = b''
+        pos = 0
+        while True:
+            size = bgzf_block_size(buf, pos)
+            if not size or pos + size > len(buf):
+                more = fopen.read(RAW_BUFFER)
+                if not more:
+                    break
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            block = buf[pos:pos + size]
+            pos += size
+            yield block, ISIZE.unpack_from(block, size - 4)[0]
+        if pos < len(buf):
+            raise IOError('{} does not end on a BGZF block'.format(path))
+
+
+def compress_block(data, level=6):
+    '''one BGZF block for data, at most BLOCK_DATA bytes
+
+       zlib drops the GIL while it deflates and checksums, so blocks
+       compress in parallel on threads
+    '''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # raw deflate
+    cdata = compressor.compress(data) + compressor.flush()
+    if len(cdata) > MAX_CDATA:  # incompressible, store it
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+    return b''.join((BLOCK_HEADER, SIZE.pack(len(cdata) + 25), cdata,
+                     TRAILER.pack(zlib.crc32(data), len(data))))
+
+
+class BGZFWriter:
+    '''Write a block gzip (BGZF) file, compressing blocks on threads
+
+       the output is an ordinary multi member .gz that samtools, tabix and
+       JBrowse can also seek in.  writes of any size are gathered into
+       64 KiB blocks, up to threads * 4 blocks are compressed at once and
+       written in order.  close() adds the EOF block and, with index,
+       writes <path>.gzi.  tell() is the uncompressed offset, for .fai
+       records.
+    '''
+    def __init__(self, path, level=6, threads=4, index=True):
+        self.path = path
+        self.level = level
+        self.index = index
+        self.fh = open(path, 'wb')
+        self.pool = None
+        if threads > 1:
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.max_pending = max(threads, 1) * 4
+        self.pending = deque()  # futures for blocks not yet written
+        self.buffer = bytearray()
+        self.offset = 0  # uncompressed bytes written
+        self.compressed = 0  # compressed bytes written
+        self.uncompressed = 0  # uncompressed bytes in written blocks
+        self.blocks = []  # (compressed, uncompressed) offsets after first
+        self.closed = False
+
+    def tell(self):
+        return self.offset
+
+    def virtual_offset(self, offset):
+        '''BGZF virtual offset of uncompressed offset, once its block is
+           written.  blocks hold BLOCK_DATA bytes each, so the block is
+           offset // BLOCK_DATA
+        '''
+        block, within = divmod(offset, BLOCK_DATA)
+        if block == 0:
+            compressed = 0
+        elif block <= len(self.blocks):
+            compressed = self.blocks[block - 1][0]
+        else:  # the end of the last block, where EOF_BLOCK starts
+            compressed = self.compressed
+        return compressed << 16 | within
+
+    def write(self, data):
+        self.buffer += data
+        self.offset += len(data)
+        if len(self.buffer) >= BLOCK_DATA:
+            self.cut_blocks()
+
+    def copy_block(self, block, size):
+        '''write block, already compressed with size bytes inflated, as
+           it is.  Buffered data is cut into a shorter block first, so
+           virtual_offset does not hold once blocks are copied
+        '''
+        self.cut_blocks(final=True)
+        self.drain()
+        self.write_block(block, size)
+        self.offset += size
+
+    def cut_blocks(self, final=False):
+        '''send every full block in the buffer, and the rest if final'''
+        buf = self.buffer
+        end = len(buf) if final else len(buf) - len(buf) % BLOCK_DATA
+        for start in range(0, end, BLOCK_DATA):
+            block = bytes(buf[start:start + BLOCK_DATA])
+            if self.pool is None:
+                self.write_block(compress_block(block, self.level),
+                                 len(block))
+                continue
+            self.pending.append((self.pool.submit(compress_block, block,
+                                                  self.level), len(block)))
+            if len(self.pending) > self.max_pending:  # bound memory
+                future, size = self.pending.popleft()
+                self.write_block(future.result(), size)
+        del buf[:end]
+
+    def drain(self):
+        '''write every block still being compressed'''
+        while self.pending:
+            future, size = self.pending.popleft()
+            self.write_block(future.result(), size)
+
+    def write_block(self, block, size):
+        if self.compressed:
+            self.blocks.append((self.compressed, self.uncompressed))
+        self.fh.write(block)
+        self.compressed += len(block)
+        self.uncompressed += size
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.cut_blocks(final=True)
+            self.drain()
+            self.fh.write(EOF_BLOCK)
+        finally:
+            self.fh.close()
+            if self.pool:
+                self.pool.shutdown()
+        if self.index:
+            self.write_gzi(self.path + '.gzi')
+
+    def write_gzi(self, gzi):
+        '''write the bgzip -i index: block count then offset pairs'''
+        tmp = '{}.{}.tmp'.format(gzi, os.getpid())
+        with open(tmp, 'wb') as fopen:
+            fopen.write(struct.pack('<Q', len(self.blocks)))
+            for entry in self.blocks:
+                fopen.write(GZI_ENTRY.pack(*entry))
+        os.rename(tmp, gzi)
+
+
+def splice(path, out, edits, level=6, threads=4):
+    '''copy BGZF path to out with edits applied, writing out.gzi
+
+       edits are (start, end, data) in inflated offsets, sorted and not
+       overlapping, each replacing bytes start to end with data.  Blocks
+       no edit touches are copied without inflating them, only the runs
+       of blocks holding edits are inflated and compressed again.
+       returns the number of blocks compressed
+    '''
+    writer = BGZFWriter(out, level, threads)
+    edits = iter(edits)
+    edit = next(edits, None)
+    offset = 0  # inflated offset of the next block of path
+    run = bytearray()  # inflated blocks held for edits
+    run_start = 0
+    run_edits = []
+    recompressed = 0
+    try:
+        for block, size in iter_blocks(path):
+            if not size:  # EOF markers, close() writes the one needed
+                continue
+            end = offset + size
+            if not run and (edit is None or edit[0] >= end):
+                writer.copy_block(block, size)
+                offset = end
+                continue
+            if not run:
+                run_start = offset
+            run += inflate_block(block)
+            offset = end
+            recompressed += 1
+            while edit is not None and edit[1] <= end:
+                run_edits.append(edit)
+                edit = next(edits, None)
+            if edit is not None and edit[0] < end:  # goes on in the next
+                continue
+            pos = 0
+            for start, stop, data in run_edits:
+                writer.write(bytes(run[pos:start - run_start]))
+                writer.write(data)
+                pos = stop - run_start
+            writer.write(bytes(run[pos:]))
+            run = bytearray()
+            run_edits = []
+        if run or edit is not None:
+            raise IOError('edits past the end of {}'.format(path))
+    finally:
+        writer.close()
+    return recompressed
+
+
+class BGZFReader:
+    '''Read lines from a BGZF file starting at any virtual offset
+
+       tell() after a block is used up is the start of the next block,
+       as offsets are written by BGZFWriter and htslib
+    '''
+    def __init__(self, path):
+        self.fh = open(path, 'rb')
+        self.block_offset = 0
+        self.next_offset = 0
+        self.data = b''
+        self.pos = 0
+
+    def load(self, offset):
+        '''inflate the block at compressed offset, b'' past the end'''
+        fh = self.fh
+        fh.seek(offset)
+        head = fh.read(18)
+        self.block_offset = offset
+        self.pos = 0
+        if not head:
+            self.data = b''
+            self.next_offset = offset
+            return
+        size = bgzf_block_size(head)
+        if not size:
+            raise IOError('no BGZF block at {} in {}'.format(offset,
+                                                             fh.name))
+        self.data = inflate_block(head + fh.read(size - len(head)))
+        self.next_offset = offset + size
+
+    def seek(self, virtual_offset):
+        offset = virtual_offset >> 16
+        if offset != self.block_offset or not self.data:
+            self.load(offset)
+        self.pos = virtual_offset & 0xffff
+        self.advance()
+
+    def tell(self):
+        return self.block_offset << 16 | self.pos
+
+    def advance(self):
+        '''skip used up and empty blocks, up to the end of the file'''
+        while (self.pos >= len(self.data) and
+               self.next_offset > self.block_offset):
+            self.load(self.next_offset)
+
+    def readline(self):
+        '''next line with its newline, b'' at the end of the file'''
+        parts = []
+        while self.pos < len(self.data):
+            data = self.data
+            end = data.find(b'\n', self.pos)
+            if end >= 0:
+                parts.append(data[self.pos:end + 1])
+                self.pos = end + 1
+                self.advance()
+                break
+            parts.append(data[self.pos:])
+            self.pos = len(data)
+            self.advance()
+        return b''.join(parts)
+
+    def close(self):
+        self.fh.close()
+
+
+if __name__ == '__main__':
+    print('import me to use BGZFWriter, BGZFReader and splice')
+    sys.exit(1)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+from .checksums import read_manifest
+try:
+    import yaml
+except ImportError:  # README and MANIFEST fields are left out, the rest works
+    yaml = None
+
+DEFAULT_CATALOG = './detect_incongruencies_index/catalog.sqlite'
+SCHEMA = ('''CREATE TABLE IF NOT EXISTS collections (
+               path TEXT PRIMARY KEY, organism TEXT, name TEXT,
+               genotype TEXT, gnm TEXT, ann TEXT, key TEXT, type TEXT,
+               readme TEXT, updated REAL)''',
+          '''CREATE TABLE IF NOT EXISTS files (
+               collection TEXT, name TEXT, size INTEGER, device INTEGER,
+               inode INTEGER, mtime_ns INTEGER, md5 TEXT, description TEXT,
+               PRIMARY KEY (collection, name))''',
+          '''CREATE TABLE IF NOT EXISTS readme_fields (
+               collection TEXT, field TEXT, value TEXT,
+               PRIMARY KEY (collection, field))''',
+          '''CREATE TABLE IF NOT EXISTS results (
+               collection TEXT PRIMARY KEY, checked REAL, passed INTEGER,
+               failed TEXT, stale INTEGER, result TEXT)''',
+          '''CREATE INDEX IF NOT EXISTS collections_organism
+               ON collections (organism, type)''')
+
+
+def load_yaml(path):
+    '''the document in a README or MANIFEST .yml, None without PyYAML'''
+    if yaml is None:
+        return None
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)  # C if built
+    with open(path) as fopen:
+        return yaml.load(fopen, Loader=loader)
+
+
+def file_prints(collection):
+    '''{name: (device, inode, size, mtime_ns)} of a scan_collection record,
+       files removed since it was listed are left out
+    '''
+    prints = {}
+    path = collection['path']
+    for name in collection['files']:
+        try:
+            st = os.stat(os.path.join(path, name))
+        except OSError:
+            continue
+        prints[name] = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    return prints
+
+
+class Catalog:
+    '''SQLite catalog of data store collections, their files, README
+       fields and the last result the Detector had for each
+
+       update() takes the scan_collection records of a DataStoreIndex
+       walk and compares the (device, inode, size, mtime_ns) of every
+       file with what is stored.  Collections with nothing added,
+       removed or changed are left alone.  For the rest the small files
+       are read again: md5s from CHECKSUM.*.md5, descriptions from
+       MANIFEST.*.descriptions.yml and the fields of README.*.yml, and
+       their last result is marked stale.  Collections no longer under
+       a walked directory are dropped.
+
+       queries read the database only, nothing on the data store is
+       touched.  Only the thread that made the catalog should use it.
+    '''
+    def __init__(self, path=DEFAULT_CATALOG, logger=None):
+        self.logger = logger or logging.getLogger('detect_incongruencies')
+        catalog_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(catalog_dir, exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.row_factory = sqlite3.Row
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+
+    def stored_prints(self, path):
+        return dict((row['name'], (row['device'], row['inode'], row['size'],
+                                   row['mtime_ns']))
+                    for row in self.db.execute(
+                        '''SELECT name, device, inode, size, mtime_ns
+                           FROM files WHERE collection = ?''', (path,)))
+
+    def update(self, collections, roots=()):
+        '''refresh the catalog from scan_collection records
+
+           roots are the directories that were walked, collections under
+           them that are not in collections are dropped.  returns the
+           paths of the collections that changed.
+        '''
+        logger = self.logger
+        changed = []
+        seen = set()
+        known = [row['path'] for row in
+                 self.db.execute('SELECT path FROM collections')]
+        with self.db:  # one transaction
+            for collection in collections:
+                if collection is None:
+                    continue
+                path = collection['path']
+                seen.add(path)
+                prints = file_prints(collection)
+                if path in known and prints == self.stored_prints(path):
+                    continue
+                self.put_collection(collection, prints)
+                changed.append(path)
+            known = set(known)
+            for root in roots:
+                root = os.path.abspath(root)
+                for path in known:
+                    if path not in seen and (path == root or
+                                             path.startswith(root + os.sep)):
+                        logger.info('{} is gone, dropped from the '
+                                    'catalog'.format(path))
+                        self.drop(path)
+        if changed:
+            logger.info('Catalog {}: {} of {} collections updated'.format(
+                                                  self.path, len(changed),
+                                                  len(seen)))
+        return changed
+
+    def put_collection(self, collection, prints):
+        '''replace the rows of one collection'''
+        path = collection['path']
+        md5s = {}
+        for manifest in collection['checksums']:
+            try:
+                md5s.update(read_manifest(manifest))
+            except (IOError, ValueError) as e:
+                self.logger.warning('Could not read {}: {}'.format(manifest,
+                                                                   e))
+        descriptions = {}
+        for manifest in collection.get('manifests', []):
+            if manifest.endswith('.descriptions.yml'):
+                document = self.read_yaml(manifest)
+                if isinstance(document, dict):
+                    descriptions.update(document)
+        readme = collection.get('readme_yml') or collection['readmes']
+        readme = readme[0] if len(readme) == 1 else None
+        fields = {}
+        if readme and readme.endswith('.yml'):
+            document = self.read_yaml(readme)
+            if isinstance(document, dict):
+                fields = document
+        db = self.db
+        self.drop(path, result=False)
+        db.execute('''INSERT INTO collections VALUES
+                      (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                   (path, os.path.basename(os.path.dirname(path)),
+                    collection['name'], collection['genotype'],
+                    collection['gnm'], collection['ann'], collection['key'],
+                    collection['type'], readme, time.time()))
+        db.executemany('''INSERT INTO files VALUES
+                          (?, ?, ?, ?, ?, ?, ?, ?)''',
+                       [(path, name, fprint[2], fprint[0], fprint[1],
+                         fprint[3], md5s.get(name),
+                         descriptions.get(name))
+                        for name, fprint in sorted(prints.items())])
+        db.executemany('INSERT INTO readme_fields VALUES (?, ?, ?)',
+                       [(path, str(field), json.dumps(value, default=str))
+                        for field, value in fields.items()])
+        db.execute('UPDATE results SET stale = 1 WHERE collection = ?',
+                   (path,))
+
+    def read_yaml(self, path):
+        try:
+            return load_yaml(path)
+        except (IOError, yaml.YAMLError) as e:
+            self.logger.warning('Could not parse {}: {}'.format(path, e))
+            return None
+
+    def drop(self, path, result=True):
+        '''remove a collection, and its last result unless result is False'''
+        db = self.db
+        db.execute('DELETE FROM collections WHERE path = ?', (path,))
+        db.execute('DELETE FROM files WHERE collection = ?', (path,))
+        db.execute('DELETE FROM readme_fields WHERE collection = ?', (path,))
+        if result:
+            db.execute('DELETE FROM results WHERE collection = ?', (path,))
+
+    def put_result(self, path, passed, result):
+        '''record the outcome of checking the collection at path'''
+        with self.db:
+            self.db.execute('''INSERT OR REPLACE INTO results
+                               VALUES (?, ?, ?, ?, 0, ?)''',
+                            (path, time.time(), passed,
+                             result.get('failed'),
+                             json.dumps(result, default=str)))
+
+    def collections(self, organism=None, collection_type=None):
+        '''collection rows as dicts, optionally of one organism directory
+           (Glycine_max) and type (genome, annotation, gwas ...)
+        '''
+        query = 'SELECT * FROM collections'
+        terms = []
+        args = []
+        if organism:
+            terms.append('organism = ?')
+            args.append(organism)
+        if collection_type:
+            terms.append('type = ?')
+            args.append(collection_type)
+        if terms:
+            query += ' WHERE ' + ' AND '.join(terms)
+        return [dict(row) for row in
+                self.db.execute(query + ' ORDER BY path', args)]
+
+    def field(self, field, organism=None):
+        '''{collection path: value} of one README field, subject say'''
+        query = '''SELECT r.collection, r.value FROM readme_fields r
+                   JOIN collections c ON c.path = r.collection
+                   WHERE r.field = ?'''
+        args = [field]
+        if organism:
+            query += ' AND c.organism = ?'
+            args.append(organism)
+        return dict((row[0], json.loads(row[1])) for row in
+                    self.db.execute(query + ' ORDER BY r.collection', args))
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == '__main__':
+    print('import me to use Catalog')
+    sys.exit(1)
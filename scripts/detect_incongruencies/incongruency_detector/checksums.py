@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import sqlite3
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from .file_helpers import fingerprint, return_filehandle
+
+READ_SIZE = 16 * 1024 * 1024  # bytes per read when hashing
+DEFAULT_CACHE = os.path.expanduser('~/.cache/incongruency_detector/'
+                                   'hashes.sqlite')
+
+
+def hash_file(path, algorithms=('md5',), read_size=READ_SIZE):
+    '''hexdigests for path, one per algorithm, computed in a single read
+
+       reads into one reused buffer so large files cost few read calls and
+       no per chunk allocation.  hashlib drops the GIL while it digests,
+       so several files can be hashed at once on threads.
+    '''
+    hashes = [hashlib.new(a) for a in algorithms]
+    buf = bytearray(read_size)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as fopen:
+        while True:
+            size = fopen.readinto(buf)
+            if not size:
+                break
+            for h in hashes:
+                h.update(view[:size])
+    return [h.hexdigest() for h in hashes]
+
+
+def read_manifest(md5_file):
+    '''parse CHECKSUM.<collection>.md5 into {relative path: md5}
+
+       paths are normalized so "./name" from md5sum run under find matches
+       "name"
+    '''
+    manifest = {}
+    fh = return_filehandle(md5_file)
+    with fh as copen:
+        for line in copen:
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 1)
+            if len(fields) != 2:
+                raise ValueError('Could not find sum and name for {}'.format(
+                                                                        line))
+            check_sum, filename = fields
+            manifest[os.path.normpath(filename.lstrip('*'))] = check_sum
+    return manifest
+
+
+def list_files(directory, skip=()):
+    '''relative paths of files under directory, as mdsum-folder.bash lists
+
+       skips names in skip and .nfs* placeholders
+    '''
+    found = []
+    for root, dirs, files in os.walk(directory):
+        for f in files:
+            if f in skip or f.startswith('.nfs'):
+                continue
+            found.append(os.path.relpath(os.path.join(root, f), directory))
+    return found
+
+
+class HashCache:
+    '''SQLite cache of file digests keyed on (device, inode, size, mtime_ns)
+
+       a file that has not been touched since it was hashed is not read
+       again.  Safe to share between processes, only the thread that
+       made the cache should use it.
+    '''
+    def __init__(self, path=DEFAULT_CACHE):
+        cache_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS digests (
+                             device INTEGER, inode INTEGER, size INTEGER,
+                             mtime_ns INTEGER, md5 TEXT, sha256 TEXT,
+                             PRIMARY KEY (device, inode))''')
+        self.db.commit()
+
+    def get(self, fprint):
+        '''{algorithm: hexdigest} for the fingerprint or None'''
+        row = self.db.execute('''SELECT md5, sha256 FROM digests
+                                 WHERE device = ? AND inode = ? AND
+                                 size = ? AND mtime_ns = ?''',
+                              fprint).fetchone()
+        if row is None:
+            return None
+        return {'md5': row[0], 'sha256': row[1]}
+
+    def put(self, entries):
+        '''store (fingerprint, {algorithm: hexdigest}) pairs'''
+        self.db.executemany('''INSERT OR REPLACE INTO digests
+                               VALUES (?, ?, ?, ?, ?, ?)''',
+                            [fprint + (d.get('md5'), d.get('sha256'))
+                             for fprint, d in entries])
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def file_digests(paths, algorithms=('md5',), threads=4, cache=None):
+    '''{path: {algorithm: hexdigest}} for paths
+
+       digests come from cache when the file is unchanged, the rest are
+       hashed concurrently on threads and added to the cache.
+    '''
+    digests = {}
+    todo = []
+    for path in paths:
+        fprint = fingerprint(path)
+        cached = cache.get(fprint) if cache else None
+        if cached and all(cached.get(a) for a in algorithms):
+            digests[path] = cached
+        else:
+            todo.append((path, fprint))
+    todo.sort(key=lambda t: -t[1][2])  # largest first
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        sums = pool.map(lambda t: hash_file(t[0], algorithms), todo)
+        new = []
+        for (path, fprint), hexdigests in zip(todo, sums):
+            digests[path] = dict(zip(algorithms, hexdigests))
+            new.append((fprint, digests[path]))
+    if cache and new:
+        cache.put(new)
+    return digests
+
+
+def verify_manifest(md5_file, threads=4, cache=None):
+    '''check every file listed in md5_file against the files on disk
+
+       files are hashed concurrently on threads, unchanged files are
+       answered from cache.  returns a dict of sorted lists: ok,
+       mismatched, missing (listed, not on disk) and extra (on disk, not
+       listed).
+    '''
+    directory = os.path.dirname(os.path.abspath(md5_file))
+    manifest = read_manifest(md5_file)
+    name = os.path.basename(md5_file)
+    skip = (name, os.path.splitext(name)[0] + '.sha256')
+    on_disk = set(list_files(directory, skip=skip))
+    result = {'ok': [], 'mismatched': [], 'missing': [],
+              'extra': sorted(on_disk.difference(manifest))}
+    present = []
+    for name in manifest:
+        if name in on_disk:
+            present.append(name)
+        else:
+            result['missing'].append(name)
+    digests = file_digests([os.path.join(directory, n) for n in present],
+                           threads=threads, cache=cache)
+    for name in present:
+        if digests[os.path.join(directory, name)]['md5'] == manifest[name]:
+            result['ok'].append(name)
+        else:
+            result['mismatched'].append(name)
+    for k in result:
+        result[k].sort()
+    return result
+
+
+def write_manifest(directory, sha256=False, threads=4, cache=None):
+    '''write CHECKSUM.<collection>.md5 for directory like mdsum-folder.bash
+
+       only files new or changed since they were cached are read.  With
+       sha256 a CHECKSUM.<collection>.sha256 is written from the same
+       read.  returns the manifest paths written.
+    '''
+    directory = os.path.abspath(directory)
+    collection = os.path.basename(directory)
+    algorithms = ('md5', 'sha256') if sha256 else ('md5',)
+    names = ['CHECKSUM.{}.{}'.format(collection, a) for a in algorithms]
+    skip = ['CHECKSUM.{}.{}'.format(collection, a) for a in ('md5',
+                                                              'sha256')]
+    files = sorted(list_files(directory, skip=skip))
+    digests = file_digests([os.path.join(directory, f) for f in files],
+                           algorithms, threads, cache)
+    written = []
+    for algorithm, name in zip(algorithms, names):
+        out = os.path.join(directory, name)
+        tmp = '{}.{}.tmp'.format(out, os.getpid())
+        with open(tmp, 'w') as fopen:
+            for f in files:
+                fopen.write('{}  ./{}\n'.format(
+                            digests[os.path.join(directory, f)][algorithm], f))
+        os.rename(tmp, out)
+        written.append(out)
+    return written
+
+
+if __name__ == '__main__':
+    print('import me to use HashCache, verify_manifest and write_manifest')
+    sys.exit(1)
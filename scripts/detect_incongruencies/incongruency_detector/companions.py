@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from .pipeline import StreamPipeline
+from .fasta_scanner import FastaScanner
+from .gff3_validator import parse_attributes
+
+EXPECTED = {'protein': 'coding', 'cds': 'coding', 'mrna': 'mrna'}  # kind:
+                                             # TranscriptIDs set it matches
+
+
+class TranscriptIDs:
+    '''mRNA IDs of a gff3 and which of them have CDS, from one read
+
+       feature() is called with the columns, bytes, of every feature line
+       the Detector already reads, so the gff3 is not read again.  IDs
+       stay bytes in plain sets, tens of thousands cost a few MB.
+    '''
+    def __init__(self):
+        self.mrna = set()
+        self.coding = set()  # mRNA IDs that are the Parent of a CDS
+
+    def feature(self, columns, attributes=None):
+        feature_type = columns[2]
+        if feature_type != b'mRNA' and feature_type != b'CDS':
+            return
+        if attributes is None:
+            attributes = parse_attributes(columns[8])
+        if feature_type == b'mRNA':
+            feature_id = attributes.get(b'ID')
+            if feature_id:
+                self.mrna.add(feature_id)
+        else:
+            parents = attributes.get(b'Parent')
+            if parents:
+                self.coding.update(parents.split(b','))
+
+
+class FastaIDs(FastaScanner):
+    '''Stream consumer keeping only the IDs of FASTA records'''
+    def __init__(self):
+        FastaScanner.__init__(self)
+        self.ids = set()
+        self.duplicates = []
+
+    def record(self, seqid, length):
+        if seqid in self.ids:
+            self.duplicates.append(seqid)
+        else:
+            self.ids.add(seqid)
+
+
+def scan_ids(fasta):
+    '''(FastaIDs, bytes read) for fasta, sequences are never kept'''
+    pipeline = StreamPipeline(fasta)
+    ids = pipeline.add_consumer(FastaIDs())
+    pipeline.run()
+    return ids, pipeline.bytes_read
+
+
+class CompanionScan:
+    '''Read the protein, CDS and mRNA FASTAs of an annotation on threads
+
+       start() submits every file so they are read alongside each other
+       and alongside the gff3, inflating and header search release the
+       GIL.  results() waits for them.  companions is the
+       scan_collection companions dict {kind: path}.
+    '''
+    def __init__(self, companions, threads=3):
+        self.companions = companions
+        self.threads = max(1, min(threads, len(companions) or 1))
+        self.pool = None
+        self.futures = {}
+
+    def start(self):
+        self.pool = ThreadPoolExecutor(max_workers=self.threads)
+        for kind, path in sorted(self.companions.items()):
+            self.futures[kind] = self.pool.submit(scan_ids, path)
+        return self
+
+    def results(self):
+        '''{kind: (FastaIDs, bytes read)}, raises what a scan raised'''
+        try:
+            return dict((kind, future.result())
+                        for kind, future in self.futures.items())
+        finally:
+            self.pool.shutdown()
+
+    def cancel(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.pool.shutdown(wait=False)
+
+
+def compare(expected, found):
+    '''(IDs only in expected, IDs only in found), sorted'''
+    return sorted(expected - found), sorted(found - expected)
+
+
+if __name__ == '__main__':
+    print('import me to use TranscriptIDs and CompanionScan')
+    sys.exit(1)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+import os
+import sys
+
+MAIN_FILES = {'genome': 'genome_main.fna.gz',
+              'annotation': 'gene_models_main.gff3.gz'}
+COMPANION_FILES = {'protein': 'protein.faa.gz', 'cds': 'cds.fna.gz',
+                   'mrna': 'mrna.fna.gz'}  # FASTAs beside gene_models_main
+
+
+def parse_collection(name):
+    '''parse a collection directory name <genotype>.gnmN[.annN].<KEY>
+
+       https://github.com/LegumeFederation/datastore/issues/23
+
+       returns a dict of name parts, type is genome, annotation or the raw
+       type field for other collections (mrk, gwas ...).  None if name has
+       fewer than 3 fields.
+    '''
+    fields = name.split('.')
+    if len(fields) < 3:
+        return None
+    type_field = fields[-2]
+    if type_field.startswith('gnm'):
+        collection_type = 'genome'
+    elif type_field.startswith('ann'):
+        collection_type = 'annotation'
+    else:
+        collection_type = type_field
+    gnm = fields[1] if fields[1].startswith('gnm') else None
+    return {'name': name, 'genotype': fields[0], 'gnm': gnm,
+            'ann': type_field if collection_type == 'annotation' else None,
+            'key': fields[-1], 'type': collection_type}
+
+
+def scan_collection(path):
+    '''list a collection directory once and sort out its files
+
+       returns the parse_collection dict plus path, files, main (files
+       ending in the main file for the type), companions ({kind: path} of
+       an annotation's protein, cds and mrna FASTAs), checksums
+       (CHECKSUM.*.md5), readmes (README.*.md), readme_yml (README.*.yml)
+       and manifests (MANIFEST.*.yml), or None if path is not a
+       collection.
+    '''
+    path = os.path.abspath(path)
+    collection = parse_collection(os.path.basename(path))
+    if collection is None:
+        return None
+    files = []
+    for entry in os.scandir(path):
+        if entry.is_file():
+            files.append(entry.name)
+    files.sort()
+    main_suffix = MAIN_FILES.get(collection['type'])
+    collection['path'] = path
+    collection['files'] = files
+    collection['main'] = [os.path.join(path, f) for f in files
+                          if main_suffix and f.endswith(main_suffix)]
+    collection['companions'] = {}
+    if collection['type'] == 'annotation':
+        for kind, suffix in COMPANION_FILES.items():
+            for f in files:
+                if f.endswith('.' + suffix):
+                    collection['companions'][kind] = os.path.join(path, f)
+    collection['checksums'] = [os.path.join(path, f) for f in files
+                               if f.startswith('CHECKSUM.') and
+                               f.endswith('.md5')]
+    collection['readmes'] = [os.path.join(path, f) for f in files
+                             if f.startswith('README.') and
+                             f.endswith('.md')]
+    collection['readme_yml'] = [os.path.join(path, f) for f in files
+                                if f.startswith('README.') and
+                                f.endswith('.yml')]
+    collection['manifests'] = [os.path.join(path, f) for f in files
+                               if f.startswith('MANIFEST.') and
+                               f.endswith('.yml')]
+    return collection
+
+
+class DataStoreIndex:
+    '''In memory index of data store collections from one directory walk
+
+       root can be the data store root, an organism directory or a single
+       collection, in which case the sibling collections of the same
+       genotype and assembly are indexed with it.  Every directory is
+       listed once with os.scandir, later lookups are dictionary hits.
+    '''
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.collections = {}  # path: scan_collection dict
+        self.genomes = {}  # (organism dir, genotype, gnm): [genome paths]
+        self.annotations = {}  # (organism dir, genotype, gnm): [ann paths]
+        self.walk()
+
+    def walk(self):
+        root = self.root
+        collection = parse_collection(os.path.basename(root))
+        if collection and collection['gnm']:  # and its neighbours
+            prefix = '{}.{}.'.format(collection['genotype'],
+                                     collection['gnm'])
+            self.add_organism(os.path.dirname(root), prefix)
+            return
+        if collection:
+            self.add_collection(root)
+            return
+        for entry in os.scandir(root):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            if parse_collection(entry.name):
+                self.add_collection(entry.path)
+            else:  # organism directory under the data store root
+                self.add_organism(entry.path)
+
+    def add_organism(self, path, prefix=''):
+        for entry in os.scandir(path):
+            if (entry.is_dir() and entry.name.startswith(prefix) and
+                    parse_collection(entry.name)):
+                self.add_collection(entry.path)
+
+    def add_collection(self, path):
+        collection = scan_collection(path)
+        path = collection['path']
+        self.collections[path] = collection
+        key = (os.path.dirname(path), collection['genotype'],
+               collection['gnm'])
+        if collection['type'] == 'genome':
+            self.genomes.setdefault(key, []).append(path)
+        elif collection['type'] == 'annotation':
+            self.annotations.setdefault(key, []).append(path)
+
+    def group_key(self, path):
+        '''key of the genome and annotations path belongs with, None if
+           path is not a collection under the root
+        '''
+        collection = self.collections.get(path)
+        if collection is None:
+            return None
+        return (os.path.dirname(path), collection['genotype'],
+                collection['gnm'])
+
+    def genomes_for(self, annotation):
+        '''genome collection paths with genome_main for an annotation'''
+        return sorted(p for p in self.genomes.get(self.group_key(annotation),
+                                                  [])
+                      if self.collections[p]['main'])
+
+    def annotations_for(self, genome):
+        '''annotation collection paths with gene_models_main for a genome'''
+        return sorted(p for p in self.annotations.get(self.group_key(genome),
+                                                      [])
+                      if self.collections[p]['main'])
+
+    def related_files(self):
+        '''list of {'genome': path, 'annotation': [paths] or None} dicts
+
+           one per genome collection with a genome_main, the same
+           objects Detector.get_files builds
+        '''
+        related = []
+        for path in sorted(self.collections):
+            collection = self.collections[path]
+            if collection['type'] != 'genome' or not collection['main']:
+                continue
+            related.append({'genome': path,
+                            'annotation': self.annotations_for(path) or None})
+        return related
+
+
+if __name__ == '__main__':
+    print('import me to use DataStoreIndex')
+    sys.exit(1)
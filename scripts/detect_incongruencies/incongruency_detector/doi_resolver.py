@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_RESOLVER = 'https://doi.org/api/handles/'
+DEFAULT_DOI_CACHE = os.path.expanduser('~/.cache/incongruency_detector/'
+                                       'dois.json')
+DAY = 24 * 60 * 60
+
+
+class DOIResolver:
+    '''Check DOIs against the doi.org handle REST API
+
+       http://www.doi.org/factsheets/DOIProxy.html#rest-api
+
+       lookups share one pooled session and run concurrently, at most
+       concurrency at a time, each with a timeout.  A DOI is looked up at
+       most once per run.  Valid results are kept in a JSON cache for
+       ttl seconds, invalid ones for negative_ttl.  Errors (timeouts,
+       5xx) are not cached.
+    '''
+    def __init__(self, base_url=DEFAULT_RESOLVER, cache_file=None,
+                 ttl=30 * DAY, negative_ttl=DAY, concurrency=8, timeout=10):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.results = {}  # doi: True/False, this run
+        self.cache = self.load_cache()
+
+    def load_cache(self):
+        '''{doi: [valid, checked time]} still within ttl'''
+        if not self.cache_file or not os.path.isfile(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file) as fopen:
+                cache = json.load(fopen)
+        except ValueError:  # half written or corrupt, start over
+            return {}
+        now = time.time()
+        return dict((doi, v) for doi, v in cache.items()
+                    if now - v[1] < (self.ttl if v[0] else self.negative_ttl))
+
+    def save_cache(self):
+        '''merge this run's results into the cache file'''
+        if not self.cache_file:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+        cache = self.load_cache()  # other runs may have added to it
+        cache.update(self.cache)
+        tmp = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+        with open(tmp, 'w') as fopen:
+            json.dump(cache, fopen)
+        os.rename(tmp, self.cache_file)
+
+    def lookup(self, doi):
+        '''True/False from the handle API, None if it could not answer'''
+        url = self.base_url + doi
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            doi_json = response.json()
+        except (requests.RequestException, ValueError):
+            return None
+        code = doi_json.get('responseCode')
+        if code == 1:  # handle found
+            return True
+        if code in (100, 200):  # handle not found / no values
+            return False
+        return None
+
+    def resolve(self, dois):
+        '''{doi: True/False/None} for dois, looking up each new one once'''
+        todo = []
+        for doi in set(dois):
+            if doi in self.results:
+                continue
+            if doi in self.cache:
+                self.results[doi] = self.cache[doi][0]
+            else:
+                todo.append(doi)
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for doi, valid in zip(todo, pool.map(self.lookup, todo)):
+                    self.results[doi] = valid
+                    if valid is not None:
+                        self.cache[doi] = [valid, time.time()]
+            self.save_cache()
+        return dict((doi, self.results[doi]) for doi in dois)
+
+
+if __name__ == '__main__':
+    print('import me to use DOIResolver')
+    sys.exit(1)
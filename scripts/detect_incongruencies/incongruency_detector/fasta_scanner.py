@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import sys
+
+
+class FastaScanner:
+    '''Stream consumer that finds FASTA records without walking sequence lines
+
+       feed() takes decompressed chunks of any size.  Record starts are
+       found by searching the buffer for b'\n>' so sequence payload is
+       never split into lines.  Subclasses override:
+
+           header(header)         header line bytes, without '>' or newline
+           sequence(seq)          raw payload bytes, newlines included
+           record(seqid, length)  end of a record with its total bases
+
+       while in record(), seq_offset, line_bases and line_width hold the
+       .fai fields for the record, offsets count decompressed bytes.
+    '''
+    def __init__(self):
+        self.partial_header = None  # header split across chunks
+        self.at_line_start = True
+        self.seqid = None
+        self.length = 0
+        self.records = 0
+        self.crlf = False  # only count b'\r' once a header shows them
+        self.offset = 0  # decompressed bytes fed before this chunk
+        self.seq_offset = 0  # offset of the first base of this record
+        self.line_width = None  # first sequence line, with line ending
+        self.line_bases = None
+        self.first_line = 0  # bytes of a first line split across chunks
+
+    def header(self, header):
+        pass
+
+    def sequence(self, seq):
+        pass
+
+    def record(self, seqid, length):
+        pass
+
+    def end_record(self):
+        '''report the record in progress, if any'''
+        if self.seqid is not None:
+            self.record(self.seqid, self.length)
+            self.records += 1
+        self.seqid = None
+        self.length = 0
+        self.line_width = None
+        self.line_bases = None
+        self.first_line = 0
+
+    def start_record(self, header, seq_offset):
+        '''a complete header line was found'''
+        if header.endswith(b'\r'):
+            self.crlf = True
+            header = header.rstrip(b'\r')
+        fields = header.split(None, 1)
+        self.seqid = fields[0] if fields else b''
+        self.seq_offset = seq_offset
+        self.header(header)
+
+    def add_sequence(self, seq):
+        '''count bases in seq, every byte but line endings'''
+        self.length += len(seq) - seq.count(b'\n')
+        if self.crlf:
+            self.length -= seq.count(b'\r')
+        if self.line_width is None and self.seqid is not None:
+            end = seq.find(b'\n')
+            if end < 0:
+                self.first_line += len(seq)
+            else:
+                self.line_width = self.first_line + end + 1
+                self.line_bases = self.line_width - 1 - self.crlf
+        self.sequence(seq)
+
+    def feed(self, data):
+        '''scan a chunk of decompressed FASTA'''
+        pos = 0
+        size = len(data)
+        base = self.offset  # offset of data[0]
+        self.offset += size
+        while pos < size:
+            if self.partial_header is not None:  # finish header line
+                end = data.find(b'\n', pos)
+                if end < 0:
+                    self.partial_header += data[pos:]
+                    return
+                header = self.partial_header + data[pos:end]
+                self.partial_header = None
+                self.at_line_start = True
+                pos = end + 1
+                self.start_record(header, base + pos)
+                continue
+            if self.at_line_start and data[pos:pos + 1] == b'>':
+                self.end_record()
+                self.partial_header = b''
+                pos += 1
+                continue
+            nxt = data.find(b'\n>', pos)
+            if nxt < 0:  # rest of chunk is payload
+                self.add_sequence(data[pos:])
+                self.at_line_start = data.endswith(b'\n')
+                return
+            self.add_sequence(data[pos:nxt + 1])
+            self.at_line_start = True
+            pos = nxt + 1
+
+    def close(self):
+        '''flush a header without a trailing newline and the last record'''
+        if self.partial_header is not None:
+            header = self.partial_header
+            self.partial_header = None
+            self.start_record(header, self.offset)
+        self.end_record()
+
+
+if __name__ == '__main__':
+    print('import me to use FastaScanner')
+    sys.exit(1)
@@ -1,28 +1,27 @@
 #!/usr/bin/env python
 
+import io
 import os, sys
-import gzip
-
-def return_filehandle(open_me):
-    '''return file handle for gz compressed or text file'''
-    magic_dict = { # headers for compression
-                  '\x1f\x8b\x08': 'gz',
- #                 '\x42\x5a\x68': 'bz2',
- #                 '\x50\x4b\x03\x04': 'zip'
-                 }
-    max_bytes = max(len(t) for t in magic_dict)
-    with open(open_me) as f:
-        s = f.read(max_bytes)
-    for m in magic_dict:
-        if s.startswith(m): #check file header for match with m
-            t = magic_dict[m]
-            if t == 'gz':
-                return gzip.open(open_me)
-  #          elif t == 'bz2':
-  #              return bz2.open(open_me)
-  #          elif t == 'zip':
-  #              return zipfile.open(open_me)
-    return open(open_me)
+from .pipeline import ChunkReader, StreamPipeline, iter_byte_lines
+
+def return_filehandle(open_me, binary=False, buffer_size=None):
+    '''return file handle for a gzip, bz2, xz, zstd or text file
+
+       the file is opened once, its compression sniffed from the first
+       bytes read, and inflated through StreamPipeline.  binary returns
+       an io.BufferedReader of the inflated bytes, otherwise text.
+    '''
+    pipeline = StreamPipeline(open_me, buffer_size)
+    fh = io.BufferedReader(ChunkReader(pipeline.chunks()),
+                           pipeline.chunk_size)
+    if binary:
+        return fh
+    return io.TextIOWrapper(fh)
+
+
+def byte_lines(open_me, buffer_size=None):
+    '''yield the lines of open_me as bytes, inflated, nothing decoded'''
+    return iter_byte_lines(StreamPipeline(open_me, buffer_size).chunks())
 
 
 def check_file(f):
@@ -34,7 +33,13 @@ def check_file(f):
     return os.path.isfile(f)
 
 
+def fingerprint(f):
+    '''(device, inode, size, mtime_ns) for f, changes when f is replaced'''
+    st = os.stat(f)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
 if __name__ == '__main__':
-    print('import me to use check_file and return_filehandle.' + 
+    print('import me to use check_file, return_filehandle and byte_lines.' +
           'This should be in a class probably')
     sys.exit(1)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import gzip
+import heapq
+import shutil
+import logging
+import tempfile
+from .pipeline import StreamPipeline, iter_byte_lines
+from .bgzf import BGZFWriter
+from .tabix import TabixIndex
+
+SORT_MEMORY = 512 * 1024 * 1024  # bytes of lines held before a run spills
+LINE_OVERHEAD = 64  # python object bytes per buffered line, roughly
+POSITION = b'%012d%012d'  # start and line number, one level of a sort key
+DEPTH_POSITION = b'%012d%02d%012d'  # start, depth and line number
+UNSORTED = b'\xff'  # key prefix of lines that are not 9 columns, last
+MAX_DEPTH = 32  # Parent chains deeper than this are taken to be loops
+RUN_BUFFER = 1024 * 1024  # read buffer per run file while merging
+
+
+def feature_fields(line):
+    '''(seqid, start, ID, first Parent, end) of a feature line, None if
+       the line does not have 9 columns
+    '''
+    columns = line.split(b'\t')
+    if len(columns) != 9:
+        return None
+    try:
+        start = int(columns[3])
+        end = int(columns[4])
+    except ValueError:
+        start = end = 0
+    feature_id = None
+    parent = None
+    for attribute in columns[8].split(b';'):
+        if attribute.startswith(b'ID='):
+            feature_id = attribute[3:]
+        elif attribute.startswith(b'Parent='):
+            parent = attribute[7:].split(b',', 1)[0]
+    return columns[0], start, feature_id, parent, end
+
+
+class GFF3Sorter:
+    '''Sort gff3 by seqid and start with children after their parent
+
+       the input is read twice.  The first read keeps, for each feature
+       with an ID, its seqid, start, line number and first Parent.  The
+       second gives every line a byte key, sorted in memory until they
+       pass memory bytes, then spilled to a sorted run in tmp_dir, and
+       the runs are merged into the output.
+
+       order 'position' keys on seqid, start, then depth below the top
+       level feature, so parents come before children starting at the
+       same base.  This is the order tabix needs, and BGZF output gets a
+       .tbi (or .csi) written in the same pass, see tabix.TabixIndex.
+       order 'tree' keys on the seqid of the top level feature then
+       (start, line) for each feature on the path down, walking each
+       gene depth first with its children together.  Overlapping genes
+       then leave starts out of order so tree order gets no index.
+
+       directives and comments are written first, ### is dropped and a
+       ##FASTA section is copied to the end unchanged.  Output is BGZF,
+       or gzip with compress='gzip'.
+    '''
+    def __init__(self, logger=None, memory=SORT_MEMORY, tmp_dir=None,
+                 compress='bgzf', level=6, threads=4, order='position'):
+        self.logger = logger or logging.getLogger('detect_incongruencies')
+        self.memory = memory or SORT_MEMORY
+        self.tmp_dir = tmp_dir
+        self.compress = compress
+        self.level = level
+        self.threads = threads
+        self.order = order
+        self.index_path = None  # .tbi or .csi of the last sort, if any
+        self.max_end = 0
+        self.features = {}  # ID: (seqid, start, line, first Parent)
+        self.runs = []  # sorted run files to merge
+        self.buffered = []  # keyed lines of the last run, while in memory
+        self.fasta = False  # the input has a ##FASTA section
+        self.unsorted = 0
+
+    def sort(self, gff, out):
+        '''write gff sorted to out, returns the number of feature lines'''
+        self.index_path = None
+        self.max_end = 0
+        self.read_features(gff)
+        work_dir = tempfile.mkdtemp(prefix='gff3_sort.', dir=self.tmp_dir)
+        tmp = '{}.{}.tmp'.format(out, os.getpid())
+        try:
+            header, count = self.spill_runs(gff, work_dir)
+            fh = self.open_output(tmp)
+            index = None
+            if self.compress != 'gzip' and self.order == 'position':
+                index = TabixIndex(self.max_end)
+            try:
+                for line in header:
+                    fh.write(line + b'\n')
+                if index:
+                    self.write_indexed(fh, index)
+                else:
+                    for record in self.merged():
+                        fh.write(record.split(b'\t', 1)[1])
+                if self.fasta:
+                    for line in self.fasta_section(gff):
+                        fh.write(line + b'\n')
+            finally:
+                fh.close()
+            os.rename(tmp, out)
+            if index:
+                self.write_index(index, out, fh)
+        finally:
+            self.features = {}
+            self.runs = []
+            self.buffered = []
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if self.unsorted:
+            self.logger.warning('{} lines without 9 columns '.format(
+                                                          self.unsorted) +
+                                'written unsorted at the end')
+        return count
+
+    def write_indexed(self, fh, index):
+        '''write the sorted features, adding each to index'''
+        for record in self.merged():
+            line = record.split(b'\t', 1)[1]
+            offset = fh.tell()
+            fh.write(line)
+            if record.startswith(UNSORTED):
+                continue
+            columns = line.split(b'\t', 5)
+            try:
+                index.add(columns[0], int(columns[3]) - 1, int(columns[4]),
+                          offset, fh.tell())
+            except ValueError:  # bad coordinates, left out of the index
+                continue
+
+    def write_index(self, index, out, writer):
+        '''write index next to out, if out came out sorted'''
+        for suffix in ('.tbi', '.csi'):  # drop an index of an older out
+            if os.path.exists(out + suffix):
+                os.remove(out + suffix)
+        if not index.sorted:
+            self.logger.warning('{} not in tabix order, no index'.format(out))
+            return
+        self.index_path = index.write(out + index.suffix, writer)
+
+    def open_output(self, path):
+        if self.compress == 'gzip':
+            return gzip.open(path, 'wb', self.level)
+        return BGZFWriter(path, self.level, self.threads, index=False)
+
+    def lines(self, gff):
+        '''feature, directive and comment lines up to any ##FASTA'''
+        for line in iter_byte_lines(StreamPipeline(gff).chunks()):
+            if line.startswith(b'##FASTA'):
+                self.fasta = True
+                return
+            yield line.rstrip()
+
+    def read_features(self, gff):
+        '''first read, remember where every feature with an ID sits'''
+        features = self.features
+        for number, line in enumerate(self.lines(gff), 1):
+            if not line or line.startswith(b'#'):
+                continue
+            fields = feature_fields(line)
+            if fields is None:
+                continue
+            seqid, start, feature_id, parent, end = fields
+            if end > self.max_end:
+                self.max_end = end
+            if feature_id is None:
+                continue
+            if feature_id in features:  # multi line feature, lowest start
+                known = features[feature_id]
+                if start < known[1]:
+                    features[feature_id] = (known[0], start, known[2],
+                                            known[3])
+                continue
+            features[feature_id] = (seqid, start, number, parent)
+
+    def key(self, fields, number):
+        '''sort key of a feature line, see the class docstring'''
+        seqid, start, feature_id, parent, end = fields
+        tree = self.order == 'tree'
+        path = [POSITION % (start, number)]
+        features = self.features
+        depth = 0
+        while parent and depth < MAX_DEPTH:
+            known = features.get(parent)
+            if known is None:  # an unknown Parent, taken as top level
+                break
+            depth += 1
+            if tree:
+                seqid = known[0]
+                path.append(POSITION % (known[1], known[2]))
+            parent = known[3]
+        if not tree:
+            return seqid + b'\x00' + DEPTH_POSITION % (start, depth, number)
+        path.append(seqid + b'\x00')
+        path.reverse()
+        return b''.join(path)
+
+    def spill_runs(self, gff, work_dir):
+        '''second read, write keyed lines as sorted runs
+
+           returns the header lines and the feature count
+        '''
+        header = []
+        buffered = []
+        size = 0
+        count = 0
+        for number, line in enumerate(self.lines(gff), 1):
+            if not line or line.startswith(b'###'):
+                continue
+            if line.startswith(b'#'):
+                header.append(line)
+                continue
+            fields = feature_fields(line)
+            if fields is None:
+                key = UNSORTED + POSITION % (0, number)
+                self.unsorted += 1
+            else:
+                key = self.key(fields, number)
+            record = key + b'\t' + line + b'\n'
+            buffered.append(record)
+            size += len(record) + LINE_OVERHEAD
+            count += 1
+            if size > self.memory:
+                self.write_run(buffered, work_dir)
+                buffered = []
+                size = 0
+        if self.runs and buffered:
+            self.write_run(buffered, work_dir)
+            buffered = []
+        buffered.sort()
+        self.buffered = buffered  # everything fit, no runs to merge
+        return header, count
+
+    def write_run(self, records, work_dir):
+        records.sort()
+        run = os.path.join(work_dir, 'run.{}'.format(len(self.runs)))
+        with open(run, 'wb') as fopen:
+            fopen.writelines(records)
+        self.runs.append(run)
+        self.logger.debug('Spilled sort run {}'.format(run))
+
+    def merged(self):
+        '''keyed records in order, from memory or merged from runs'''
+        if not self.runs:
+            for record in self.buffered:
+                yield record
+            self.buffered = []
+            return
+        files = [open(run, 'rb', RUN_BUFFER) for run in self.runs]
+        try:
+            for record in heapq.merge(*files):
+                yield record
+        finally:
+            for fopen in files:
+                fopen.close()
+
+    def fasta_section(self, gff):
+        '''the ##FASTA line and everything after it'''
+        found = False
+        for line in iter_byte_lines(StreamPipeline(gff).chunks()):
+            if not found and line.startswith(b'##FASTA'):
+                found = True
+            if found:
+                yield line
+
+
+if __name__ == '__main__':
+    print('import me to use GFF3Sorter')
+    sys.exit(1)
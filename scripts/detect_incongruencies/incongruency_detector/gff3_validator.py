@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+import sys
+import logging
+from .report import Findings
+
+STRANDS = frozenset([b'+', b'-', b'.', b'?'])
+PHASES = frozenset([b'0', b'1', b'2'])
+TRANSCRIPTS = (b'mRNA', b'transcript', b'ncRNA', b'lnc_RNA', b'tRNA', b'rRNA',
+               b'snRNA', b'snoRNA', b'miRNA', b'pseudogenic_transcript')
+PARENT_TYPES = {  # child type: allowed parent types
+    b'mRNA': (b'gene',),
+    b'CDS': (b'mRNA',),
+    b'exon': TRANSCRIPTS,
+    b'five_prime_UTR': (b'mRNA',),
+    b'three_prime_UTR': (b'mRNA',),
+}
+
+
+class Field:
+    '''format a bytes field as text, only when a message is built'''
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __format__(self, spec):
+        value = self.value
+        if isinstance(value, bytes):
+            value = value.decode(errors='replace')
+        return format(value, spec)
+
+
+def parse_attributes(column):
+    '''{tag: value} of gff3 column 9, bytes, the first value of a tag
+
+       tags can come in any order, with a trailing ; or without.  the
+       column is split once and every check of the line reads the dict
+    '''
+    attributes = {}
+    for attribute in column.split(b';'):
+        tag, _, value = attribute.partition(b'=')
+        if tag not in attributes:
+            attributes[tag] = value
+    return attributes
+
+
+class GFF3Validator:
+    '''Streaming structural checks for gff3, one feature line at a time
+
+       checks column count, coordinates, strand and phase, ID uniqueness,
+       Parent resolution and the gene -> mRNA -> CDS/exon hierarchy.
+
+       Features are held only until the tree they belong to is complete,
+       at a ### directive or a change of seqid, when unresolved Parents
+       are reported.  Only the IDs themselves are kept for the whole file
+       so uniqueness can be checked.
+
+       errors go through findings, a report.Findings, so a badly broken
+       file logs a bounded number of them.  Lines, types and IDs stay
+       bytes, they are decoded only for the messages that are logged.
+
+       given id_prefix and name_prefix the ID and Name of every feature
+       are checked too.  IDs start with id_prefix and Names with
+       name_prefix, genes need both, and an ID with Parents extends the
+       ID of one of them (gene -> mRNA -> CDS/exon/UTR).  The Parent is
+       read from the line itself so nothing more is kept.  Those are
+       id_name findings and do not fail the file.
+    '''
+    def __init__(self, logger, findings=None, id_prefix=None,
+                 name_prefix=None):
+        self.logger = logger
+        self.findings = findings or Findings(logger)
+        self.id_prefix = id_prefix
+        self.name_prefix = name_prefix
+        self.raw_id_prefix = id_prefix.encode() if id_prefix else None
+        self.raw_name_prefix = name_prefix.encode() if name_prefix else None
+        self.seen = set()  # every ID in the file
+        self.tree = {}  # ID: type for features not yet flushed
+        self.pending = []  # (line, type, parents) waiting for a parent
+        self.seqid = None
+        self.errors = 0
+
+    @property
+    def passed(self):
+        return not self.errors
+
+    def error(self, msg, line, *args):
+        '''count an error, msg.format(*args) is only built if logged'''
+        self.errors += 1
+        self.findings.add(logging.ERROR, 'gff3_structure',
+                          'gff3 ' + msg + ', line {}',
+                          *([Field(a) for a in args] + [line]))
+
+    def feature(self, columns, line, attributes=None):
+        '''check one feature line, bytes already split on tabs
+
+           attributes is parse_attributes of column 9, if the caller
+           has it already
+        '''
+        if len(columns) != 9:
+            self.error('expected 9 columns found {}', line, len(columns))
+            return
+        seqid, _, feature_type, start, end, _, strand, phase, column = columns
+        if seqid != self.seqid:  # trees do not span seqids
+            self.flush()
+            self.seqid = seqid
+        try:
+            start = int(start)
+            end = int(end)
+        except ValueError:
+            self.error('start and end must be integers', line)
+        else:
+            if start < 1 or start > end:
+                self.error('bad coordinates {}-{}', line, start, end)
+        if strand not in STRANDS:
+            self.error('bad strand {}', line, strand)
+        if feature_type == b'CDS' and phase not in PHASES:
+            self.error('CDS phase must be 0, 1 or 2', line)
+        if attributes is None:
+            attributes = parse_attributes(column)
+        feature_id = attributes.get(b'ID')
+        parents = attributes.get(b'Parent')
+        if self.raw_id_prefix:  # ID and Name of every feature type
+            name = attributes.get(b'Name')
+            if feature_type == b'gene' and not (feature_id and name):
+                self.id_name('No ID and Name attributes. line {}', line)
+            if feature_id:
+                if not feature_id.startswith(self.raw_id_prefix):
+                    self.id_name('{} id {}, should start with {} line {}',
+                                 feature_type, feature_id, self.id_prefix,
+                                 line)
+                # genes have no Parent, a child usually has one
+                if parents and (feature_id == parents or
+                                not feature_id.startswith(parents)):
+                    if not self.extends(feature_id, parents):  # several
+                        self.id_name('{} id {} does not extend Parent {} '
+                                     'line {}', feature_type, feature_id,
+                                     parents, line)
+            if name and not name.startswith(self.raw_name_prefix):
+                self.id_name('{} name {}, should start with {} line {}',
+                             feature_type, name, self.name_prefix, line)
+        tree = self.tree
+        if feature_id:
+            if feature_id in tree:  # multi line features share one ID
+                if tree[feature_id] != feature_type:
+                    self.error('duplicate ID {}', line, feature_id)
+            elif feature_id in self.seen:  # from an earlier tree
+                self.error('duplicate ID {}', line, feature_id)
+            else:  # bytes keep their hash, the second lookup is cheap
+                self.seen.add(feature_id)
+                tree[feature_id] = feature_type
+        if not parents:
+            if feature_type in PARENT_TYPES:
+                self.error('{} has no Parent', line, feature_type)
+        elif b',' in parents:
+            parents = parents.split(b',')
+            if not self.check_parents(feature_type, parents, line):
+                self.pending.append((line, feature_type, parents))
+        else:  # one Parent, checked here without a call
+            parent_type = tree.get(parents)
+            if parent_type is None:
+                self.pending.append((line, feature_type, [parents]))
+            else:
+                allowed = PARENT_TYPES.get(feature_type)
+                if allowed and parent_type not in allowed:
+                    self.error('{} should not be a child of {} {}', line,
+                               feature_type, parent_type, parents)
+
+    def id_name(self, msg, *args):
+        '''an ID or Name finding, these do not fail the file'''
+        self.findings.add(logging.ERROR, 'id_name', msg,
+                          *[Field(a) for a in args])
+
+    @staticmethod
+    def extends(feature_id, parents):
+        '''True if feature_id is one of the , separated parents and more'''
+        for parent in parents.split(b','):
+            if len(feature_id) > len(parent) and feature_id.startswith(parent):
+                return True
+        return False
+
+    def check_parents(self, feature_type, parents, line):
+        '''check parent types, False if any parent is not seen yet'''
+        tree = self.tree
+        for parent in parents:
+            if parent not in tree:
+                return False
+        allowed = PARENT_TYPES.get(feature_type)
+        for parent in parents:
+            parent_type = tree[parent]
+            if allowed and parent_type not in allowed:
+                self.error('{} should not be a child of {} {}', line,
+                           feature_type, parent_type, parent)
+        return True
+
+    def flush(self):
+        '''resolve forward references and drop the completed trees'''
+        for line, feature_type, parents in self.pending:
+            if not self.check_parents(feature_type, parents, line):
+                missing = [p for p in parents if p not in self.tree]
+                self.error('Parent {} not found', line, b','.join(missing))
+        self.pending = []
+        self.tree = {}
+
+    def close(self):
+        self.flush()
+
+
+if __name__ == '__main__':
+    print('import me to use GFF3Validator and parse_attributes')
+    sys.exit(1)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import bz2
+import lzma
+import zlib
+import shutil
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import zstandard
+except ImportError:  # zstd files are reported, everything else works
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+MAGIC = ((GZIP_MAGIC, 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'),
+         (b'\x28\xb5\x2f\xfd', 'zstd'))
+GZIP_WBITS = zlib.MAX_WBITS | 16  # zlib window for gzip members
+EXTERNAL_MIN = 64 * 1024 * 1024  # smaller files are not worth a process
+EXTERNAL_TOOLS = (('igzip', '-dc'), ('pigz', '-dc'))
+TRAILER = struct.Struct('<II')  # crc32, uncompressed size
+
+SETTINGS = {'threads': 4, 'external': 'auto'}  # see configure()
+
+
+def configure(threads=None, external=None):
+    '''set inflate threads and the external gunzip for this process
+
+       external is 'auto' (igzip or pigz if on PATH), a program name or
+       path, or 'none'
+    '''
+    if threads is not None:
+        SETTINGS['threads'] = threads
+    if external is not None:
+        SETTINGS['external'] = external
+
+
+def sniff(first):
+    '''compression of a file starting with first, None if not compressed'''
+    for magic, name in MAGIC:
+        if first.startswith(magic):
+            return name
+    return None
+
+
+def decompressor(name):
+    '''new decompressor object for one gzip, bz2, xz or zstd stream'''
+    if name == 'gzip':
+        return zlib.decompressobj(GZIP_WBITS)
+    if name == 'bz2':
+        return bz2.BZ2Decompressor()
+    if name == 'xz':
+        return lzma.LZMADecompressor()
+    if zstandard is None:
+        raise IOError('zstd file but the zstandard module is not installed')
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def bgzf_block_size(data, pos=0):
+    '''BSIZE + 1 of the BGZF block at pos, None if it is not one, 0 if
+       data ends before the extra field does
+
+       a BGZF member is gzip with FEXTRA holding a BC subfield
+    '''
+    if (data[pos:pos + 4] != b'\x1f\x8b\x08\x04' or
+            len(data) < pos + 12):
+        return None
+    xlen = struct.unpack_from('<H', data, pos + 10)[0]
+    extra = pos + 12
+    end = extra + xlen
+    if len(data) < end:
+        return 0
+    while extra + 4 <= end:
+        si = data[extra:extra + 2]
+        slen = struct.unpack_from('<H', data, extra + 2)[0]
+        if si == b'BC' and slen == 2:
+            return struct.unpack_from('<H', data, extra + 4)[0] + 1
+        extra += 4 + slen
+    return None
+
+
+def inflate_block(block):
+    '''inflate one complete BGZF block, checking crc and size'''
+    xlen = struct.unpack_from('<H', block, 10)[0]
+    data = zlib.decompress(block[12 + xlen:-8], -15)
+    crc, size = TRAILER.unpack_from(block, len(block) - 8)
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise IOError('BGZF block failed crc/size check')
+    return data
+
+
+def external_command(path, first):
+    '''[tool, -dc, path] to inflate path in another process, or None
+
+       only for plain gzip over EXTERNAL_MIN, BGZF inflates faster on
+       threads here
+    '''
+    external = SETTINGS['external']
+    if not external or external == 'none':
+        return None
+    if bgzf_block_size(first) or os.path.getsize(path) < EXTERNAL_MIN:
+        return None
+    if external == 'auto':
+        for tool, flag in EXTERNAL_TOOLS:
+            found = shutil.which(tool)
+            if found:
+                return [found, flag, path]
+        return None
+    found = shutil.which(external)
+    if not found:
+        return None
+    return [found, '-dc', path]
+
+
+class StreamInflater:
+    '''inflate gzip, bz2, xz or zstd a chunk at a time
+
+       concatenated streams (gzip members, pbzip2 and pixz output, zstd
+       frames) are followed one after another
+    '''
+    def __init__(self, name='gzip'):
+        self.name = name
+        self.decompressor = decompressor(name)
+
+    def feed(self, chunk):
+        out = []
+        while chunk:
+            if getattr(self.decompressor, 'eof', False):  # next stream
+                self.decompressor = decompressor(self.name)
+            data = self.decompressor.decompress(chunk)
+            if data:
+                out.append(data)
+            if getattr(self.decompressor, 'eof', False):
+                chunk = self.decompressor.unused_data
+            else:
+                chunk = b''
+        return b''.join(out)
+
+    def close(self):
+        if not getattr(self.decompressor, 'eof', True):
+            raise IOError('{} stream is truncated'.format(self.name))
+        return b''
+
+    def shutdown(self):
+        pass
+
+
+class BGZFInflater:
+    '''inflate BGZF a chunk at a time, blocks in parallel on threads
+
+       block boundaries are read from each block header so whole blocks
+       go to the pool, zlib drops the GIL while it inflates.  output
+       comes back in order, at most threads * 4 blocks are in flight.
+       From a member without a BC field on, the rest is inflated
+       serially by a StreamInflater.
+    '''
+    def __init__(self, threads=4):
+        self.pool = ThreadPoolExecutor(max_workers=max(threads, 1))
+        self.max_pending = max(threads, 1) * 4
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.serial = None  # StreamInflater once blocks stop being BGZF
+
+    def feed(self, chunk):
+        if self.serial:
+            return self.serial.feed(chunk)
+        buf = self.buffer
+        buf += chunk
+        pos = 0
+        out = []
+        while len(buf) - pos >= 18:
+            size = bgzf_block_size(buf, pos)
+            if size is None:  # not BGZF from here, finish in order
+                out.extend(self.drain())
+                self.serial = StreamInflater('gzip')
+                out.append(self.serial.feed(bytes(buf[pos:])))
+                pos = len(buf)
+                break
+            if not size or len(buf) - pos < size:  # rest in the next chunk
+                break
+            self.pending.append(self.pool.submit(inflate_block,
+                                                 bytes(buf[pos:pos + size])))
+            pos += size
+            while (self.pending and (self.pending[0].done() or
+                                     len(self.pending) > self.max_pending)):
+                out.append(self.pending.popleft().result())
+        del buf[:pos]
+        return b''.join(out)
+
+    def drain(self):
+        out = []
+        while self.pending:
+            out.append(self.pending.popleft().result())
+        return out
+
+    def close(self):
+        try:
+            out = self.drain()
+            if self.serial:
+                out.append(self.serial.close())
+            elif self.buffer:
+                raise IOError('BGZF stream is truncated')
+        finally:
+            self.shutdown()
+        return b''.join(out)
+
+    def shutdown(self):
+        '''stop the pool, without waiting if the stream was abandoned'''
+        for future in self.pending:
+            future.cancel()
+        self.pool.shutdown()
+
+
+def make_inflater(first):
+    '''inflater for a file starting with first, None if not compressed
+
+       BGZFInflater if first starts a BGZF block, else a StreamInflater
+    '''
+    name = sniff(first)
+    if name is None:
+        return None
+    threads = SETTINGS['threads']
+    if name == 'gzip' and threads > 1 and bgzf_block_size(first):
+        return BGZFInflater(threads)
+    return StreamInflater(name)
+
+
+if __name__ == '__main__':
+    print('import me to use make_inflater')
+    sys.exit(1)
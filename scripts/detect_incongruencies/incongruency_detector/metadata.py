@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+import os
+import re
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .catalog import load_yaml, yaml
+from .file_helpers import fingerprint
+from .snapshot import Snapshot
+
+DEFAULT_TEMPLATE = os.path.normpath(os.path.join(
+                       os.path.dirname(os.path.abspath(__file__)), '..',
+                       '..', '..', 'templates', 'template__README.KEY.yml'))
+DEFAULT_METADATA_CACHE = './detect_incongruencies_index/metadata.json'
+METADATA_THREADS = 8
+FIELD_PATTERNS = {  # field: (pattern its value must match, what it means)
+    'scientific_name_abbrev': (r'^[a-z]{5}$', 'five lower case letters, ' +
+                               'three of the genus and two of the species'),
+}
+OPTIONAL_FIELDS = ('bioproject', 'genotype', 'original_file_creation_date',
+                   'local_file_creation_date', 'publication_title',
+                   'citations', 'file_transformation', 'changes')
+DOI_FIELDS = ('publication_doi', 'dataset_doi')
+
+
+class ReadmeSchema:
+    '''README.<KEY>.yml rules compiled from the template once
+
+       keys of the template are required unless in OPTIONAL_FIELDS, the
+       template says "if applicable" for those or leaves them empty.
+       keys it does not have are reported, and fields in FIELD_PATTERNS
+       must match their pattern
+    '''
+    def __init__(self, template=DEFAULT_TEMPLATE):
+        document = load_yaml(template)
+        if not isinstance(document, dict):
+            raise ValueError('{} is not a YAML mapping'.format(template))
+        self.template = template
+        self.fingerprint = list(fingerprint(template))
+        self.required = [f for f in document if f not in OPTIONAL_FIELDS]
+        self.known = set(document)
+        self.patterns = dict((field, (re.compile(pattern), meaning))
+                             for field, (pattern, meaning) in
+                             FIELD_PATTERNS.items())
+
+    def check(self, document, collection):
+        '''[(level, msg, args)] for a parsed README of collection, the
+           parse_collection name of its directory
+        '''
+        if not isinstance(document, dict):
+            return [(logging.ERROR, 'README is not a YAML mapping', [])]
+        problems = []
+        for field in self.required:
+            if field not in document:
+                problems.append((logging.ERROR, 'README has no {}', [field]))
+        for field in document:
+            if field not in self.known:
+                problems.append((logging.WARNING,
+                                 'README field {} is not in the template',
+                                 [str(field)]))
+        for field, (pattern, meaning) in self.patterns.items():
+            value = document.get(field)
+            if value is not None and not pattern.match(str(value)):
+                problems.append((logging.ERROR, 'README {} {} should be {}',
+                                 [field, str(value), meaning]))
+        identifier = document.get('identifier')
+        if identifier is not None and str(identifier) not in (
+                                 collection['name'], collection['key']):
+            problems.append((logging.ERROR,
+                             'README identifier {} should be {} or {}',
+                             [str(identifier), collection['key'],
+                              collection['name']]))
+        return problems
+
+
+def readme_dois(document):
+    '''{field: DOI} of a parsed README, none and empty values left out
+
+       a list of DOIs is numbered, publication_doi, publication_doi_2 ...
+    '''
+    dois = {}
+    if not isinstance(document, dict):
+        return dois
+    for field in DOI_FIELDS:
+        values = document.get(field)
+        if not isinstance(values, list):
+            values = [values]
+        values = [str(v).strip() for v in values if v is not None]
+        values = [v for v in values if v and v.lower() != 'none']
+        for n, value in enumerate(values, 1):
+            dois[field if n == 1 else '{}_{}'.format(field, n)] = value
+    return dois
+
+
+class MetadataValidator:
+    '''Check README.<KEY>.yml and MANIFEST.<KEY>.*.yml of collections
+
+       scan() parses the yml files of many collections at once on
+       threads.  The outcome for each file, README problems and DOIs or
+       the file names a MANIFEST lists, is kept in a Snapshot keyed on
+       the file and template fingerprints, so a later run parses only
+       the files that changed.  check() answers from those, the MANIFEST
+       names are compared with the collection's directory listing.
+    '''
+    def __init__(self, template=DEFAULT_TEMPLATE, cache=None, logger=None,
+                 threads=METADATA_THREADS):
+        self.logger = logger or logging.getLogger('detect_incongruencies')
+        self.schema = ReadmeSchema(template)
+        self.cache = Snapshot(cache) if cache else None
+        self.threads = max(1, threads)
+        self.results = {}  # yml path: outcome, this run
+
+    def state(self, path):
+        try:
+            return [list(fingerprint(path)), self.schema.fingerprint]
+        except OSError:
+            return None
+
+    def parse(self, path, collection):
+        '''outcome for one yml file, {'problems', 'dois'} for a README,
+           {'problems', 'names'} for a MANIFEST
+        '''
+        outcome = {'problems': [], 'dois': {}, 'names': []}
+        try:
+            document = load_yaml(path)
+        except (IOError, yaml.YAMLError) as e:
+            outcome['problems'].append((logging.ERROR,
+                                        'Could not parse {}: {}',
+                                        [os.path.basename(path),
+                                         str(e).replace('\n', ' ')]))
+            return outcome
+        if os.path.basename(path).startswith('README.'):
+            outcome['problems'] = self.schema.check(document, collection)
+            outcome['dois'] = readme_dois(document)
+        elif isinstance(document, dict):
+            outcome['names'] = [str(name) for name in document]
+        else:
+            outcome['problems'].append((logging.ERROR,
+                                        '{} is not a YAML mapping',
+                                        [os.path.basename(path)]))
+        return outcome
+
+    def yml_files(self, collection):
+        return collection.get('readme_yml', []) + collection.get('manifests',
+                                                                 [])
+
+    def scan(self, collections):
+        '''parse the yml files of scan_collection records on threads,
+           those unchanged since the cache was saved are not read
+        '''
+        cache = self.cache
+        todo = []
+        for collection in collections:
+            if collection is None:
+                continue
+            for path in self.yml_files(collection):
+                if path in self.results:
+                    continue
+                state = self.state(path)
+                entry = cache.get(path, state) if cache else None
+                if entry is not None:
+                    self.results[path] = entry['result']
+                else:
+                    todo.append((path, state, collection))
+        if not todo:
+            return
+        self.logger.info('Parsing {} README and MANIFEST files'.format(
+                                                                  len(todo)))
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            outcomes = pool.map(lambda t: self.parse(t[0], t[2]), todo)
+            for (path, state, collection), outcome in zip(todo, outcomes):
+                self.results[path] = outcome
+                if cache is not None and state is not None:
+                    cache.put(path, state, outcome, [])
+
+    def readme(self, path, collection):
+        '''outcome for the README at path, parsed if not scanned yet'''
+        if path not in self.results:
+            self.scan([dict(collection, readme_yml=[path], manifests=[])])
+        return self.results[path]
+
+    def check(self, collection):
+        '''[(level, msg, args)] for a scan_collection record'''
+        self.scan([collection])
+        problems = []
+        readmes = collection.get('readme_yml', [])
+        if len(readmes) != 1:
+            problems.append((logging.WARNING,
+                             'Expected one README.{}.yml, found {}',
+                             [collection['key'], len(readmes)]))
+        files = set(collection['files'])  # the one listing of the collection
+        for path in self.yml_files(collection):
+            outcome = self.results[path]
+            problems.extend(tuple(p) for p in outcome['problems'])
+            for name in outcome['names']:
+                if name not in files:
+                    problems.append((logging.ERROR,
+                                     '{} is listed in {} but missing',
+                                     [name, os.path.basename(path)]))
+        return problems
+
+    def save(self):
+        if self.cache is not None:
+            self.cache.save()
+
+
+if __name__ == '__main__':
+    print('import me to use MetadataValidator')
+    sys.exit(1)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+import io
+import os
+import sys
+import queue
+import threading
+import subprocess
+from .inflate import GZIP_MAGIC, external_command, make_inflater
+
+CHUNK_SIZE = 4 * 1024 * 1024  # bytes read from disk per step
+SETTINGS = {'chunk_size': CHUNK_SIZE}  # see configure()
+
+
+def configure(chunk_size=None):
+    '''set the bytes read per step for pipelines made after this'''
+    if chunk_size:
+        SETTINGS['chunk_size'] = chunk_size
+
+
+class StreamPipeline:
+    '''Read a file from disk once and hand every chunk to consumers
+
+       raw consumers get the bytes as stored (anything with update(),
+       hashlib objects work as is).  stream consumers get the inflated
+       bytes through feed(data) and are closed once the file is done.
+
+       the file is opened once and its compression (gzip, bz2, xz, zstd
+       or none) sniffed from the first chunk.  BGZF is inflated a block
+       per thread.  Large plain gzip without raw consumers is inflated by
+       igzip or pigz when one is installed, see inflate.configure.
+    '''
+    def __init__(self, path, chunk_size=None):
+        self.path = path
+        self.chunk_size = chunk_size or SETTINGS['chunk_size']
+        self.raw_consumers = []
+        self.consumers = []
+        self.inflater = None
+        self.bytes_read = 0
+        self.bytes_inflated = 0
+
+    def add_raw_consumer(self, consumer):
+        '''register a consumer of the on-disk bytes'''
+        self.raw_consumers.append(consumer)
+        return consumer
+
+    def add_consumer(self, consumer):
+        '''register a consumer of the decompressed bytes'''
+        self.consumers.append(consumer)
+        return consumer
+
+    def chunks(self, inflate=True):
+        '''read the file, yielding each inflated chunk after consumers
+
+           lets a caller parse the stream itself while consumers (a tee
+           to a subprocess, a checksum) share the same read
+        '''
+        consumers = self.consumers
+        with open(self.path, 'rb') as fopen:
+            first = fopen.read(self.chunk_size)
+            command = None
+            if (inflate and not self.raw_consumers and
+                    first.startswith(GZIP_MAGIC)):
+                command = external_command(self.path, first)
+            if command is None:
+                chunks = iter(lambda: fopen.read(self.chunk_size), b'')
+                for chunk in self.read_chunks(first, chunks, inflate):
+                    yield chunk
+        if command is not None:  # the other process reads the file
+            for chunk in self.external_chunks(command):
+                yield chunk
+        for consumer in consumers:
+            consumer.close()
+
+    def read_chunks(self, first, chunks, inflate):
+        '''hand first and the rest of chunks to consumers, inflating'''
+        raw_consumers = self.raw_consumers
+        consumers = self.consumers
+        inflater = None
+        if inflate:
+            inflater = self.inflater = make_inflater(first)
+        try:
+            chunk = first
+            while chunk:
+                self.bytes_read += len(chunk)
+                for consumer in raw_consumers:
+                    consumer.update(chunk)
+                if inflate:
+                    if inflater:
+                        chunk = inflater.feed(chunk)
+                    self.bytes_inflated += len(chunk)
+                    for consumer in consumers:
+                        consumer.feed(chunk)
+                    yield chunk
+                chunk = next(chunks, b'')
+            if inflater:  # blocks still in flight, raises if truncated
+                chunk = inflater.close()
+                if chunk:
+                    self.bytes_inflated += len(chunk)
+                    for consumer in consumers:
+                        consumer.feed(chunk)
+                    yield chunk
+        finally:  # the caller may stop early
+            if inflater:
+                inflater.shutdown()
+
+    def external_chunks(self, command):
+        '''inflated chunks from command's stdout, see inflate.EXTERNAL_TOOLS'''
+        consumers = self.consumers
+        self.bytes_read = os.path.getsize(self.path)
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+        try:
+            for chunk in iter(lambda: proc.stdout.read(self.chunk_size), b''):
+                self.bytes_inflated += len(chunk)
+                for consumer in consumers:
+                    consumer.feed(chunk)
+                yield chunk
+        finally:
+            proc.stdout.close()
+            error = proc.stderr.read()
+            proc.stderr.close()
+            exit_val = proc.wait()
+        if exit_val:
+            raise IOError('{} failed on {}: {}'.format(command[0], self.path,
+                                                       error.decode().strip()))
+
+    def run(self):
+        '''stream the file through all consumers'''
+        for chunk in self.chunks(inflate=bool(self.consumers)):
+            pass
+        return self
+
+
+def iter_line_blocks(chunks):
+    '''yield a list of lines per byte chunk, split on \n only
+
+       a \r before the \n is left on the line.  Hot loops chain the
+       lists, itertools.chain.from_iterable, rather than resume a
+       generator for every line
+    '''
+    remainder = b''
+    for chunk in chunks:
+        lines = (remainder + chunk).split(b'\n')
+        remainder = lines.pop()
+        yield lines
+    if remainder:
+        yield [remainder]
+
+
+def iter_byte_lines(chunks):
+    '''yield lines as bytes, without line endings, from byte chunks
+
+       nothing is decoded, parsers decode only the fields they keep
+    '''
+    for lines in iter_line_blocks(chunks):
+        for line in lines:
+            yield line.rstrip(b'\r')
+
+
+class ProcessTee:
+    '''Stream consumer copying chunks to a subprocess stdin
+
+       writes happen on a thread so the subprocess and the python
+       consumers of the same stream run at the same time.  At most
+       max_chunks are buffered before feed() blocks.
+    '''
+    def __init__(self, stdin, max_chunks=8):
+        self.stdin = stdin
+        self.queue = queue.Queue(max_chunks)
+        self.broken = False  # the subprocess stopped reading
+        self.writer = threading.Thread(target=self.write)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def write(self):
+        stdin = self.stdin
+        for chunk in iter(self.queue.get, None):
+            if self.broken:
+                continue  # keep draining so feed() never blocks
+            try:
+                stdin.write(chunk)
+            except (IOError, OSError):
+                self.broken = True
+        try:
+            stdin.close()
+        except (IOError, OSError):
+            self.broken = True
+
+    def feed(self, data):
+        self.queue.put(data)
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+
+class ChunkReader(io.RawIOBase):
+    '''Read only binary file over a chunk iterator, for io.BufferedReader
+
+       lets return_filehandle hand out StreamPipeline's inflated stream
+       as an ordinary file handle
+    '''
+    def __init__(self, chunks):
+        io.RawIOBase.__init__(self)
+        self.chunks = chunks
+        self.chunk = b''
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.pos >= len(self.chunk):
+            self.chunk = next(self.chunks, None)
+            self.pos = 0
+            if self.chunk is None:
+                self.chunk = b''
+                return 0
+        size = min(len(b), len(self.chunk) - self.pos)
+        b[:size] = self.chunk[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.chunks.close()
+        io.RawIOBase.close(self)
+
+
+if __name__ == '__main__':
+    print('import me to use StreamPipeline, ProcessTee and ChunkReader')
+    sys.exit(1)
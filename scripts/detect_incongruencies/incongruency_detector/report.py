@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import logging
+import resource
+from contextlib import contextmanager
+
+INCONGRUENCIES = {  # Detector.incongruencies key: (file type, kinds)
+    'Genome Name': ('genome', ('filename',)),
+    'Genome Headers': ('genome', ('header', 'header_scan')),
+    'Annotation Name': ('annotation', ('filename',)),
+    'GFF File': ('annotation', ('gff3_scan', 'gt', 'missing_seqid',
+                                'seqid_end', 'id_name', 'gff3_structure')),
+    'Companion Files': ('annotation', ('companion', 'companions')),
+    'Checksums': (None, ('checksum',)),
+    'DOIs': (None, ('doi',)),
+}
+
+
+def peak_rss():
+    '''peak resident set size in KiB of this process and its children'''
+    return {'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}
+
+
+def child_cpu():
+    '''cpu seconds of waited for child processes (gt, workers)'''
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class Findings:
+    '''Count findings by kind and log only the first limit of each
+
+       a GFF3 against the wrong assembly can have millions of bad lines,
+       formatting and logging every one costs more than the parsing.
+       add() takes the message unformatted and only formats it for the
+       examples that are logged.  summarize() logs the count of each kind
+       that went over the limit.  limit None logs everything.
+    '''
+    def __init__(self, logger, limit=None):
+        self.logger = logger
+        self.limit = limit
+        self.counts = {}
+
+    def add(self, level, kind, msg, *args):
+        '''count one finding, log msg.format(*args) if under the limit'''
+        count = self.counts.get(kind, 0) + 1
+        self.counts[kind] = count
+        if self.limit is None or count <= self.limit:
+            self.logger.log(level, msg.format(*args), extra={'finding': kind})
+
+    def summarize(self):
+        '''log a line per kind over the limit, return and reset counts'''
+        counts = self.counts
+        for kind in sorted(counts):
+            if self.limit is not None and counts[kind] > self.limit:
+                self.logger.warning('{} {} findings, first {} shown'.format(
+                                                                  counts[kind],
+                                                                  kind,
+                                                                  self.limit),
+                                    extra={'finding': kind})
+        self.counts = {}
+        return counts
+
+
+class Report(logging.Handler):
+    '''Findings and per stage costs for each checked file
+
+       attached to the Detector logger.  Warnings and errors logged while
+       a file is current become findings of that file, kind is the
+       finding attribute of the record, set with
+       logger.error(msg, extra={'finding': kind}), or the current stage.
+       Stages (filename, checksum, header_scan, genome_index, gff3_scan,
+       gt, normalize, doi) record wall and cpu seconds and bytes
+       processed.
+    '''
+    def __init__(self):
+        logging.Handler.__init__(self, logging.WARNING)
+        self.started = time.time()
+        self.entries = {}  # file: entry, in the order files were seen
+        self.done = []  # entries taken from workers or the snapshot
+        self.findings = []  # logged while no file was current
+        self.path = None
+        self.stage_name = None
+
+    def set_file(self, path, file_type=None):
+        '''make path the current file, later findings and stages are its'''
+        self.path = path
+        if path is None or path in self.entries:
+            return
+        directory = os.path.dirname(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        self.entries[path] = {'collection': os.path.basename(directory),
+                              'file': path, 'type': file_type,
+                              'size': size, 'passed': None, 'stages': {},
+                              'findings': []}
+
+    def finish_file(self, passed, counts=None, provisional=False):
+        '''record the outcome and Findings counts of the current file,
+           provisional if only part of it was checked
+        '''
+        entry = self.entries.get(self.path)
+        if entry is not None:
+            entry['passed'] = bool(passed)
+            if provisional:
+                entry['provisional'] = True
+            entry['finding_counts'] = counts or {}
+            entry['peak_rss_kb'] = peak_rss()['self']
+        self.path = None
+
+    def add_stage(self, name, wall, cpu, nbytes=None, **extra):
+        '''add the cost of one stage to the current file'''
+        entry = self.entries.get(self.path)
+        if entry is None:
+            return
+        stage = entry['stages'].setdefault(name, {'wall': 0.0, 'cpu': 0.0,
+                                                  'bytes': 0})
+        stage['wall'] += wall
+        stage['cpu'] += cpu
+        if nbytes:
+            stage['bytes'] += nbytes
+        stage.update(extra)
+
+    @contextmanager
+    def stage(self, name):
+        '''time the enclosed block as stage name
+
+           yields a dict, set bytes (and anything else worth keeping) in
+           it before the block ends
+        '''
+        stats = {}
+        outer = self.stage_name
+        self.stage_name = name
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield stats
+        finally:
+            self.stage_name = outer
+            nbytes = stats.pop('bytes', None)
+            self.add_stage(name, time.perf_counter() - wall,
+                           time.process_time() - cpu, nbytes, **stats)
+
+    def emit(self, record):
+        if getattr(record, 'replayed', False):  # recorded where it happened
+            return
+        finding = {'kind': getattr(record, 'finding', None) or
+                           self.stage_name or 'other',
+                   'stage': self.stage_name, 'level': record.levelname,
+                   'message': record.getMessage()}
+        entry = self.entries.get(self.path)
+        if entry is None:
+            self.findings.append(finding)
+        else:
+            entry['findings'].append(finding)
+
+    def take(self, failed=False):
+        '''remove and return the entries so far, to hand to another
+           process or the snapshot.  failed marks entries without an
+           outcome as failed, their check exited before finish_file
+        '''
+        entries = list(self.entries.values())
+        if failed:
+            for entry in entries:
+                if entry['passed'] is None:
+                    entry['passed'] = False
+        self.entries = {}
+        self.path = None
+        return entries
+
+    def add(self, entries, cached=False):
+        '''add entries made by take, cached if replayed from a snapshot'''
+        for entry in entries or []:
+            if cached:
+                entry = dict(entry, cached=True)
+            self.done.append(entry)
+
+    def files(self):
+        return self.done + list(self.entries.values())
+
+    def incongruencies(self):
+        '''findings grouped like Detector.incongruencies, by kind and
+           then by stage
+        '''
+        grouped = dict((k, []) for k in INCONGRUENCIES)
+        for entry in self.files():
+            for finding in entry['findings']:
+                key = (self.group(entry['type'], finding['kind']) or
+                       self.group(entry['type'], finding['stage']))
+                if key:
+                    grouped[key].append(dict(finding, file=entry['file']))
+        return grouped
+
+    @staticmethod
+    def group(file_type, kind):
+        for key, (key_type, kinds) in INCONGRUENCIES.items():
+            if key_type in (None, file_type) and kind in kinds:
+                return key
+        return None
+
+    def summary(self):
+        '''run totals per stage, peak rss and findings outside any file'''
+        stages = {}
+        for entry in self.files():
+            for name, stage in entry['stages'].items():
+                total = stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0,
+                                                 'bytes': 0, 'files': 0})
+                total['wall'] += stage['wall']
+                total['cpu'] += stage['cpu']
+                total['bytes'] += stage.get('bytes', 0)
+                total['files'] += 1
+        for total in stages.values():
+            if total['wall'] and total['bytes']:
+                total['mb_per_s'] = total['bytes'] / total['wall'] / 1e6
+        files = self.files()
+        counts = {}  # every finding by kind, logged or not
+        for entry in files:
+            for kind, count in entry.get('finding_counts', {}).items():
+                counts[kind] = counts.get(kind, 0) + count
+        return {'files': len(files),
+                'failed': sum(1 for e in files if e['passed'] is False),
+                'provisional': sum(1 for e in files if e.get('provisional')),
+                'findings': sum(len(e['findings']) for e in files) +
+                            len(self.findings),
+                'finding_counts': counts,
+                'wall': time.time() - self.started,
+                'cpu': time.process_time() + child_cpu(),
+                'peak_rss_kb': peak_rss(), 'stages': stages,
+                'other_findings': self.findings}
+
+    def write(self, path):
+        '''write the report, JSON Lines if path ends in .jsonl
+
+           JSON Lines holds one file entry per line and the summary last
+        '''
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as fopen:
+            if path.endswith('.jsonl'):
+                for entry in self.files():
+                    fopen.write(json.dumps(entry) + '\n')
+                fopen.write(json.dumps({'summary': self.summary()}) + '\n')
+            else:
+                json.dump({'files': self.files(), 'summary': self.summary()},
+                          fopen, indent=1)
+        os.rename(tmp, path)
+
+
+if __name__ == '__main__':
+    print('import me to use Report')
+    sys.exit(1)
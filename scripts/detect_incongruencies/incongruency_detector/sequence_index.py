@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from glob import glob
+from .file_helpers import fingerprint
+from .fasta_scanner import FastaScanner
+
+
+class SequenceIndex:
+    '''Compact seqid to length lookup for a genome_main
+
+       the .fai columns are kept in parallel arrays in file order, the
+       order samtools and GATK take as the sequence dictionary.  Lookups
+       bisect a sorted list of the same interned names, rows maps it
+       back, so a million scaffold assembly costs little more than its
+       names.
+    '''
+    def __init__(self, records=()):
+        records = list(records)
+        self.names = [sys.intern(r[0]) for r in records]
+        self.lengths = array('q', (r[1] for r in records))
+        self.offsets = array('q', (r[2] for r in records))
+        self.line_bases = array('q', (r[3] for r in records))
+        self.line_widths = array('q', (r[4] for r in records))
+        rows = sorted(range(len(records)), key=self.names.__getitem__)
+        self.sorted_names = [self.names[i] for i in rows]
+        self.rows = array('q', rows)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, seqid):
+        return self.position(seqid) is not None
+
+    def position(self, seqid):
+        '''row of seqid in the arrays or None'''
+        names = self.sorted_names
+        i = bisect_left(names, seqid)
+        if i < len(names) and names[i] == seqid:
+            return self.rows[i]
+        return None
+
+    def length(self, seqid):
+        '''sequence length for seqid or None if not in the genome'''
+        i = self.position(seqid)
+        if i is None:
+            return None
+        return self.lengths[i]
+
+    @classmethod
+    def from_fai(cls, fai):
+        '''load a samtools style .fai'''
+        records = []
+        with open(fai) as fopen:
+            for line in fopen:
+                fields = line.rstrip('\n').split('\t')
+                records.append((fields[0],) + tuple(int(f) for f in
+                                                    fields[1:5]))
+        return cls(records)
+
+    def write_fai(self, fai):
+        '''write a samtools style .fai in file order, replaced atomically'''
+        tmp = '{}.{}.tmp'.format(fai, os.getpid())
+        with open(tmp, 'w') as fopen:
+            for i, name in enumerate(self.names):
+                fopen.write('{}\t{}\t{}\t{}\t{}\n'.format(
+                                                      name, self.lengths[i],
+                                                      self.offsets[i],
+                                                      self.line_bases[i],
+                                                      self.line_widths[i]))
+        os.rename(tmp, fai)
+
+
+class FastaIndexer(FastaScanner):
+    '''Stream consumer collecting .fai records, index() builds the result'''
+    def __init__(self):
+        FastaScanner.__init__(self)
+        self.index_records = []
+
+    def record(self, seqid, length):
+        if not isinstance(seqid, str):
+            seqid = seqid.decode()
+        self.index_records.append((seqid, length, self.seq_offset,
+                                   self.line_bases or length,
+                                   self.line_width or length + 1))
+
+    def index(self):
+        return SequenceIndex(self.index_records)
+
+
+def index_path(index_dir, fasta):
+    '''sidecar .fai path for fasta keyed on its current fingerprint'''
+    fprint = fingerprint(fasta)
+    key = '{:x}-{:x}-{:x}'.format(fprint[1], fprint[2], fprint[3])
+    return os.path.join(index_dir, '{}.{}.fai'.format(
+                                                   os.path.basename(fasta),
+                                                   key))
+
+
+def load_index(index_dir, fasta):
+    '''return the SequenceIndex for fasta if one matches its fingerprint'''
+    fai = index_path(index_dir, fasta)
+    if not os.path.isfile(fai):
+        return None
+    return SequenceIndex.from_fai(fai)
+
+
+def save_index(index_dir, fasta, index):
+    '''write index for fasta and drop sidecars of older versions of it'''
+    os.makedirs(index_dir, exist_ok=True)  # parallel workers may race
+    fai = index_path(index_dir, fasta)
+    index.write_fai(fai)
+    stale = glob(os.path.join(index_dir, '{}.*.fai'.format(
+                                                  os.path.basename(fasta))))
+    for s in stale:
+        if s != fai:
+            try:
+                os.remove(s)
+            except OSError:  # another worker got to it first
+                pass
+    return fai
+
+
+if __name__ == '__main__':
+    print('import me to use SequenceIndex')
+    sys.exit(1)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+from .file_helpers import fingerprint
+
+DEFAULT_SNAPSHOT = './detect_incongruencies_index/snapshot.json'
+
+
+def collection_state(collections, settings=None):
+    '''fingerprints of every file in collections, scan_collection records
+
+       {'files': {collection path: {name: fingerprint}}, 'settings': ...}
+       in a form that compares equal after a JSON round trip.  A file
+       removed since the collection was listed has no fingerprint.
+    '''
+    files = {}
+    for collection in collections:
+        path = collection['path']
+        prints = {}
+        for name in collection['files']:
+            try:
+                prints[name] = list(fingerprint(os.path.join(path, name)))
+            except OSError:
+                prints[name] = None
+        files[path] = prints
+    return {'files': files, 'settings': settings or {}}
+
+
+class Snapshot:
+    '''Per collection file state and check outcome from earlier runs
+
+       JSON file of {key: {'state': collection_state, 'result': result,
+       'messages': [[level, message], ...]}}.  A collection whose state
+       has not changed since its result was recorded does not need to be
+       checked again, its result and warnings can be replayed.
+    '''
+    def __init__(self, path=DEFAULT_SNAPSHOT):
+        self.path = path
+        self.entries = {}
+        if os.path.isfile(path):
+            try:
+                with open(path) as fopen:
+                    self.entries = json.load(fopen)
+            except ValueError:  # half written or corrupt, start over
+                self.entries = {}
+
+    def get(self, key, state):
+        '''recorded entry for key if state matches, otherwise None'''
+        entry = self.entries.get(key)
+        if entry is None or entry['state'] != state:
+            return None
+        return entry
+
+    def put(self, key, state, result, messages):
+        self.entries[key] = {'state': state, 'result': result,
+                             'messages': messages}
+
+    def forget(self, key):
+        self.entries.pop(key, None)
+
+    def save(self):
+        snapshot_dir = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(snapshot_dir, exist_ok=True)
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'w') as fopen:
+            json.dump(self.entries, fopen)
+        os.rename(tmp, self.path)
+
+
+if __name__ == '__main__':
+    print('import me to use Snapshot')
+    sys.exit(1)
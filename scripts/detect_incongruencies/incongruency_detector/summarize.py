@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+import os
+import re
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .file_helpers import fingerprint, return_filehandle
+from .datastore_index import parse_collection
+from .snapshot import Snapshot
+
+HEADER = '_h5ai.header.html'
+TITLE = '<p><b><big>Overview of data in this directory</big></b></p>'
+HEADER_BUFFER = 64 * 1024  # bytes read per step, headers are a few lines
+MAX_HEADER_LINES = 1000  # gwas metadata missing a key stops here
+GWAS_KEYS = ('Identifier', 'Name', 'Synopsis')
+MRK_COMMENT = re.compile(r'^# r*(\w+): (.*)')  # summarize_mrk.sh's match
+DEFAULT_STATE = './detect_incongruencies_index/h5ai_headers.json'
+
+
+def header_lines(path):
+    '''lines of path, inflated only as far as the caller reads them
+
+       a small read buffer so a header costs one read however large the
+       file is.  closing the generator closes the file
+    '''
+    fh = return_filehandle(path, buffer_size=HEADER_BUFFER)
+    with fh as fopen:
+        for line in fopen:
+            yield line.rstrip('\r\n')
+
+
+def gwas_fields(path):
+    '''{key: value} of the Identifier, Name and Synopsis lines of a
+       gwas.tsv, read until all three are found
+    '''
+    fields = {}
+    for number, line in enumerate(header_lines(path)):
+        columns = line.split('\t')
+        for key in GWAS_KEYS:
+            if columns[0].startswith(key) and len(columns) > 1:
+                fields.setdefault(key, columns[1])
+        if len(fields) == len(GWAS_KEYS) or number >= MAX_HEADER_LINES:
+            break
+    return fields
+
+
+def mrk_synopsis(path):
+    '''Synopsis from the # comments before the first marker, or None'''
+    synopsis = None
+    for line in header_lines(path):
+        if line and not line.startswith('#'):  # comments are over
+            break
+        match = MRK_COMMENT.match(line)
+        if match and 'Synopsis' in match.group(1):
+            synopsis = match.group(2)
+    return synopsis
+
+
+def readme_subject(path):
+    '''subject: of a README.*.yml, or None'''
+    for line in header_lines(path):
+        if line.startswith('subject:'):
+            return line[len('subject:'):].strip()
+    return None
+
+
+def gwas_line(path, fields):
+    return '<b>{}</b>: {}; {}<br>'.format(fields.get('Identifier', ''),
+                                          fields.get('Name', ''),
+                                          fields.get('Synopsis', ''))
+
+
+def mrk_line(path, synopsis):
+    platform = os.path.basename(path)[:-len('.gff3.gz')].split('.')[-1]
+    return '<b>{}</b>: {} <br>'.format(platform, synopsis or
+                                      '[description to be added]')
+
+
+def readme_line(path, subject):
+    collection = os.path.basename(os.path.dirname(path))
+    return '  <b>{}:</b> {}<br>'.format(collection, subject)
+
+
+def gwas_inputs(directory):
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if f.endswith('gwas.tsv.gz'))
+
+
+def mrk_inputs(directory):
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if 'mrk' in f and f.endswith('.gff3.gz'))
+
+
+def readme_inputs(directory):
+    '''README*.yml anywhere under directory, not in hidden directories'''
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        found.extend(os.path.join(root, f) for f in files
+                     if f.startswith('README') and f.endswith('.yml'))
+    return sorted(found)
+
+
+SUMMARIES = {  # kind: (inputs, reader, html line), see summary_kind
+    'gwas': (gwas_inputs, gwas_fields, gwas_line),
+    'mrk': (mrk_inputs, mrk_synopsis, mrk_line),
+    'readme': (readme_inputs, readme_subject, readme_line),
+}
+
+
+def summary_kind(directory):
+    '''gwas or mrk for those collections, readme for anything else'''
+    collection = parse_collection(os.path.basename(directory))
+    if collection and collection['type'] in ('gwas', 'mrk'):
+        return collection['type']
+    return 'readme'
+
+
+class HeaderSummarizer:
+    '''Write _h5ai.header.html for data store directories
+
+       replaces summarize_gwas.sh, summarize_mrk.sh and
+       metadata_summarize.sh.  gwas and mrk collections get a line per
+       gwas.tsv.gz or mrk gff3.gz, other directories (organism
+       directories) a line per README*.yml subject under them.
+
+       every file is inflated only until its header is read, the files
+       of all directories are read at once on threads.  With a state
+       file, a directory whose inputs and header have the same
+       fingerprints as when the header was written is skipped.
+
+       given catalog, a catalog.Catalog, the README subjects of the
+       collections it holds are queried from it and no README is read.
+    '''
+    def __init__(self, threads=8, state=DEFAULT_STATE, logger=None,
+                 force=False, catalog=None):
+        self.logger = logger or logging.getLogger('detect_incongruencies')
+        self.threads = max(1, threads)
+        self.snapshot = Snapshot(state) if state else None
+        self.force = force
+        self.catalog = catalog
+
+    def state(self, inputs, header):
+        prints = {}
+        for path in inputs + [header]:
+            try:
+                prints[path] = list(fingerprint(path))
+            except OSError:
+                prints[path] = None
+        return prints
+
+    def catalog_subjects(self, directory):
+        '''{README path: subject} of the collections in directory, from
+           the catalog
+        '''
+        catalog = self.catalog
+        organism = os.path.basename(directory)
+        readmes = dict((c['path'], c['readme'])
+                       for c in catalog.collections(organism)
+                       if c['readme'] and
+                       os.path.dirname(c['path']) == directory)
+        return dict((readmes[path], subject) for path, subject in
+                    catalog.field('subject', organism).items()
+                    if path in readmes and subject)
+
+    def summarize(self, directories):
+        '''write the header of each directory, returns those written'''
+        logger = self.logger
+        snapshot = self.snapshot
+        todo = []
+        for directory in directories:
+            directory = os.path.abspath(directory)
+            kind = summary_kind(directory)
+            subjects = None  # read from the files
+            if kind == 'readme' and self.catalog is not None:
+                subjects = self.catalog_subjects(directory)
+                inputs = sorted(subjects)
+            else:
+                inputs = SUMMARIES[kind][0](directory)
+            header = os.path.join(directory, HEADER)
+            state = self.state(inputs, header)
+            if (snapshot is not None and not self.force and
+                    snapshot.get(header, state) is not None):
+                logger.info('{} unchanged, skipping'.format(directory))
+                continue
+            todo.append((directory, kind, inputs, subjects, header))
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            futures = [[pool.submit(SUMMARIES[kind][1], path)
+                        for path in inputs if subjects is None]
+                       for directory, kind, inputs, subjects, header in todo]
+            written = []
+            for (directory, kind, inputs, subjects, header), results in zip(
+                                                               todo, futures):
+                make_line = SUMMARIES[kind][2]
+                if subjects is None:
+                    values = [future.result() for future in results]
+                else:  # queried from the catalog
+                    values = [subjects[path] for path in inputs]
+                lines = []
+                for path, value in zip(inputs, values):
+                    if kind == 'readme' and not value:
+                        continue  # grep found no subject
+                    lines.append(make_line(path, value))
+                self.write(header, lines)
+                logger.info('Wrote {}'.format(header))
+                if snapshot is not None:
+                    snapshot.put(header, self.state(inputs, header), kind,
+                                 [])
+                written.append(header)
+        if snapshot is not None:
+            snapshot.save()
+        return written
+
+    def write(self, header, lines):
+        tmp = '{}.{}.tmp'.format(header, os.getpid())
+        with open(tmp, 'w') as fopen:
+            fopen.write(TITLE + '\n')
+            for line in lines:
+                fopen.write(line + '\n')
+            fopen.write('<hr>\n')
+        os.rename(tmp, header)
+
+
+if __name__ == '__main__':
+    print('import me to use HeaderSummarizer')
+    sys.exit(1)
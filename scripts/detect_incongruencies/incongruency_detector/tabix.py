@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import struct
+from .bgzf import BGZFWriter, BGZFReader
+from .pipeline import StreamPipeline
+
+MIN_SHIFT = 14  # 16 KiB windows, as tabix
+TBI_DEPTH = 5  # bin levels in a .tbi, positions up to 2**29
+GFF_CONF = (0, 1, 4, 5, ord('#'), 0)  # tabix -p gff: format, seq, beg, end
+                                      # columns, meta char, lines to skip
+INT = struct.Struct('<i')
+CHUNK = struct.Struct('<QQ')
+
+
+def reg2bin(beg, end, depth=TBI_DEPTH, min_shift=MIN_SHIFT):
+    '''smallest bin holding beg to end, 0 based and end exclusive'''
+    end -= 1
+    shift = min_shift
+    first = ((1 << depth * 3) - 1) // 7
+    for level in range(depth, 0, -1):
+        if beg >> shift == end >> shift:
+            return first + (beg >> shift)
+        shift += 3
+        first -= 1 << (level - 1) * 3
+    return 0
+
+
+def reg2bins(beg, end, depth=TBI_DEPTH, min_shift=MIN_SHIFT):
+    '''every bin that can hold a record overlapping beg to end'''
+    bins = []
+    shift = min_shift + depth * 3
+    end = min(end, 1 << shift) - 1
+    first = 0
+    for level in range(depth + 1):
+        bins.extend(range(first + (beg >> shift), first + (end >> shift) + 1))
+        first += 1 << level * 3
+        shift -= 3
+    return bins
+
+
+def bin_first_window(bin_number, depth):
+    '''first MIN_SHIFT window covered by bin_number'''
+    level = 0
+    first = 0
+    while bin_number >= first + (1 << level * 3):
+        first += 1 << level * 3
+        level += 1
+    return (bin_number - first) << (depth - level) * 3
+
+
+class TabixIndex:
+    '''Build a tabix index of a BGZF gff3 while it is written
+
+       add() takes each feature with the uncompressed offsets
+       BGZFWriter.tell() gave before and after it was written.  Records
+       must come sorted by start and with each seqid together, sorted
+       is False otherwise and no index should be written.  write() turns
+       offsets into virtual offsets once the BGZF file is closed.  Ends
+       past 2**29 do not fit a .tbi, those get a .csi with more levels.
+    '''
+    def __init__(self, max_end=0):
+        self.depth = TBI_DEPTH
+        while max_end > 1 << MIN_SHIFT + self.depth * 3:
+            self.depth += 1
+        self.suffix = '.tbi' if self.depth == TBI_DEPTH else '.csi'
+        self.names = []
+        self.bins = []  # per seqid {bin: [[start offset, end offset]]}
+        self.linear = []  # per seqid {window: first record offset}
+        self.seqid = None
+        self.last_beg = 0
+        self.sorted = True
+
+    def add(self, seqid, beg, end, start_offset, end_offset):
+        '''index one record, beg 0 based and end exclusive'''
+        if seqid != self.seqid:
+            if seqid in self.names:  # seen before, not together
+                self.sorted = False
+            self.names.append(seqid)
+            self.bins.append({})
+            self.linear.append({})
+            self.seqid = seqid
+            self.last_beg = 0
+        if beg < self.last_beg:
+            self.sorted = False
+        self.last_beg = beg
+        end = max(end, beg + 1)
+        chunks = self.bins[-1].setdefault(reg2bin(beg, end, self.depth), [])
+        if chunks and chunks[-1][1] == start_offset:  # continues the chunk
+            chunks[-1][1] = end_offset
+        else:
+            chunks.append([start_offset, end_offset])
+        linear = self.linear[-1]
+        for window in range(beg >> MIN_SHIFT, ((end - 1) >> MIN_SHIFT) + 1):
+            if window not in linear:
+                linear[window] = start_offset
+
+    def filled_linear(self, i, virtual):
+        '''linear index of seqid i as virtual offsets, gaps filled with
+           the window before, which is never past a record in the gap
+        '''
+        linear = self.linear[i]
+        if not linear:
+            return []
+        offsets = []
+        last = virtual(min(linear.values()))
+        for window in range(max(linear) + 1):
+            if window in linear:
+                last = virtual(linear[window])
+            offsets.append(last)
+        return offsets
+
+    def header(self):
+        names = b''.join(n + b'\0' for n in self.names)
+        return (b''.join(INT.pack(v) for v in GFF_CONF) +
+                INT.pack(len(names)) + names)
+
+    def write(self, path, writer):
+        '''write the index of the closed BGZFWriter writer to path'''
+        virtual = writer.virtual_offset
+        out = BGZFWriter(path, threads=1, index=False)
+        if self.suffix == '.tbi':
+            out.write(b'TBI\1' + INT.pack(len(self.names)) + self.header())
+        else:
+            aux = self.header()
+            out.write(b'CSI\1' + INT.pack(MIN_SHIFT) + INT.pack(self.depth) +
+                      INT.pack(len(aux)) + aux + INT.pack(len(self.names)))
+        for i, bins in enumerate(self.bins):
+            linear = self.filled_linear(i, virtual)
+            out.write(INT.pack(len(bins)))
+            for bin_number in sorted(bins):
+                chunks = bins[bin_number]
+                out.write(struct.pack('<I', bin_number))
+                if self.suffix == '.csi':
+                    window = bin_first_window(bin_number, self.depth)
+                    loffset = linear[min(window, len(linear) - 1)]
+                    out.write(struct.pack('<Q', loffset))
+                out.write(INT.pack(len(chunks)))
+                for start, end in chunks:
+                    out.write(CHUNK.pack(virtual(start), virtual(end)))
+            if self.suffix == '.tbi':
+                out.write(INT.pack(len(linear)))
+                out.write(struct.pack('<{}Q'.format(len(linear)), *linear))
+        out.close()
+        return path
+
+
+class TabixReader:
+    '''Region queries on a BGZF gff3 with a .tbi or .csi index
+
+       reads the .tbi or .csi next to path, as tabix and htslib write
+       them, and seeks straight to the blocks that can hold a region
+    '''
+    def __init__(self, path):
+        self.path = path
+        for suffix in ('.tbi', '.csi'):
+            if os.path.exists(path + suffix):
+                self.load(path + suffix)
+                break
+        else:
+            raise IOError('no .tbi or .csi index for {}'.format(path))
+        self.reader = BGZFReader(path)
+
+    def load(self, index):
+        data = b''.join(StreamPipeline(index).chunks())
+        self.csi = data[:4] == b'CSI\1'
+        if self.csi:
+            min_shift, depth, l_aux = struct.unpack_from('<3i', data, 4)
+            aux = 16
+            conf = struct.unpack_from('<7i', data, aux)
+            names = data[aux + 28:aux + 28 + conf[6]]
+            pos = aux + l_aux
+            n_ref = INT.unpack_from(data, pos)[0]
+            pos += 4
+        elif data[:4] == b'TBI\1':
+            min_shift, depth = MIN_SHIFT, TBI_DEPTH
+            n_ref = INT.unpack_from(data, 4)[0]
+            conf = struct.unpack_from('<7i', data, 8)
+            names = data[36:36 + conf[6]]
+            pos = 36 + conf[6]
+        else:
+            raise IOError('{} is not a .tbi or .csi index'.format(index))
+        self.min_shift = min_shift
+        self.depth = depth
+        self.columns = conf[1:4]
+        self.names = dict((n, i) for i, n in
+                          enumerate(names.split(b'\0')[:n_ref]))
+        self.refs = []
+        for i in range(n_ref):
+            bins = {}
+            n_bin = INT.unpack_from(data, pos)[0]
+            pos += 4
+            for j in range(n_bin):
+                bin_number = struct.unpack_from('<I', data, pos)[0]
+                pos += 4
+                loffset = 0
+                if self.csi:
+                    loffset = struct.unpack_from('<Q', data, pos)[0]
+                    pos += 8
+                n_chunk = INT.unpack_from(data, pos)[0]
+                pos += 4
+                chunks = [CHUNK.unpack_from(data, pos + k * 16)
+                          for k in range(n_chunk)]
+                pos += n_chunk * 16
+                bins[bin_number] = (loffset, chunks)
+            linear = ()
+            if not self.csi:
+                n_intv = INT.unpack_from(data, pos)[0]
+                linear = struct.unpack_from('<{}Q'.format(n_intv), data,
+                                            pos + 4)
+                pos += 4 + n_intv * 8
+            self.refs.append((bins, linear))
+
+    def min_offset(self, ref, beg):
+        '''no record overlapping beg starts before this virtual offset'''
+        bins, linear = self.refs[ref]
+        if not self.csi:
+            if not linear:
+                return 0
+            return linear[min(beg >> self.min_shift, len(linear) - 1)]
+        bin_number = reg2bin(beg, beg + 1, self.depth, self.min_shift)
+        while bin_number and bin_number not in bins:
+            bin_number = (bin_number - 1) >> 3  # parent bin
+        return bins[bin_number][0] if bin_number in bins else 0
+
+    def chunks(self, ref, beg, end):
+        '''merged (start, end) virtual offsets to read for beg to end'''
+        bins = self.refs[ref][0]
+        min_offset = self.min_offset(ref, beg)
+        chunks = []
+        for bin_number in reg2bins(beg, end, self.depth, self.min_shift):
+            if bin_number in bins:
+                chunks.extend(c for c in bins[bin_number][1]
+                              if c[1] > min_offset)
+        chunks.sort()
+        merged = []
+        for start, stop in chunks:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([max(start, min_offset), stop])
+        return merged
+
+    def query(self, seqid, start, end):
+        '''yield lines, bytes without newline, of features on seqid that
+           overlap start to end, 1 based and inclusive like gff3
+        '''
+        if isinstance(seqid, str):
+            seqid = seqid.encode()
+        ref = self.names.get(seqid)
+        if ref is None or end < start:
+            return
+        col_seq, col_beg, col_end = (c - 1 for c in self.columns)
+        last_col = max(col_seq, col_beg, col_end)
+        reader = self.reader
+        for chunk_start, chunk_end in self.chunks(ref, start - 1, end):
+            reader.seek(chunk_start)
+            while reader.tell() < chunk_end:
+                line = reader.readline()
+                if not line:
+                    break
+                line = line.rstrip(b'\r\n')
+                columns = line.split(b'\t', last_col + 1)
+                if columns[col_seq] != seqid:
+                    continue
+                feature_start = int(columns[col_beg])
+                if feature_start > end:  # sorted, the rest start later
+                    return
+                if int(columns[col_end]) >= start:
+                    yield line
+
+    def close(self):
+        self.reader.close()
+
+
+def query(path, seqid, start, end):
+    '''features of the indexed BGZF gff3 path overlapping a region'''
+    reader = TabixReader(path)
+    try:
+        return list(reader.query(seqid, start, end))
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    print('import me to use TabixIndex, TabixReader and query')
+    sys.exit(1)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import zlib
+from .pipeline import StreamPipeline
+from .inflate import GZIP_MAGIC, bgzf_block_size, inflate_block, sniff
+from .gff3_validator import GFF3Validator
+
+QUICK_HEAD = 4 * 1024 * 1024  # inflated bytes read from the start
+QUICK_SAMPLES = 16  # BGZF blocks or plain text windows read past the head
+HEAD_CHUNK = 1024 * 1024  # read size for the head, it is cut short
+WINDOW = 64 * 1024  # plain text bytes per sample, about one BGZF block
+MAX_BLOCK = 0x10000  # largest BGZF block
+BLOCK_MAGIC = GZIP_MAGIC + b'\x08\x04'  # deflate with FEXTRA, see is_bgzf
+QUICK_FLAGS = {'--quick': 0, '--background': 0, '--quick_mb': 1,
+               '--quick_samples': 1}  # flag: values it takes
+
+
+def head_lines(path, head=QUICK_HEAD):
+    '''(complete lines, whole file read, raw bytes read) from the first
+       head inflated bytes of path
+
+       the read stops once head bytes are inflated, whatever the size or
+       compression of the file
+    '''
+    pipeline = StreamPipeline(path, min(head, HEAD_CHUNK) or HEAD_CHUNK)
+    chunks = pipeline.chunks()
+    data = bytearray()
+    whole = True
+    try:
+        for chunk in chunks:
+            data += chunk
+            if len(data) >= head:
+                whole = False
+                break
+    finally:
+        chunks.close()
+    lines = bytes(data).split(b'\n')
+    if not whole or not lines[-1]:  # cut mid line, or the final newline
+        lines.pop()
+    return lines, whole, pipeline.bytes_read
+
+
+def window_lines(data):
+    '''complete lines of data read from the middle of a file'''
+    return data.split(b'\n')[1:-1]
+
+
+def find_block(fopen, offset):
+    '''(compressed offset, inflated data) of the first BGZF block at or
+       after offset, None past the last block.  Candidates are found by
+       their magic and kept only if they inflate and pass their crc
+    '''
+    while True:
+        fopen.seek(offset)
+        buf = fopen.read(2 * MAX_BLOCK)
+        pos = buf.find(BLOCK_MAGIC)
+        while pos >= 0:
+            size = bgzf_block_size(buf, pos)
+            if size == 0 or (size and pos + size > len(buf)):
+                break  # the block goes on past buf
+            if size:
+                try:
+                    return offset + pos, inflate_block(buf[pos:pos + size])
+                except (IOError, zlib.error):  # magic inside deflate data
+                    pass
+            pos = buf.find(BLOCK_MAGIC, pos + 1)
+        if pos > 0:  # read again from the block that did not fit
+            offset += pos
+        elif pos < 0 and len(buf) == 2 * MAX_BLOCK:
+            offset += len(buf) - len(BLOCK_MAGIC) + 1
+        else:  # end of the file, or a truncated last block
+            return None
+
+
+def sample_lines(path, samples=QUICK_SAMPLES, skip=0):
+    '''[(offset, lines)] of samples spread evenly over path after the
+       first skip bytes on disk
+
+       BGZF files give the complete lines of a block near each offset,
+       uncompressed files those of a WINDOW read there.  Other
+       compressed files can only be read from the start, they give none.
+    '''
+    size = os.path.getsize(path)
+    found = []
+    with open(path, 'rb') as fopen:
+        first = fopen.read(18)
+        bgzf = bool(bgzf_block_size(first))
+        if not bgzf and sniff(first):
+            return found
+        for i in range(samples):
+            offset = size * (i + 1) // (samples + 1)
+            if offset < skip:
+                continue
+            if bgzf:
+                block = find_block(fopen, offset)
+                if block is None:
+                    continue
+                offset, data = block
+            else:
+                fopen.seek(offset)
+                data = fopen.read(WINDOW)
+            lines = window_lines(data)
+            if lines and (not found or found[-1][0] != offset):
+                found.append((offset, lines))
+    return found
+
+
+class SampleValidator(GFF3Validator):
+    '''GFF3Validator for lines read out of the middle of a gff3
+
+       a sample starts and ends inside gene trees, so Parents it did not
+       see are dropped instead of reported
+    '''
+    def flush(self):
+        self.pending = []
+        self.tree = {}
+
+
+def background_command(argv, log_file):
+    '''the command line of argv, a detect_incongruencies run, without the
+       quick mode flags and logging to log_file
+    '''
+    command = []
+    skip = 0
+    for arg in argv[1:]:
+        if skip:
+            skip -= 1
+            continue
+        flag = arg.split('=', 1)[0]
+        if flag in QUICK_FLAGS:
+            skip = QUICK_FLAGS[flag] if '=' not in arg else 0
+            continue
+        command.append(arg)
+    return ([sys.executable, os.path.abspath(argv[0])] + command +
+            ['--log_file', log_file])
+
+
+if __name__ == '__main__':
+    print('import me to use head_lines and sample_lines')
+    sys.exit(1)
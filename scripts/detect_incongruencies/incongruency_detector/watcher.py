@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE)
+EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+READ_SIZE = 64 * 1024
+
+
+class InotifyWatcher:
+    '''Directories changed under root, from Linux inotify through libc
+
+       every directory under root is watched, directories created later
+       are added as they appear.  changes() returns the set of
+       directories with files written, moved, created or deleted.
+    '''
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        libc_name = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                                ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.paths = {}  # watch descriptor: directory
+        self.add_tree(self.root)
+
+    def add_tree(self, top):
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            self.add_watch(root)
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e in (errno.ENOENT, errno.ENOTDIR):  # gone already
+                return
+            raise OSError(e, '{}: {}'.format(os.strerror(e), path))
+        self.paths[wd] = path
+
+    def changes(self, timeout=None):
+        '''block up to timeout seconds, None forever, for changes'''
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, READ_SIZE)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, size = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + size].rstrip(b'\0')
+            offset += size
+            if mask & IN_Q_OVERFLOW:  # events lost, everything is suspect
+                changed.add(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+            path = self.paths.get(wd)
+            if path is None:
+                continue
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                new_dir = os.path.join(path, os.fsdecode(name))
+                self.add_tree(new_dir)  # files may have landed already
+                changed.add(new_dir)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    '''Directories changed under root found by listing it every interval
+
+       used where inotify is not available (not Linux, NFS mounts
+       without events).  same interface as InotifyWatcher.
+    '''
+    def __init__(self, root, interval=60):
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        self.state = self.scan()
+
+    def scan(self):
+        '''{directory: {name: (size, mtime_ns)}} for everything under root'''
+        state = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            listing = {}
+            for f in files:
+                try:
+                    stat = os.stat(os.path.join(root, f))
+                except OSError:
+                    continue
+                listing[f] = (stat.st_size, stat.st_mtime_ns)
+            state[root] = listing
+        return state
+
+    def changes(self, timeout=None):
+        wait = self.interval if timeout is None else min(timeout,
+                                                         self.interval)
+        time.sleep(wait)
+        state = self.scan()
+        old = self.state
+        self.state = state
+        return set(d for d in set(state).union(old)
+                   if state.get(d) != old.get(d))
+
+    def close(self):
+        pass
+
+
+def make_watcher(root, interval=60):
+    '''InotifyWatcher for root, PollingWatcher where inotify is missing'''
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError):  # no libc inotify_init1, no watches
+        return PollingWatcher(root, interval)
+
+
+if __name__ == '__main__':
+    print('import me to use make_watcher')
+    sys.exit(1)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import logging
+import argparse
+from incongruency_detector.catalog import DEFAULT_CATALOG, Catalog
+from incongruency_detector.summarize import DEFAULT_STATE, HeaderSummarizer
+
+parser = argparse.ArgumentParser(description='''
+    Write _h5ai.header.html for data store directories.
+
+    Replaces summarize_gwas.sh, summarize_mrk.sh and metadata_summarize.sh.
+    gwas and mrk collections get a line for each gwas.tsv.gz or mrk
+    gff3.gz from its Identifier, Name and Synopsis header lines, any other
+    directory a line for each README*.yml subject under it.  Files are
+    only inflated as far as their header, directories whose files have
+    not changed since their header was written are skipped.
+''', formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('directories', metavar = '</path/to/datastore/folder>',
+nargs='+', help='''Organism, gwas or mrk collection directories''')
+
+parser.add_argument('--threads', metavar = '<INT>', type=int, default=8,
+help='''Files read at once (default:8)''')
+
+parser.add_argument('--state', metavar = '<FILE>', default=DEFAULT_STATE,
+help='''Fingerprints of the files each header was written from, empty
+string to always write (default:{})'''.format(DEFAULT_STATE))
+
+parser.add_argument('--catalog', metavar = '<FILE>',
+help='''Catalog kept by detect_incongruencies --catalog.  README subjects of
+the collections in it are queried from it instead of read from every
+README.  Not used unless given.  (e.g.:{})'''.format(DEFAULT_CATALOG))
+
+parser.add_argument('--force', action='store_true',
+help='''Write every header even if its files have not changed''')
+
+parser._optionals.title = "Program Options"
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print('USAGE: {} /path/to/datastore/folder'.format(sys.argv[0]))
+            sys.exit(1)
+    catalog = None
+    if args.catalog:
+        if not os.path.isfile(args.catalog):
+            print('No catalog {}, make one with detect_incongruencies '
+                  '--catalog'.format(args.catalog))
+            sys.exit(1)
+        catalog = Catalog(args.catalog)
+    summarizer = HeaderSummarizer(args.threads, args.state, force=args.force,
+                                  catalog=catalog)
+    summarizer.summarize(args.directories)
+    if catalog:
+        catalog.close()
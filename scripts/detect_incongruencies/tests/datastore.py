@@ -0,0 +1,94 @@
+'''Build small data store collections for tests'''
+import os
+import gzip
+import random
+import hashlib
+
+README = {'provenance': 'test data', 'source': 'http://example.org',
+          'subject': 'test collection', 'related_to': 'none',
+          'scientific_name': 'Glycine max', 'taxid': 3847,
+          'scientific_name_abbrev': 'glyma', 'description': 'test',
+          'dataset_doi': 'none', 'genbank_accession': 'none',
+          'publication_doi': 'none', 'dataset_release_date': '2020-01-01',
+          'contributors': 'A', 'data_curators': 'B',
+          'public_access_level': 'public', 'license': 'open',
+          'keywords': 'test'}
+
+
+def write_readme(path, key, **fields):
+    '''README.<key>.yml with every required field, fields override them,
+       a None value leaves the field out
+    '''
+    readme = dict(README, identifier=key)
+    readme.update(fields)
+    with open(os.path.join(path, 'README.{}.yml'.format(key)), 'w') as fopen:
+        for field, value in readme.items():
+            if value is not None:
+                fopen.write('{}: {}\n'.format(field, value))
+
+
+def write_checksum(path, key, bad=()):
+    '''CHECKSUM.<key>.md5 of the files in path, wrong for names in bad'''
+    lines = []
+    for name in sorted(os.listdir(path)):
+        if name.startswith('CHECKSUM.'):
+            continue
+        with open(os.path.join(path, name), 'rb') as fopen:
+            md5 = hashlib.md5(fopen.read()).hexdigest()
+        if name in bad:
+            md5 = 'deadbeef' * 4
+        lines.append('{}  ./{}'.format(md5, name))
+    with open(os.path.join(path, 'CHECKSUM.{}.md5'.format(key)), 'w') as fopen:
+        fopen.write('\n'.join(lines) + '\n')
+
+
+def genome_collection(organism, genotype, key, seqids=('Gm01', 'Gm02'),
+                      bad_checksum=False, seed=1):
+    '''<genotype>.gnm1.<key> with a genome_main of seqids, prefixed as
+       given; returns the collection path
+    '''
+    rng = random.Random(seed)
+    name = '{}.gnm1.{}'.format(genotype, key)
+    path = os.path.join(organism, name)
+    os.makedirs(path)
+    main = 'glyma.{}.genome_main.fna.gz'.format(name)
+    with gzip.open(os.path.join(path, main), 'wt') as fopen:
+        for seqid in seqids:
+            fopen.write('>{}\n'.format(seqid))
+            seq = ''.join(rng.choice('ACGT') for _ in range(3000))
+            for i in range(0, len(seq), 60):
+                fopen.write(seq[i:i + 60] + '\n')
+    write_readme(path, name)
+    write_checksum(path, name, [main] if bad_checksum else ())
+    return path
+
+
+def annotation_collection(organism, genotype, key, seqid):
+    '''<genotype>.gnm1.ann1.<key> with one gene on seqid and its
+       companion FASTAs; returns the collection path
+    '''
+    name = '{}.gnm1.ann1.{}'.format(genotype, key)
+    path = os.path.join(organism, name)
+    os.makedirs(path)
+    prefix = 'glyma.{}.'.format(name)
+    gene = prefix + 'Glyma.01G000100'
+    mrna = gene + '.1'
+    lines = ['##gff-version 3',
+             '\t'.join([seqid, 'src', 'gene', '100', '900', '.', '+', '.',
+                        'ID={};Name=glyma.G1'.format(gene)]),
+             '\t'.join([seqid, 'src', 'mRNA', '100', '900', '.', '+', '.',
+                        'ID={};Name=glyma.M1;Parent={}'.format(mrna, gene)]),
+             '\t'.join([seqid, 'src', 'CDS', '100', '900', '.', '+', '0',
+                        'ID={}.CDS1;Parent={}'.format(mrna, mrna)]),
+             '###']
+    with gzip.open(os.path.join(path, prefix + 'gene_models_main.gff3.gz'),
+                   'wt') as fopen:
+        fopen.write('\n'.join(lines) + '\n')
+    for kind, ext in (('protein', 'faa'), ('cds', 'fna'), ('mrna', 'fna')):
+        with gzip.open(os.path.join(path, '{}{}.{}.gz'.format(prefix, kind,
+                                                              ext)),
+                       'wt') as fopen:
+            fopen.write('>{}\nMKV\n'.format(mrna))
+    write_readme(path, name)
+    write_checksum(path, name)
+    return path
@@ -0,0 +1,111 @@
+import gzip
+import zlib
+import random
+import struct
+import logging
+import pytest
+from incongruency_detector.Normalizer import GenomeMainWriter
+from incongruency_detector.pipeline import StreamPipeline
+from incongruency_detector.sequence_index import SequenceIndex
+from incongruency_detector.bgzf import BLOCK_DATA, EOF_BLOCK
+
+PREFIX = 'glyma.Wm82.gnm2'
+
+
+def make_genome(path, records=12, seed=2):
+    '''gzip genome_main, every other header without PREFIX; returns
+       {normalized seqid: sequence}
+    '''
+    rng = random.Random(seed)
+    sequences = {}
+    with gzip.open(path, 'wt', compresslevel=1) as fopen:
+        for i in range(records):
+            length = rng.randint(1, 300000)
+            seq = ''.join(rng.choice('ACGTN') for _ in range(length))
+            name = 'Gm{:02d}'.format(i)
+            fopen.write('>{} desc\n'.format(name if i % 2 else
+                                            '{}.{}'.format(PREFIX, name)))
+            for j in range(0, length, 60):
+                fopen.write(seq[j:j + 60] + '\n')
+            sequences['{}.{}'.format(PREFIX, name)] = seq
+    return sequences
+
+
+def blocks(raw):
+    '''[(compressed, uncompressed offset)] of the BGZF blocks in raw'''
+    found = []
+    pos = 0
+    inflated = 0
+    while pos < len(raw):
+        assert raw[pos:pos + 4] == b'\x1f\x8b\x08\x04'
+        assert raw[pos + 12:pos + 14] == b'BC'
+        size = struct.unpack('<H', raw[pos + 16:pos + 18])[0] + 1
+        isize = struct.unpack('<I', raw[pos + size - 4:pos + size])[0]
+        assert isize <= BLOCK_DATA
+        found.append((pos, inflated))
+        inflated += isize
+        pos += size
+    return found
+
+
+@pytest.fixture(scope='module', params=[1, 4])
+def written(request, tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('bgzf')
+    source = str(tmp_path / 'glyma.Wm82.gnm2.DTC4.genome_main.fna.gz')
+    sequences = make_genome(source)
+    out = str(tmp_path / 'out.fna.gz')
+    pipeline = StreamPipeline(source)
+    pipeline.add_consumer(GenomeMainWriter(PREFIX, out,
+                                           logging.getLogger('test'), 6,
+                                           request.param))
+    pipeline.run()
+    with open(out, 'rb') as fopen:
+        raw = fopen.read()
+    return out, raw, sequences
+
+
+def test_layout_and_gzi(written):
+    out, raw, sequences = written
+    assert raw.endswith(EOF_BLOCK)
+    data = gzip.decompress(raw)
+    found = blocks(raw)
+    assert found[-1] == (len(raw) - len(EOF_BLOCK), len(data))
+    with open(out + '.gzi', 'rb') as fopen:
+        gzi = fopen.read()
+    count = struct.unpack('<Q', gzi[:8])[0]
+    entries = [struct.unpack('<QQ', gzi[8 + 16 * i:24 + 16 * i])
+               for i in range(count)]
+    assert entries == found[1:-1]  # not the first block nor the EOF block
+    headers = [l for l in data.split(b'\n') if l.startswith(b'>')]
+    assert headers == [b'>' + name.encode() + b' desc'
+                       for name in sequences]
+
+
+def test_fai_random_access(written):
+    out, raw, sequences = written
+    found = blocks(raw)
+    index = SequenceIndex.from_fai(out + '.fai')
+    assert sorted(index.names) == sorted(sequences)
+
+    def fetch(offset, size):
+        '''size bytes at uncompressed offset, inflating only its blocks'''
+        first = max(i for i, b in enumerate(found) if b[1] <= offset)
+        data = b''
+        i = first
+        while len(data) < offset - found[first][1] + size and i + 1 < len(
+                                                                     found):
+            data += zlib.decompress(raw[found[i][0]:found[i + 1][0]], 31)
+            i += 1
+        return data[offset - found[first][1]:][:size]
+
+    rng = random.Random(7)
+    for name, seq in sequences.items():
+        i = index.position(name)
+        assert index.lengths[i] == len(seq)
+        start = rng.randrange(len(seq))
+        length = min(200, len(seq) - start)
+        line_bases = index.line_bases[i]
+        offset = (index.offsets[i] + (start // line_bases) *
+                  index.line_widths[i] + start % line_bases)
+        bases = fetch(offset, length * 2).replace(b'\n', b'')[:length]
+        assert bases.decode() == seq[start:start + length]
@@ -0,0 +1,166 @@
+import re
+import gzip
+import random
+import struct
+import logging
+import pytest
+from incongruency_detector.bgzf import BGZFWriter, BLOCK_DATA, iter_blocks
+from incongruency_detector.Normalizer import Normalizer
+from incongruency_detector.pipeline import StreamPipeline
+from incongruency_detector.sequence_index import SequenceIndex
+
+PREFIX = 'glyma.Wm82.gnm2'
+GENOME = '{}.DTC4.genome_main.fna.gz'.format(PREFIX)
+
+
+def record(name, length, eol=b'\n', rng=random.Random(3)):
+    '''one FASTA record with 60 base lines'''
+    seq = bytes(rng.choice(b'ACGT') for _ in range(length))
+    return b'>' + name + b' desc' + eol + b''.join(
+           seq[i:i + 60] + eol for i in range(0, length, 60))
+
+
+def spanning(eol=b'\n'):
+    '''records with the header of Gm02 across the first block boundary'''
+    first = record(b'Gm01', 600, eol)
+    filler = BLOCK_DATA - len(first) - 8  # Gm02's header starts 8 short
+    lines, rest = divmod(filler - len(b'>Gm99 desc') - len(eol),
+                         60 + len(eol))
+    filler = record(b'Gm99', lines * 60 + rest - len(eol), eol)
+    data = first + filler + record(b'Gm02', 5000, eol)
+    assert data.index(b'>Gm02') == BLOCK_DATA - 8
+    return data
+
+
+GENOMES = {
+    'spanning': spanning(),
+    'crlf': spanning(b'\r\n'),
+    'no final newline': record(b'Gm01', 70000) + record(b'Gm02', 130)[:-1],
+    'header at end': record(b'Gm01', 70000) + b'>Gm02',
+    'prefixed': (record(PREFIX.encode() + b'.Gm01', 70000) +
+                 record(b'Gm02', 100) +
+                 record(PREFIX.encode() + b'.Gm03', 100)),
+    'none to edit': record(PREFIX.encode() + b'.Gm01', 100000),
+}
+
+
+@pytest.fixture(params=sorted(GENOMES))
+def outputs(request, tmp_path, monkeypatch):
+    '''(data, GenomeMainWriter output, spliced output) for each genome'''
+    monkeypatch.chdir(tmp_path)
+    data = GENOMES[request.param]
+    writer = BGZFWriter(GENOME, 1, 1, index=False)
+    writer.write(data)
+    writer.close()
+    normalizer = Normalizer(logger=logging.getLogger('test'),
+                            compress_threads=2)
+    pipeline = StreamPipeline(GENOME)
+    pipeline.add_consumer(normalizer.genome_main_consumer(GENOME))
+    pipeline.run()
+    full = str(tmp_path / 'full.fna.gz')
+    for ext in ('', '.fai', '.gzi'):
+        (tmp_path / (GENOME + '.normalized' + ext)).rename(full + ext)
+    spliced = str(tmp_path / normalizer.splice_genome_main(GENOME))
+    return data, full, spliced
+
+
+def read(path):
+    with open(path, 'rb') as fopen:
+        return fopen.read()
+
+
+def gzi_entries(path):
+    '''(compressed, uncompressed) offsets listed in path.gzi'''
+    gzi = read(path + '.gzi')
+    count = struct.unpack_from('<Q', gzi)[0]
+    assert len(gzi) == 8 + 16 * count
+    return [struct.unpack_from('<QQ', gzi, 8 + 16 * i) for i in range(count)]
+
+
+def test_same_as_full_rewrite(outputs):
+    data, full, spliced = outputs
+    assert gzip.decompress(read(spliced)) == gzip.decompress(read(full))
+    assert read(spliced + '.fai') == read(full + '.fai')
+
+
+def test_only_headers_change(outputs):
+    data, full, spliced = outputs
+    headers = [l.rstrip(b'\r') for l in data.split(b'\n')
+               if l.startswith(b'>')]
+    expected = [h if h.startswith(b'>' + PREFIX.encode()) else
+                b'>' + PREFIX.encode() + b'.' + h[1:] for h in headers]
+    lines = gzip.decompress(read(spliced)).split(b'\n')
+    assert [l.rstrip(b'\r') for l in lines if l.startswith(b'>')] == expected
+    assert b''.join(l for l in lines if not l.startswith(b'>')) == b''.join(
+           l for l in data.split(b'\n') if not l.startswith(b'>'))
+
+
+def test_unedited_blocks_copied(outputs):
+    data, full, spliced = outputs
+    edited = set()
+    for match in re.finditer(b'^>Gm.*\n?', data, re.M):
+        edited.update(range(match.start() // BLOCK_DATA,
+                            (match.end() - 1) // BLOCK_DATA + 1))
+    source = [block for block, size in iter_blocks(GENOME) if size]
+    out = set(block for block, size in iter_blocks(spliced))
+    assert edited or len(source) > 1
+    assert [i for i, block in enumerate(source) if block not in out] == sorted(
+                                                                       edited)
+
+
+def test_gzi_matches_blocks(outputs):
+    data, full, spliced = outputs
+    found = []
+    compressed = inflated = 0
+    for block, size in iter_blocks(spliced):
+        found.append((compressed, inflated))
+        compressed += len(block)
+        inflated += size
+    assert gzi_entries(spliced) == found[1:-1]  # not the first nor EOF
+
+
+def reindex(data):
+    '''.fai records of FASTA data as samtools faidx counts them, a CR is
+       not a base but is part of the line width
+    '''
+    records = []
+    offset = 0
+    for chunk in data.split(b'\n>'):
+        if not records and chunk.startswith(b'>'):
+            chunk = chunk[1:]
+            offset += 1
+        header, newline, seq = chunk.partition(b'\n')
+        offset += len(header) + len(newline)
+        lines = seq.split(b'\n')
+        bases = len(lines[0].rstrip(b'\r'))
+        records.append((header.split()[0].decode(),
+                        sum(len(l.rstrip(b'\r')) for l in lines), offset,
+                        bases, bases and len(lines[0]) + 1))
+        offset += len(seq) + 2  # its newline and the next >
+    return records
+
+
+def test_fai_matches_reindex(outputs):
+    data, full, spliced = outputs
+    fai = SequenceIndex.from_fai(spliced + '.fai')
+    assert list(zip(fai.names, fai.lengths, fai.offsets, fai.line_bases,
+                    fai.line_widths)) == reindex(gzip.decompress(
+                                                             read(spliced)))
+
+
+def test_pysam_reads_spliced(outputs):
+    pysam = pytest.importorskip('pysam')
+    data, full, spliced = outputs
+    sequences = {}
+    for chunk in data.replace(b'\r', b'').split(b'>')[1:]:
+        header, _, seq = chunk.partition(b'\n')
+        name = header.split()[0].decode()
+        if not name.startswith(PREFIX):
+            name = '{}.{}'.format(PREFIX, name)
+        sequences[name] = seq.replace(b'\n', b'').decode()
+    with pysam.FastaFile(spliced) as fasta:
+        assert sorted(fasta.references) == sorted(sequences)
+        for name, seq in sequences.items():
+            assert fasta.fetch(name) == seq
+            assert fasta.fetch(name, len(seq) // 2, len(seq)) == seq[
+                                                               len(seq) // 2:]
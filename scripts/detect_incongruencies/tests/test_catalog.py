@@ -0,0 +1,85 @@
+import os
+import shutil
+import pytest
+from datastore import annotation_collection, genome_collection, write_readme
+from incongruency_detector.catalog import Catalog
+from incongruency_detector.datastore_index import DataStoreIndex
+from incongruency_detector.summarize import HEADER, HeaderSummarizer
+
+pytest.importorskip('yaml')
+
+
+def organism(tmp_path):
+    '''Glycine_max with a genome and an annotation, each with a subject'''
+    path = str(tmp_path / 'Glycine_max')
+    genome = genome_collection(path, 'Wm82', 'AAAA', ['Gm01'])
+    write_readme(genome, 'Wm82.gnm1.AAAA', subject='Wm82 genome')
+    annotation = annotation_collection(path, 'Wm82', 'BBBB', 'Gm01')
+    write_readme(annotation, 'Wm82.gnm1.ann1.BBBB', subject='Wm82 genes')
+    return path, genome, annotation
+
+
+def update(catalog, root):
+    return catalog.update(DataStoreIndex(root).collections.values(), [root])
+
+
+def stale(catalog, path):
+    return catalog.db.execute('SELECT stale FROM results WHERE collection = ?',
+                              (path,)).fetchone()[0]
+
+
+def test_update_by_fingerprint(tmp_path):
+    root, genome, annotation = organism(tmp_path)
+    catalog = Catalog(str(tmp_path / 'catalog.sqlite'))
+    try:
+        assert sorted(update(catalog, root)) == [genome, annotation]
+        assert update(catalog, root) == []  # nothing changed, nothing read
+        catalog.put_result(genome, True, {})
+        catalog.put_result(annotation, True, {})
+        write_readme(annotation, 'Wm82.gnm1.ann1.BBBB', subject='new genes')
+        assert update(catalog, root) == [annotation]
+        assert catalog.field('subject') == {genome: 'Wm82 genome',
+                                            annotation: 'new genes'}
+        assert (stale(catalog, genome), stale(catalog, annotation)) == (0, 1)
+        shutil.rmtree(annotation)
+        assert update(catalog, root) == []
+        assert [c['path'] for c in catalog.collections()] == [genome]
+        assert catalog.db.execute('SELECT COUNT(*) FROM results').fetchone(
+                                                                    )[0] == 1
+    finally:
+        catalog.close()
+
+
+def test_collections_query(tmp_path):
+    root, genome, annotation = organism(tmp_path)
+    catalog = Catalog(str(tmp_path / 'catalog.sqlite'))
+    try:
+        update(catalog, root)
+        found = catalog.collections('Glycine_max', 'annotation')
+        assert [(c['path'], c['key'], c['readme']) for c in found] == [
+               (annotation, 'BBBB', os.path.join(
+                              annotation, 'README.Wm82.gnm1.ann1.BBBB.yml'))]
+        assert catalog.collections('Phaseolus_vulgaris') == []
+        assert catalog.field('subject', 'Phaseolus_vulgaris') == {}
+    finally:
+        catalog.close()
+
+
+def test_summary_from_catalog(tmp_path):
+    '''README subjects queried from the catalog match those read'''
+    root, genome, annotation = organism(tmp_path)
+    header = os.path.join(root, HEADER)
+    HeaderSummarizer(2, None).summarize([root])
+    with open(header) as fopen:
+        expected = fopen.read()
+    os.remove(header)
+    catalog = Catalog(str(tmp_path / 'catalog.sqlite'))
+    try:
+        update(catalog, root)
+        summarizer = HeaderSummarizer(2, None, catalog=catalog)
+        assert summarizer.summarize([root]) == [header]
+    finally:
+        catalog.close()
+    with open(header) as fopen:
+        assert fopen.read() == expected
+    assert 'Wm82 genes' in expected
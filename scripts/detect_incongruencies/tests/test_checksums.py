@@ -0,0 +1,112 @@
+import os
+import hashlib
+from incongruency_detector import checksums
+from incongruency_detector.checksums import (HashCache, file_digests,
+                                             hash_file, verify_manifest,
+                                             write_manifest)
+from incongruency_detector.file_helpers import fingerprint
+
+
+def md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def collection(tmp_path):
+    '''Wm82.gnm1.AAAA with three files, one in a subdirectory'''
+    path = tmp_path / 'Wm82.gnm1.AAAA'
+    (path / 'sub').mkdir(parents=True)
+    files = {'a.txt': b'alpha\n', 'b.txt': b'beta\n' * 1000,
+             os.path.join('sub', 'c.txt'): b''}
+    for name, data in files.items():
+        (path / name).write_bytes(data)
+    return path, files
+
+
+def write_md5(path, lines):
+    md5_file = path / 'CHECKSUM.{}.md5'.format(path.name)
+    md5_file.write_text(''.join(line + '\n' for line in lines))
+    return str(md5_file)
+
+
+def test_hash_file_small_reads(tmp_path):
+    data = os.urandom(10000)
+    path = tmp_path / 'data'
+    path.write_bytes(data)
+    assert hash_file(str(path), ('md5', 'sha256'), read_size=7) == [
+           md5(data), hashlib.sha256(data).hexdigest()]
+
+
+def test_hash_cache(tmp_path):
+    path = tmp_path / 'data'
+    path.write_bytes(b'data\n')
+    fprint = fingerprint(str(path))
+    cache = HashCache(str(tmp_path / 'cache' / 'hashes.sqlite'))
+    try:
+        assert cache.get(fprint) is None
+        cache.put([(fprint, {'md5': 'x'})])
+        assert cache.get(fprint) == {'md5': 'x', 'sha256': None}
+        changed = fprint[:3] + (fprint[3] + 1,)  # touched since
+        assert cache.get(changed) is None
+    finally:
+        cache.close()
+
+
+def test_file_digests_uses_cache(tmp_path, monkeypatch):
+    path, files = collection(tmp_path)
+    paths = [str(path / n) for n in files]
+    cache = HashCache(str(tmp_path / 'hashes.sqlite'))
+    try:
+        first = file_digests(paths, threads=2, cache=cache)
+        assert first == {str(path / n): {'md5': md5(d)}
+                         for n, d in files.items()}
+        read = []
+        real_hash = checksums.hash_file
+        monkeypatch.setattr(checksums, 'hash_file',
+                            lambda p, a: read.append(p) or real_hash(p, a))
+        assert file_digests(paths, cache=cache) == {
+               p: {'md5': first[p]['md5'], 'sha256': None} for p in paths}
+        assert read == []
+        # sha256 was never cached so every file is read again
+        both = file_digests(paths, ('md5', 'sha256'), cache=cache)
+        assert sorted(read) == sorted(paths)
+        assert both[paths[0]]['sha256'] == hashlib.sha256(
+                                           files['a.txt']).hexdigest()
+        os.utime(paths[0], ns=(0, 0))
+        del read[:]
+        file_digests(paths, ('md5', 'sha256'), cache=cache)
+        assert read == [paths[0]]
+    finally:
+        cache.close()
+
+
+def test_verify_manifest(tmp_path):
+    path, files = collection(tmp_path)
+    (path / 'extra.txt').write_bytes(b'not listed\n')
+    md5_file = write_md5(path, [
+        '{}  ./a.txt'.format(md5(files['a.txt'])),
+        '{}  ./b.txt'.format('deadbeef' * 4),
+        '{}  sub/c.txt'.format(md5(b'')),
+        '{}  ./gone.txt'.format(md5(b'gone'))])
+    (path / 'CHECKSUM.Wm82.gnm1.AAAA.sha256').write_text('skipped\n')
+    assert verify_manifest(md5_file, threads=2) == {
+           'ok': ['a.txt', 'sub/c.txt'], 'mismatched': ['b.txt'],
+           'missing': ['gone.txt'], 'extra': ['extra.txt']}
+
+
+def test_write_then_verify(tmp_path):
+    path, files = collection(tmp_path)
+    cache = HashCache(str(tmp_path / 'hashes.sqlite'))
+    try:
+        written = write_manifest(str(path), sha256=True, cache=cache)
+        assert [os.path.basename(w) for w in written] == [
+               'CHECKSUM.Wm82.gnm1.AAAA.md5',
+               'CHECKSUM.Wm82.gnm1.AAAA.sha256']
+        expected = ''.join('{}  ./{}\n'.format(md5(files[n]), n)
+                           for n in sorted(files))
+        with open(written[0]) as fopen:
+            assert fopen.read() == expected
+        result = verify_manifest(written[0], cache=cache)
+    finally:
+        cache.close()
+    assert result['ok'] == sorted(files)
+    assert not (result['mismatched'] or result['missing'] or result['extra'])
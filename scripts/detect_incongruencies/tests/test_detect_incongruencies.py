@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from datastore import annotation_collection, genome_collection, write_readme
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                      'detect_incongruencies.py')
+
+
+def run(tmp_path, *args):
+    '''run detect_incongruencies in tmp_path, returns (exit, report)'''
+    report = str(tmp_path / 'report.json')
+    command = [sys.executable, SCRIPT, '--log_file',
+               str(tmp_path / 'run.log'), '--report', report] + list(args)
+    env = dict(os.environ, HOME=str(tmp_path / 'home'))
+    exit_val = subprocess.call(command, cwd=str(tmp_path), env=env,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    with open(report) as fopen:
+        return exit_val, json.load(fopen)
+
+
+def organism(tmp_path):
+    '''Glycine_max with a clean Wm82 genome and annotation and a Lee
+       genome whose CHECKSUM does not match
+    '''
+    path = str(tmp_path / 'datastore' / 'Glycine_max')
+    genome_collection(path, 'Wm82', 'AAAA',
+                      ['glyma.Wm82.gnm1.Gm01', 'glyma.Wm82.gnm1.Gm02'])
+    annotation_collection(path, 'Wm82', 'BBBB', 'glyma.Wm82.gnm1.Gm01')
+    genome_collection(path, 'Lee', 'CCCC',
+                      ['glyma.Lee.gnm1.Gm01'], bad_checksum=True)
+    return path
+
+
+def collections(report):
+    return sorted((e['collection'], e['passed']) for e in report['files'])
+
+
+def test_jobs_failed_collection(tmp_path):
+    exit_val, report = run(tmp_path, '--directory', organism(tmp_path),
+                           '--jobs', '2')
+    assert exit_val == 1
+    assert collections(report) == [('Lee.gnm1.CCCC', False),
+                                   ('Wm82.gnm1.AAAA', True),
+                                   ('Wm82.gnm1.ann1.BBBB', True)]
+    assert report['summary']['failed'] == 1
+
+
+def test_serial_matches_jobs(tmp_path):
+    exit_val, report = run(tmp_path, '--directory', organism(tmp_path))
+    assert exit_val == 1
+    assert collections(report) == [('Lee.gnm1.CCCC', False),
+                                   ('Wm82.gnm1.AAAA', True),
+                                   ('Wm82.gnm1.ann1.BBBB', True)]
+
+
+def test_clean_collection(tmp_path):
+    path = organism(tmp_path)
+    exit_val, report = run(tmp_path, '--directory',
+                           os.path.join(path, 'Wm82.gnm1.AAAA'), '--jobs',
+                           '2')
+    assert exit_val == 0
+    assert report['summary']['failed'] == 0
+    assert not (tmp_path / 'home').exists()  # caches are opt-in
+
+
+def test_readme_error_fails_collection(tmp_path):
+    pytest.importorskip('yaml')
+    path = organism(tmp_path)
+    genome = os.path.join(path, 'Wm82.gnm1.AAAA')
+    write_readme(genome, 'Wm82.gnm1.AAAA', subject=None)
+    exit_val, report = run(tmp_path, '--directory', genome)
+    entry = [e for e in report['files'] if e['collection'] == 'Wm82.gnm1.AAAA']
+    assert not entry[0]['passed']
+    assert 'README has no subject' in [f['message']
+                                       for f in entry[0]['findings']]
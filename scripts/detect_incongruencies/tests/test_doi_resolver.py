@@ -0,0 +1,82 @@
+import json
+import threading
+import http.server
+import pytest
+from incongruency_detector.doi_resolver import DOIResolver
+
+
+class HandleServer(http.server.ThreadingHTTPServer):
+    '''stand-in for the doi.org handle API
+
+       10.1/good resolves, 10.1/error answers 500 without JSON, anything
+       else is not found.  hits counts requests per DOI.
+    '''
+    def __init__(self):
+        http.server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0),
+                                                 HandleHandler)
+        self.hits = {}
+        self.lock = threading.Lock()
+
+
+class HandleHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        doi = self.path.split('/api/handles/', 1)[1]
+        with self.server.lock:
+            self.server.hits[doi] = self.server.hits.get(doi, 0) + 1
+        if doi.endswith('error'):
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b'upstream down')
+            return
+        found = doi.endswith('good')
+        body = json.dumps({'responseCode': 1 if found else 100}).encode()
+        self.send_response(200 if found else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = HandleServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def resolver(server, cache_file=None):
+    url = 'http://127.0.0.1:{}/api/handles/'.format(server.server_port)
+    return DOIResolver(url, cache_file, timeout=5)
+
+
+def test_resolve(server):
+    results = resolver(server).resolve(['10.1/good', '10.1/bad',
+                                        '10.1/good'])
+    assert results == {'10.1/good': True, '10.1/bad': False}
+    assert server.hits == {'10.1/good': 1, '10.1/bad': 1}
+
+
+def test_cache_hit(server, tmp_path):
+    cache_file = str(tmp_path / 'dois.json')
+    resolver(server, cache_file).resolve(['10.1/good', '10.1/bad'])
+    results = resolver(server, cache_file).resolve(['10.1/good',
+                                                    '10.1/bad'])
+    assert results == {'10.1/good': True, '10.1/bad': False}
+    assert server.hits == {'10.1/good': 1, '10.1/bad': 1}
+
+
+def test_errors_not_cached(server, tmp_path):
+    cache_file = str(tmp_path / 'dois.json')
+    results = resolver(server, cache_file).resolve(['10.1/error',
+                                                    '10.1/good'])
+    assert results == {'10.1/error': None, '10.1/good': True}
+    with open(cache_file) as fopen:
+        assert list(json.load(fopen)) == ['10.1/good']
+    assert resolver(server, cache_file).resolve(['10.1/error']) == {
+                                                           '10.1/error': None}
+    assert server.hits['10.1/error'] == 2
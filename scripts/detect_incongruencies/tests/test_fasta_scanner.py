@@ -0,0 +1,72 @@
+import pytest
+from incongruency_detector.fasta_scanner import FastaScanner
+
+# headers, CRLF, a ragged last line, an empty record and no final newline
+FASTA = (b'>chr1 first one\nACGTACGT\nACGTACGT\nACG\n'
+         b'>empty\n'
+         b'>chr2\r\nACGT\r\nAC\r\n'
+         b'>chr3 last\nACGTA')
+RECORDS = [  # (seqid, length, seq_offset, line_bases, line_width)
+    (b'chr1', 19, 16, 8, 9),
+    (b'empty', 0, 45, None, None),
+    (b'chr2', 6, 52, 4, 6),
+    (b'chr3', 5, 73, None, None),
+]
+
+
+class Recorder(FastaScanner):
+    def __init__(self):
+        FastaScanner.__init__(self)
+        self.headers = []
+        self.payload = b''
+        self.found = []
+
+    def header(self, header):
+        self.headers.append(header)
+
+    def sequence(self, seq):
+        self.payload += seq
+
+    def record(self, seqid, length):
+        self.found.append((seqid, length, self.seq_offset, self.line_bases,
+                           self.line_width))
+
+
+def scan(data, size):
+    scanner = Recorder()
+    for i in range(0, len(data), size):
+        scanner.feed(data[i:i + size])
+    scanner.close()
+    return scanner
+
+
+@pytest.mark.parametrize('size', range(1, len(FASTA) + 1))
+def test_every_chunk_size(size):
+    '''chunk edges fall everywhere, inside b'\\n>' and b'\\r\\n' too'''
+    scanner = scan(FASTA, size)
+    assert scanner.headers == [b'chr1 first one', b'empty', b'chr2',
+                               b'chr3 last']
+    assert scanner.found == RECORDS
+    assert scanner.payload == (b'ACGTACGT\nACGTACGT\nACG\n'
+                               b'ACGT\r\nAC\r\nACGTA')
+    assert scanner.records == 4
+
+
+def test_offsets_point_at_sequence():
+    scanner = scan(FASTA, len(FASTA))
+    for seqid, length, offset, line_bases, line_width in scanner.found:
+        if length and line_bases:
+            assert FASTA[offset:offset + line_bases] in (b'ACGTACGT',
+                                                         b'ACGT')
+
+
+def test_header_without_newline():
+    scanner = scan(b'>chr1\nAC\n>chr2', 3)
+    assert scanner.headers == [b'chr1', b'chr2']
+    assert [r[:2] for r in scanner.found] == [(b'chr1', 2), (b'chr2', 0)]
+
+
+def test_gt_in_sequence_line_is_not_a_header():
+    scanner = scan(b'>chr1\nAC>GT\nAC\n', 4)
+    assert scanner.headers == [b'chr1']
+    assert scanner.found[0][:2] == (b'chr1', 7)
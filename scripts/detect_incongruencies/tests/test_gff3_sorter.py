@@ -0,0 +1,111 @@
+import gzip
+import random
+import logging
+import pytest
+from incongruency_detector.Normalizer import Normalizer
+
+SORT_MEMORY = 50000  # bytes, small enough to spill and merge runs
+
+
+def make_gff3(path, genes=300, seed=3):
+    '''shuffled gff3 of genes, each with two mRNAs of three exons and
+       CDSs, and a ##FASTA section; returns its feature lines
+    '''
+    rng = random.Random(seed)
+    features = []
+    for g in range(genes):
+        seqid = 'chr{}'.format(rng.randint(1, 12))
+        start = rng.randint(1, 10 ** 6)
+        features.append('\t'.join([seqid, 'x', 'gene', str(start),
+                                   str(start + 900), '.', '+', '.',
+                                   'ID=g{0};Name=g{0}'.format(g)]))
+        for m in range(2):
+            mrna = 'g{}.m{}'.format(g, m)
+            features.append('\t'.join([seqid, 'x', 'mRNA', str(start + m),
+                                       str(start + 900), '.', '+', '.',
+                                       'ID={};Parent=g{}'.format(mrna, g)]))
+            for e in range(3):
+                begin = str(start + m + 300 * e)
+                end = str(start + m + 300 * e + 200)
+                features.append('\t'.join([seqid, 'x', 'exon', begin, end,
+                                           '.', '+', '.',
+                                           'Parent={}'.format(mrna)]))
+                features.append('\t'.join([seqid, 'x', 'CDS', begin, end,
+                                           '.', '+', '0',
+                                           'ID={}.cds{};Parent={}'.format(
+                                                             mrna, e, mrna)]))
+    rng.shuffle(features)
+    with gzip.open(path, 'wt') as fopen:
+        fopen.write('##gff-version 3\n')
+        fopen.write('\n'.join(features) + '\n')
+        fopen.write('##FASTA\n>chr1\nACGT\n')
+    return features
+
+
+def attributes(line):
+    return dict(a.split('=', 1) for a in line.split('\t')[8].split(';'))
+
+
+def sorted_lines(path):
+    '''(directives, feature lines, FASTA lines) of a sorted gff3'''
+    with gzip.open(path, 'rt') as fopen:
+        lines = fopen.read().splitlines()
+    fasta = lines.index('##FASTA')
+    directives = [l for l in lines[:fasta] if l.startswith('#')]
+    features = [l for l in lines[:fasta] if not l.startswith('#')]
+    return directives, features, lines[fasta:]
+
+
+def check_parents_first(features):
+    seen = set()
+    for line in features:
+        fields = attributes(line)
+        if 'Parent' in fields:
+            assert fields['Parent'] in seen, line
+        if 'ID' in fields:
+            seen.add(fields['ID'])
+
+
+@pytest.fixture
+def gff3(tmp_path):
+    path = str(tmp_path / 'glyma.Wm82.gnm2.ann1.RVB6.gene_models_main.gff3.gz')
+    return path, make_gff3(path)
+
+
+@pytest.mark.parametrize('compress', ['bgzf', 'gzip'])
+@pytest.mark.parametrize('memory', [SORT_MEMORY, 512 * 1024 * 1024])
+def test_position_order(gff3, tmp_path, compress, memory):
+    path, features = gff3
+    normalizer = Normalizer(logger=logging.getLogger('test'),
+                            sort_memory=memory, sort_tmp=str(tmp_path),
+                            gff3_compress=compress)
+    out = normalizer.sort_gff3(path, str(tmp_path / 'sorted.gff3.gz'))
+    directives, found, fasta = sorted_lines(out)
+    assert directives == ['##gff-version 3']
+    assert fasta == ['##FASTA', '>chr1', 'ACGT']
+    assert sorted(found) == sorted(features)
+    positions = [(l.split('\t')[0], int(l.split('\t')[3])) for l in found]
+    assert positions == sorted(positions)
+    check_parents_first(found)
+
+
+def test_tree_order(gff3, tmp_path):
+    path, features = gff3
+    normalizer = Normalizer(logger=logging.getLogger('test'),
+                            sort_memory=SORT_MEMORY, sort_tmp=str(tmp_path),
+                            gff3_order='tree')
+    out = normalizer.sort_gff3(path, str(tmp_path / 'sorted.gff3.gz'))
+    directives, found, fasta = sorted_lines(out)
+    assert fasta == ['##FASTA', '>chr1', 'ACGT']
+    assert sorted(found) == sorted(features)
+    check_parents_first(found)
+    genes = []
+    gene = None
+    for line in found:  # every gene followed by all of its features
+        fields = attributes(line)
+        if line.split('\t')[2] == 'gene':
+            gene = fields['ID']
+            genes.append((line.split('\t')[0], int(line.split('\t')[3])))
+        else:
+            assert fields['Parent'].split('.')[0] == gene, line
+    assert genes == sorted(genes)
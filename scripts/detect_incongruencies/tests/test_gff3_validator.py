@@ -0,0 +1,192 @@
+import gzip
+import logging
+import pytest
+from incongruency_detector.Detector import Detector
+from incongruency_detector.Normalizer import Normalizer
+from incongruency_detector.gff3_validator import (GFF3Validator,
+                                                  parse_attributes)
+
+
+class RecordList(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger('test.' + request.node.name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = RecordList()
+    logger.handlers = [handler]
+    logger.messages = lambda: [r.getMessage() for r in handler.records
+                               if r.levelno >= logging.ERROR]
+    return logger
+
+
+def feature(seqid, feature_type, attributes, start=100, end=900, phase='.'):
+    return '\t'.join([seqid, 'src', feature_type, str(start), str(end), '.',
+                      '+', phase, attributes])
+
+
+def validate(logger, lines, **kwargs):
+    '''run lines, str, through a GFF3Validator as the callers do'''
+    validator = GFF3Validator(logger, **kwargs)
+    for number, line in enumerate(lines, 1):
+        if line.startswith('###'):
+            validator.flush()
+        elif not line.startswith('#'):
+            validator.feature(line.encode().split(b'\t'), number)
+    validator.close()
+    return validator
+
+
+GENE = [feature('chr1', 'gene', 'ID=g1'),
+        feature('chr1', 'mRNA', 'ID=g1.1;Parent=g1'),
+        feature('chr1', 'exon', 'Parent=g1.1'),
+        feature('chr1', 'CDS', 'ID=g1.1.cds;Parent=g1.1', phase='0'),
+        feature('chr1', 'CDS', 'ID=g1.1.cds;Parent=g1.1', 1000, 1100, '0')]
+
+
+def test_valid(logger):
+    validator = validate(logger, GENE + ['###'])
+    assert validator.passed
+    assert logger.messages() == []
+
+
+def test_children_before_parent(logger):
+    '''Parents later in the same tree resolve at the flush'''
+    validator = validate(logger, GENE[::-1] + ['###'])
+    assert validator.passed, logger.messages()
+
+
+def test_missing_parent(logger):
+    validator = validate(logger, GENE[:1] + [
+                         feature('chr1', 'mRNA', 'ID=g2.1;Parent=g2')])
+    assert not validator.passed
+    assert logger.messages() == ['gff3 Parent g2 not found, line 2']
+
+
+def test_flush_at_directive(logger):
+    '''### closes the tree, a Parent after it is not found'''
+    lines = GENE[:1] + ['###', feature('chr1', 'mRNA', 'ID=g1.1;Parent=g1')]
+    validator = validate(logger, lines)
+    assert logger.messages() == ['gff3 Parent g1 not found, line 3']
+    assert validator.tree == {} and validator.pending == []
+
+
+def test_flush_at_seqid_change(logger):
+    lines = [feature('chr1', 'gene', 'ID=g1'),
+             feature('chr2', 'mRNA', 'ID=g1.1;Parent=g1')]
+    validate(logger, lines)
+    assert logger.messages() == ['gff3 Parent g1 not found, line 2']
+
+
+def test_duplicate_id_across_trees(logger):
+    lines = GENE[:1] + ['###', feature('chr1', 'gene', 'ID=g1')]
+    validate(logger, lines)
+    assert logger.messages() == ['gff3 duplicate ID g1, line 3']
+
+
+def test_hierarchy_and_columns(logger):
+    lines = [feature('chr1', 'gene', 'ID=g1'),
+             feature('chr1', 'CDS', 'ID=c;Parent=g1', phase='.'),
+             feature('chr1', 'mRNA', 'ID=m'),
+             feature('chr1', 'gene', 'ID=g2', 900, 100),
+             'chr1\tsrc\tgene\t1']
+    validator = validate(logger, lines)
+    assert not validator.passed
+    assert logger.messages() == [
+        'gff3 CDS phase must be 0, 1 or 2, line 2',
+        'gff3 CDS should not be a child of gene g1, line 2',
+        'gff3 mRNA has no Parent, line 3',
+        'gff3 bad coordinates 900-100, line 4',
+        'gff3 expected 9 columns found 4, line 5']
+
+
+def write_gff3(path, lines):
+    with gzip.open(path, 'wt') as fopen:
+        fopen.write('\n'.join(lines) + '\n')
+
+
+def test_stops_at_fasta(logger, tmp_path):
+    '''sequence lines after ##FASTA are not features'''
+    gff = str(tmp_path / 'glyma.Wm82.gnm2.ann1.RVB6.gene_models_main.gff3.gz')
+    write_gff3(gff, ['##gff-version 3'] + GENE +
+               ['##FASTA', '>chr1', 'ACGTACGT', 'ACGT'])
+    assert Normalizer(logger=logger).check_gff3(gff) == 0
+    detector = Detector(logger=logger)
+    try:
+        assert detector.check_seqid_attributes(gff)
+    finally:
+        detector.close()
+    assert not [m for m in logger.messages() if 'columns' in m]
+
+
+@pytest.mark.parametrize('column', [
+    b'ID=g1;Name=glyma.G1;Parent=p1',
+    b'Parent=p1;Name=glyma.G1;ID=g1;',
+    b'Name=glyma.G1;ID=g1;Parent=p1;Note=x',
+])
+def test_parse_attributes_any_order(column):
+    attributes = parse_attributes(column)
+    assert (attributes[b'ID'], attributes[b'Name'],
+            attributes[b'Parent']) == (b'g1', b'glyma.G1', b'p1')
+    assert b'' not in attributes or column.endswith(b';')
+
+
+def test_parse_attributes_values():
+    '''escaped values stay escaped, the first of a repeated tag is kept'''
+    attributes = parse_attributes(b'ID=g%3B1;Note=a%3Db,c;ID=g2;Dbxref')
+    assert attributes == {b'ID': b'g%3B1', b'Note': b'a%3Db,c',
+                          b'Dbxref': b''}
+    assert parse_attributes(b'Parent=m1,m2')[b'Parent'] == b'm1,m2'
+
+
+PREFIX = 'glyma.Wm82.gnm2.ann1.'
+
+
+def id_name(logger, lines):
+    '''id_name findings for lines checked with the data store prefixes'''
+    validator = validate(logger, lines, id_prefix=PREFIX,
+                         name_prefix='glyma')
+    return validator, logger.messages()
+
+
+def test_ids_extend_parents(logger):
+    gene = PREFIX + 'G1'
+    lines = [feature('chr1', 'gene', 'ID={};Name=glyma.G1'.format(gene)),
+             feature('chr1', 'mRNA', 'ID={0}.1;Name=glyma.G1.1;'
+                     'Parent={0}'.format(gene)),
+             feature('chr1', 'mRNA', 'ID={0}.2;Parent={0}'.format(gene)),
+             feature('chr1', 'exon', 'ID={0}.1.exon1;Parent={0}.2,{0}.1'
+                     .format(gene)),  # one of several Parents
+             feature('chr1', 'CDS', 'Parent={}.1;ID={}.1.CDS1'.format(
+                                                            gene, gene),
+                     phase='0')]
+    validator, messages = id_name(logger, lines)
+    assert validator.passed and messages == []
+
+
+def test_ids_not_extending_parents(logger):
+    gene = PREFIX + 'G1'
+    lines = [feature('chr1', 'gene', 'ID={};Name=glyma.G1'.format(gene)),
+             feature('chr1', 'mRNA', 'ID={0};Parent={0}'.format(gene)),
+             feature('chr1', 'mRNA', 'ID={}M2;Parent={}'.format(PREFIX,
+                                                                  gene)),
+             feature('chr1', 'gene', 'ID=G3;Name=G3'),
+             feature('chr1', 'gene', 'ID={}G4'.format(PREFIX))]
+    validator, messages = id_name(logger, lines)
+    assert messages == [
+        'mRNA id {0} does not extend Parent {0} line 2'.format(gene),
+        'gff3 duplicate ID {}, line 2'.format(gene),
+        'mRNA id {}M2 does not extend Parent {} line 3'.format(PREFIX, gene),
+        'gene id G3, should start with {} line 4'.format(PREFIX),
+        'gene name G3, should start with glyma line 4',
+        'No ID and Name attributes. line 5']
+    assert not validator.passed  # only for the duplicate ID
+    assert validator.errors == 1
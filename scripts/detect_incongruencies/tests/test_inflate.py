@@ -0,0 +1,193 @@
+import os
+import sys
+import gzip
+import time
+import random
+import pytest
+from incongruency_detector import inflate
+from incongruency_detector.bgzf import BGZFWriter
+from incongruency_detector.inflate import (BGZFInflater, StreamInflater,
+                                           external_command, make_inflater)
+from incongruency_detector.pipeline import StreamPipeline
+
+RNG = random.Random(3)
+DATA = b''.join(b'>s%d\n%s\n' % (i, bytes(RNG.choice(b'ACGT')
+                                          for _ in range(300)))
+                for i in range(2000))
+
+
+@pytest.fixture(autouse=True)
+def settings():
+    '''put inflate.SETTINGS back after each test'''
+    saved = dict(inflate.SETTINGS)
+    yield
+    inflate.SETTINGS.update(saved)
+
+
+def multi_member(path):
+    '''DATA as three gzip members of uneven size'''
+    with open(path, 'wb') as fopen:
+        for start, end in ((0, 1000), (1000, 400000), (400000, len(DATA))):
+            fopen.write(gzip.compress(DATA[start:end], 1))
+    return path
+
+
+def bgzf(path):
+    writer = BGZFWriter(path, threads=2, index=False)
+    writer.write(DATA)
+    writer.close()
+    return path
+
+
+def feed(inflater, raw, size):
+    out = [inflater.feed(raw[i:i + size]) for i in range(0, len(raw), size)]
+    out.append(inflater.close())
+    return b''.join(out)
+
+
+@pytest.mark.parametrize('size', [17, 5000, 1 << 20])
+def test_stream_inflater_multi_member(tmp_path, size):
+    with open(multi_member(str(tmp_path / 'x.gz')), 'rb') as fopen:
+        raw = fopen.read()
+    assert gzip.decompress(raw) == DATA
+    assert feed(StreamInflater('gzip'), raw, size) == DATA
+
+
+def test_stream_inflater_truncated(tmp_path):
+    with open(multi_member(str(tmp_path / 'x.gz')), 'rb') as fopen:
+        raw = fopen.read()
+    with pytest.raises(IOError):
+        feed(StreamInflater('gzip'), raw[:-100], 5000)
+
+
+@pytest.mark.parametrize('size', [17, 5000, 1 << 20])
+def test_bgzf_inflater(tmp_path, size):
+    with open(bgzf(str(tmp_path / 'x.gz')), 'rb') as fopen:
+        raw = fopen.read()
+    assert feed(BGZFInflater(4), raw, size) == gzip.decompress(raw) == DATA
+
+
+def test_bgzf_inflater_keeps_order(tmp_path, monkeypatch):
+    '''every other block finishes late, output is still in file order'''
+    with open(bgzf(str(tmp_path / 'x.gz')), 'rb') as fopen:
+        raw = fopen.read()
+    inflate_block = inflate.inflate_block
+    calls = []
+
+    def slow_odd(block):
+        calls.append(block)
+        time.sleep(0.05 if len(calls) % 2 else 0)
+        return inflate_block(block)
+    monkeypatch.setattr(inflate, 'inflate_block', slow_odd)
+    assert feed(BGZFInflater(4), raw, 1 << 20) == DATA
+    assert len(calls) > 4
+
+
+def test_bgzf_then_plain_member(tmp_path):
+    with open(bgzf(str(tmp_path / 'x.gz')), 'rb') as fopen:
+        raw = fopen.read()
+    raw += gzip.compress(b'tail\n')
+    assert feed(BGZFInflater(4), raw, 5000) == DATA + b'tail\n'
+
+
+@pytest.mark.parametrize('make', [multi_member, bgzf])
+@pytest.mark.parametrize('chunk_size', [1000, 1 << 20])
+def test_threads_match_gzip(tmp_path, make, chunk_size):
+    path = make(str(tmp_path / 'x.gz'))
+    with open(path, 'rb') as fopen:
+        expected = gzip.decompress(fopen.read())
+    found = {}
+    for threads in (1, 4):
+        inflate.configure(threads, 'none')
+        pipeline = StreamPipeline(path, chunk_size)
+        found[threads] = b''.join(pipeline.chunks())
+        found[threads, 'inflater'] = type(pipeline.inflater)
+    assert found[1] == found[4] == expected
+    assert found[1, 'inflater'] is StreamInflater
+    assert found[4, 'inflater'] is (BGZFInflater if make is bgzf
+                                    else StreamInflater)
+
+
+def test_make_inflater():
+    assert make_inflater(b'>chr1\nACGT\n') is None
+    assert isinstance(make_inflater(gzip.compress(b'x')), StreamInflater)
+
+
+class Collect:
+    def __init__(self):
+        self.data = b''
+
+    def update(self, chunk):
+        self.data += chunk
+
+
+def fake_gunzip(tmp_path):
+    '''a gunzip that leaves a marker file when it runs'''
+    path = tmp_path / 'fakegz'
+    marker = tmp_path / 'ran'
+    path.write_text('#!{}\nimport sys, gzip\nopen({!r}, "w").close()\n'
+                    'sys.stdout.buffer.write(gzip.open(sys.argv[2]).read())\n'
+                    .format(sys.executable, str(marker)))
+    path.chmod(0o755)
+    return str(path), marker
+
+
+def test_external_command(tmp_path, monkeypatch):
+    path = multi_member(str(tmp_path / 'x.gz'))
+    with open(path, 'rb') as fopen:
+        first = fopen.read(1000)
+    tool, marker = fake_gunzip(tmp_path)
+    inflate.configure(external=tool)
+    assert external_command(path, first) is None  # under EXTERNAL_MIN
+    monkeypatch.setattr(inflate, 'EXTERNAL_MIN', 1000)
+    assert external_command(path, first) == [tool, '-dc', path]
+    inflate.configure(external='none')
+    assert external_command(path, first) is None
+    bgzf_path = bgzf(str(tmp_path / 'y.gz'))
+    with open(bgzf_path, 'rb') as fopen:
+        inflate.configure(external=tool)
+        assert external_command(bgzf_path, fopen.read(1000)) is None
+
+
+def test_external_tool_missing(tmp_path, monkeypatch):
+    path = multi_member(str(tmp_path / 'x.gz'))
+    with open(path, 'rb') as fopen:
+        first = fopen.read(1000)
+    monkeypatch.setattr(inflate, 'EXTERNAL_MIN', 1000)
+    monkeypatch.setattr(inflate.shutil, 'which', lambda tool: None)
+    for external in ('auto', 'igzip'):
+        inflate.configure(external=external)
+        assert external_command(path, first) is None
+    pipeline = StreamPipeline(path)
+    assert b''.join(pipeline.chunks()) == DATA
+    assert isinstance(pipeline.inflater, StreamInflater)
+
+
+def test_external_auto(tmp_path, monkeypatch):
+    path = multi_member(str(tmp_path / 'x.gz'))
+    with open(path, 'rb') as fopen:
+        first = fopen.read(1000)
+    monkeypatch.setattr(inflate, 'EXTERNAL_MIN', 1000)
+    monkeypatch.setattr(inflate.shutil, 'which',
+                        lambda tool: '/bin/pigz' if tool == 'pigz' else None)
+    inflate.configure(external='auto')
+    assert external_command(path, first) == ['/bin/pigz', '-dc', path]
+
+
+def test_pipeline_external_and_raw_consumers(tmp_path, monkeypatch):
+    path = multi_member(str(tmp_path / 'x.gz'))
+    tool, marker = fake_gunzip(tmp_path)
+    monkeypatch.setattr(inflate, 'EXTERNAL_MIN', 1000)
+    inflate.configure(external=tool)
+    pipeline = StreamPipeline(path, 4096)
+    assert b''.join(pipeline.chunks()) == DATA
+    assert marker.exists() and pipeline.inflater is None
+    assert pipeline.bytes_read == os.path.getsize(path)
+    marker.unlink()
+    # a raw consumer needs the bytes on disk so the read stays here
+    pipeline = StreamPipeline(path, 4096)
+    seen = pipeline.add_raw_consumer(Collect())
+    assert b''.join(pipeline.chunks()) == DATA
+    assert not marker.exists()
+    with open(path, 'rb') as fopen:
+        assert seen.data == fopen.read()
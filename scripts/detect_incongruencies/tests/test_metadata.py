@@ -0,0 +1,101 @@
+import os
+import logging
+import pytest
+from datastore import README, genome_collection, write_readme
+from incongruency_detector import metadata
+from incongruency_detector.datastore_index import scan_collection
+from incongruency_detector.metadata import (OPTIONAL_FIELDS, MetadataValidator,
+                                            ReadmeSchema, readme_dois)
+
+pytest.importorskip('yaml')
+
+KEY = 'Wm82.gnm1.AAAA'
+
+
+def collection(tmp_path, **fields):
+    path = genome_collection(str(tmp_path / 'Glycine_max'), 'Wm82', 'AAAA',
+                             ['Gm01'])
+    write_readme(path, KEY, **fields)
+    return scan_collection(path)
+
+
+def problems(tmp_path, **fields):
+    '''(level, message) of the README and MANIFEST checks'''
+    found = MetadataValidator().check(collection(tmp_path, **fields))
+    return [(level, msg.format(*args)) for level, msg, args in found]
+
+
+def test_required_fields():
+    schema = ReadmeSchema()
+    assert 'subject' in schema.required and 'identifier' in schema.required
+    assert not set(OPTIONAL_FIELDS).intersection(schema.required)
+    assert set(README).union(['identifier']) == set(schema.required)
+
+
+def test_clean_readme(tmp_path):
+    '''the test README leaves every optional field out'''
+    assert problems(tmp_path) == []
+
+
+def test_readme_problems(tmp_path):
+    assert problems(tmp_path, subject=None, scientific_name_abbrev='Glyma',
+                    identifier='Wm82.gnm1.ZZZZ', colour='blue') == [
+        (logging.ERROR, 'README has no subject'),
+        (logging.WARNING, 'README field colour is not in the template'),
+        (logging.ERROR, 'README scientific_name_abbrev Glyma should be five '
+                        'lower case letters, three of the genus and two of '
+                        'the species'),
+        (logging.ERROR, 'README identifier Wm82.gnm1.ZZZZ should be AAAA or '
+                        '{}'.format(KEY))]
+
+
+def test_readme_count_names_the_key(tmp_path):
+    record = collection(tmp_path)
+    for readme in record['readme_yml']:
+        os.remove(readme)
+    record = scan_collection(record['path'])
+    found = MetadataValidator().check(record)
+    assert [msg.format(*args) for level, msg, args in found] == [
+           'Expected one README.AAAA.yml, found 0']
+
+
+def test_manifest_names(tmp_path):
+    record = collection(tmp_path)
+    main = os.path.basename(record['main'][0])
+    with open(os.path.join(record['path'], 'MANIFEST.{}.descriptions.yml'
+                           .format(KEY)), 'w') as fopen:
+        fopen.write('{}: genome\ngone.fna.gz: removed\n'.format(main))
+    found = MetadataValidator().check(scan_collection(record['path']))
+    assert [(level, msg.format(*args)) for level, msg, args in found] == [
+           (logging.ERROR, 'gone.fna.gz is listed in '
+                           'MANIFEST.{}.descriptions.yml but missing'.format(
+                                                                       KEY))]
+
+
+def test_cached_by_fingerprint(tmp_path, monkeypatch):
+    record = collection(tmp_path, dataset_doi='10.1/a')
+    cache = str(tmp_path / 'metadata.json')
+    validator = MetadataValidator(cache=cache)
+    validator.check(record)
+    validator.save()
+    unchanged = MetadataValidator(cache=cache)
+    changed = MetadataValidator(cache=cache)  # the template is read here
+    parsed = []
+    load_yaml = metadata.load_yaml
+    monkeypatch.setattr(metadata, 'load_yaml',
+                        lambda path: parsed.append(path) or load_yaml(path))
+    readme = record['readme_yml'][0]
+    assert unchanged.readme(readme, record)['dois'] == {
+           'dataset_doi': '10.1/a'}
+    assert parsed == []
+    write_readme(record['path'], KEY, dataset_doi='10.1/bc')  # new size
+    assert changed.readme(readme, record)['dois'] == {
+           'dataset_doi': '10.1/bc'}
+    assert parsed == [readme]
+
+
+def test_readme_dois():
+    assert readme_dois({'publication_doi': ['10.1/a', 'none', '10.1/b'],
+                        'dataset_doi': 'None'}) == {
+           'publication_doi': '10.1/a', 'publication_doi_2': '10.1/b'}
+    assert readme_dois('not a mapping') == {}
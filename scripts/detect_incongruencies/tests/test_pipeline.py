@@ -0,0 +1,20 @@
+from itertools import chain
+import pytest
+from incongruency_detector.pipeline import iter_byte_lines, iter_line_blocks
+
+DATA = b'##gff-version 3\r\nchr1\tsrc\tgene\n\n###\nchr2\tsrc\tmRNA'
+
+
+@pytest.mark.parametrize('size', range(1, len(DATA) + 1))
+def test_lines_at_every_chunk_size(size):
+    chunks = [DATA[i:i + size] for i in range(0, len(DATA), size)]
+    assert list(chain.from_iterable(iter_line_blocks(chunks))) == [
+        b'##gff-version 3\r', b'chr1\tsrc\tgene', b'', b'###',
+        b'chr2\tsrc\tmRNA']
+    assert list(iter_byte_lines(chunks)) == DATA.replace(
+                                              b'\r', b'').split(b'\n')
+
+
+def test_final_newline():
+    assert list(iter_line_blocks([b'a\n', b'b\n'])) == [[b'a'], [b'b']]
+    assert list(iter_byte_lines([])) == []
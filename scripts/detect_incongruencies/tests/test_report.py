@@ -0,0 +1,32 @@
+import logging
+from incongruency_detector.report import Findings
+
+
+class RecordList(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_findings_limit():
+    logger = logging.getLogger('test_findings_limit')
+    logger.propagate = False
+    handler = RecordList()
+    logger.addHandler(handler)
+    findings = Findings(logger, 3)
+    for line in range(10):
+        findings.add(logging.ERROR, 'missing_seqid',
+                     '{} not found in genome_main, line {}', 'chr1', line)
+    findings.add(logging.ERROR, 'seqid_end', 'past the end, line {}', 1)
+    counts = findings.summarize()
+    assert counts == {'missing_seqid': 10, 'seqid_end': 1}
+    messages = [r.getMessage() for r in handler.records]
+    assert messages == ['chr1 not found in genome_main, line 0',
+                        'chr1 not found in genome_main, line 1',
+                        'chr1 not found in genome_main, line 2',
+                        'past the end, line 1',
+                        '10 missing_seqid findings, first 3 shown']
+    assert findings.summarize() == {}
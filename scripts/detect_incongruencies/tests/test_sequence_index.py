@@ -0,0 +1,76 @@
+import pytest
+from incongruency_detector.sequence_index import (FastaIndexer,
+                                                  SequenceIndex, load_index,
+                                                  save_index)
+
+# names out of sort order, CRLF, a ragged last line, an empty record and
+# no final newline
+FASTA = (b'>chr2 first one\nACGTACGT\nACGTACGT\nACG\n'
+         b'>empty\n'
+         b'>chr10\r\nACGT\r\nAC\r\n'
+         b'>chr1 last\nACGTA')
+FAI = ('chr2\t19\t16\t8\t9\n'
+       'empty\t0\t45\t0\t1\n'
+       'chr10\t6\t53\t4\t6\n'
+       'chr1\t5\t74\t5\t6\n')
+
+
+def index(data, size=7):
+    indexer = FastaIndexer()
+    for i in range(0, len(data), size):
+        indexer.feed(data[i:i + size])
+    indexer.close()
+    return indexer.index()
+
+
+def test_fai_in_file_order(tmp_path):
+    fai = str(tmp_path / 'genome.fa.fai')
+    index(FASTA).write_fai(fai)
+    with open(fai) as fopen:
+        assert fopen.read() == FAI
+
+
+def test_lookups():
+    found = index(FASTA)
+    assert len(found) == 4
+    assert found.names == ['chr2', 'empty', 'chr10', 'chr1']
+    assert [found.length(n) for n in ('chr1', 'chr10', 'chr2', 'empty')] == [
+                                                                  5, 6, 19, 0]
+    assert found.position('chr10') == 2
+    assert 'chr3' not in found
+    assert found.length('chr3') is None
+
+
+def test_from_fai_round_trip(tmp_path):
+    fai = str(tmp_path / 'genome.fa.fai')
+    with open(fai, 'w') as fopen:
+        fopen.write(FAI)
+    found = SequenceIndex.from_fai(fai)
+    assert found.names == ['chr2', 'empty', 'chr10', 'chr1']
+    assert found.length('chr10') == 6
+    assert list(found.offsets) == [16, 45, 53, 74]
+
+
+def test_sidecar(tmp_path):
+    fasta = tmp_path / 'genome.fa'
+    fasta.write_bytes(FASTA)
+    index_dir = str(tmp_path / 'index')
+    assert load_index(index_dir, str(fasta)) is None
+    save_index(index_dir, str(fasta), index(FASTA))
+    assert load_index(index_dir, str(fasta)).names == ['chr2', 'empty',
+                                                       'chr10', 'chr1']
+    fasta.write_bytes(FASTA + b'C\n')  # changed, the old index is stale
+    assert load_index(index_dir, str(fasta)) is None
+
+
+def test_matches_htslib(tmp_path):
+    pysam = pytest.importorskip('pysam')
+    fasta = tmp_path / 'genome.fa'
+    fasta.write_bytes(FASTA.replace(b'>empty\n', b''))  # htslib drops it
+    pysam.faidx(str(fasta))
+    with open(str(fasta) + '.fai') as fopen:
+        expected = fopen.read()
+    fai = str(tmp_path / 'ours.fai')
+    index(fasta.read_bytes()).write_fai(fai)
+    with open(fai) as fopen:
+        assert fopen.read() == expected
@@ -0,0 +1,86 @@
+import gzip
+import random
+import pytest
+from incongruency_detector.gff3_sorter import GFF3Sorter
+from incongruency_detector.tabix import TabixReader
+
+
+def make_gff3(path, scale, genes=1000, seed=5):
+    '''shuffled gff3 of overlapping genes on chr1 to chr5, returns the
+       split feature lines
+    '''
+    rng = random.Random(seed)
+    features = []
+    for g in range(genes):
+        seqid = 'chr{}'.format(rng.randint(1, 5))
+        start = rng.randint(1, scale)
+        end = start + rng.choice([500, 5000, 200000])
+        features.append([seqid, 'x', 'gene', str(start), str(end), '.', '+',
+                         '.', 'ID=g{}'.format(g)])
+        features.append([seqid, 'x', 'mRNA', str(start), str(end), '.', '+',
+                         '.', 'ID=g{0}.m;Parent=g{0}'.format(g)])
+        for e in range(3):
+            features.append([seqid, 'x', 'exon', str(start + e * 100),
+                             str(start + e * 100 + 50), '.', '+', '.',
+                             'Parent=g{}.m'.format(g)])
+    rng.shuffle(features)
+    with gzip.open(path, 'wt') as fopen:
+        fopen.write('##gff-version 3\n')
+        fopen.write('\n'.join('\t'.join(f) for f in features) + '\n')
+    return features
+
+
+def regions(scale, count=200, seed=9):
+    '''(seqid, start, end) queries, chr6 is not in the file'''
+    rng = random.Random(seed)
+    for _ in range(count):
+        start = rng.randint(1, scale)
+        yield ('chr{}'.format(rng.randint(1, 6)), start,
+               start + rng.choice([0, 100, 20000, 10 ** 6]))
+
+
+def overlapping(features, seqid, start, end):
+    return sorted('\t'.join(f) for f in features if f[0] == seqid and
+                  int(f[3]) <= end and int(f[4]) >= start)
+
+
+@pytest.fixture(params=[(10 ** 7, '.tbi'), (9 * 10 ** 8, '.csi')],
+                ids=['tbi', 'csi'])
+def indexed(request, tmp_path):
+    '''sorted BGZF gff3, its index and the features, ends past 2**29
+       need a .csi
+    '''
+    scale, suffix = request.param
+    source = str(tmp_path / 'in.gff3.gz')
+    features = make_gff3(source, scale)
+    out = str(tmp_path / 'sorted.gff3.gz')
+    sorter = GFF3Sorter(memory=100000, tmp_dir=str(tmp_path))
+    sorter.sort(source, out)
+    assert sorter.index_path == out + suffix
+    return out, sorter.index_path, features, scale
+
+
+def test_query(indexed):
+    out, index, features, scale = indexed
+    reader = TabixReader(out)
+    try:
+        for seqid, start, end in regions(scale):
+            found = sorted(l.decode() for l in reader.query(seqid, start,
+                                                            end))
+            assert found == overlapping(features, seqid, start, end)
+    finally:
+        reader.close()
+
+
+def test_htslib(indexed):
+    pysam = pytest.importorskip('pysam')
+    out, index, features, scale = indexed
+    tabix = pysam.TabixFile(out, index=index)
+    try:
+        for seqid, start, end in regions(scale):
+            if seqid not in tabix.contigs:
+                continue
+            found = sorted(tabix.fetch(seqid, start - 1, end))
+            assert found == overlapping(features, seqid, start, end)
+    finally:
+        tabix.close()
@@ -0,0 +1,73 @@
+import io
+import os
+import sys
+from incongruency_detector.bgzf import (BLOCK_HEADER, EOF_BLOCK, SIZE,
+                                        compress_block)
+from incongruency_detector.triage import background_command, find_block
+
+FAKE = BLOCK_HEADER + SIZE.pack(99) + b'\xff' * 100  # magic, bad deflate
+
+
+def bgzf(*parts, level=6):
+    '''(BGZF bytes, [(compressed offset, data)]) with one block per part'''
+    raw = b''
+    found = []
+    for data in parts:
+        found.append((len(raw), data))
+        raw += compress_block(data, level)
+    return raw + EOF_BLOCK, found
+
+
+def test_find_block_offsets():
+    raw, found = bgzf(b'first\n' * 100, b'second\n' * 5000, b'third\n')
+    fopen = io.BytesIO(raw)
+    for offset, data in found:
+        assert find_block(fopen, offset) == (offset, data)
+        assert find_block(fopen, max(offset - 5, 0)) == (offset, data)
+    assert find_block(fopen, found[0][0] + 1) == found[1]
+    eof = len(raw) - len(EOF_BLOCK)
+    assert find_block(fopen, found[-1][0] + 1) == (eof, b'')
+    assert find_block(fopen, eof + 1) is None
+    assert find_block(fopen, len(raw) + 100) is None
+
+
+def test_find_block_skips_magic_in_data():
+    '''a stored block holding a block header is not taken for one'''
+    raw, found = bgzf(b'lines\n' * 10, FAKE * 3, b'after\n', level=0)
+    assert raw.count(FAKE) == 3
+    fopen = io.BytesIO(raw)
+    assert find_block(fopen, found[1][0] + 1) == found[2]
+    assert find_block(fopen, raw.index(FAKE)) == found[2]
+
+
+def test_find_block_far_ahead():
+    '''a block more than one read past offset is still found'''
+    raw, found = bgzf(b'data\n')
+    padding = b'\0' * 300000
+    fopen = io.BytesIO(padding + raw)
+    assert find_block(fopen, 0) == (len(padding), b'data\n')
+
+
+def test_find_block_truncated():
+    raw, found = bgzf(b'one\n', os.urandom(5000))
+    fopen = io.BytesIO(raw[:found[1][0] + 100])
+    assert find_block(fopen, 1) is None
+    assert find_block(fopen, 0) == found[0]
+
+
+def test_background_command():
+    argv = ['scripts/detect_incongruencies.py', '--quick', '--quick_mb', '8',
+            '--directory', 'datastore', '--quick_samples=4', '--background',
+            '--report', 'report.json', '--log_file', 'run.log']
+    assert background_command(argv, 'run.full.log') == [
+           sys.executable, os.path.abspath(argv[0]),
+           '--directory', 'datastore', '--report', 'report.json',
+           '--log_file', 'run.log', '--log_file', 'run.full.log']
+
+
+def test_background_command_flag_with_value():
+    '''--flag=value takes nothing after it'''
+    argv = ['detect_incongruencies.py', '--quick_mb=2', '--genome',
+            'genome.fna.gz', '--quick_samples', '4', '--quick']
+    assert background_command(argv, 'full.log')[2:] == [
+           '--genome', 'genome.fna.gz', '--log_file', 'full.log']
@@ -1,4 +1,5 @@
 #!/bin/bash
+# See detect_incongruencies/checksum_folder.py for a cached, parallel replacement
 if [[ $# -ne 1 || ! -d $1 ]]; then 
     echo USAGE: $0 /path/to/datastore/folder
     exit 1